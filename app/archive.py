@@ -0,0 +1,267 @@
+# /app/archive.py
+
+import bisect
+import json
+import os
+import pickle
+import struct
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Set
+from app.finance import FinanceRollups, FinancialSummary
+from app.item import Item
+from app.order import Order
+from app.order_segments import RECORD
+from app.storage_util import EPOCH, MICROSECOND, Party, write_atomically
+from app.warehouse import Warehouse
+
+ARCHIVE_DIRECTORY = "archive"
+ARCHIVE_VERSION = 3  # 2: item rollups keyed by (name, description), 3: bucket counts
+ARCHIVE_AFTER = timedelta(days=90)  # How old a closed order gets before it is archived
+INDEX_FILE = "index.pickle"
+COMPRESSION_LEVEL = 6
+HEADER = struct.Struct("<I")  # Length of the JSON name tables that start a segment
+
+
+def _pack_segment(orders: List[Order]) -> bytes:
+    """Name tables, then one fixed-width record per order, compressed together."""
+    tables: Dict[str, list] = {"items": [], "parties": [], "statuses": []}
+    index: Dict[str, dict] = {name: {} for name in tables}
+
+    def intern(table: str, key, value) -> int:
+        position = index[table].get(key)
+        if position is None:
+            position = index[table][key] = len(tables[table])
+            tables[table].append(value)
+        return position
+
+    def party(value) -> int:
+        name = getattr(value, "name", "N/A")
+        return intern("parties", name, name)
+
+    records = bytearray()
+    for order in orders:
+        item = order.item
+        records += RECORD.pack(
+            order.order_id,
+            order.quantity,
+            order.total_price,
+            (order.timestamp - EPOCH) // MICROSECOND,
+            intern(
+                "items",
+                (item.name, item.description, item.price),
+                [item.name, item.description, item.price],
+            ),
+            party(order.buyer),
+            party(order.seller),
+            intern("statuses", order.status, order.status),
+            order.kind,
+        )
+
+    names = json.dumps(tables).encode("utf-8")
+    return zlib.compress(HEADER.pack(len(names)) + names + records, COMPRESSION_LEVEL)
+
+
+def _order_from_record(tables: Dict[str, list], record: tuple) -> Order:
+    order_id, quantity, total, timestamp, item, buyer, seller, status, kind = record
+    name, description, price = tables["items"][item]
+    return Order.from_record(
+        order_id=order_id,
+        item=Item(name, description, price, None),
+        quantity=quantity,
+        buyer=Party(tables["parties"][buyer]),
+        seller=Party(tables["parties"][seller]),
+        status=tables["statuses"][status],
+        timestamp=EPOCH + timedelta(microseconds=timestamp),
+        total_price=total,
+        kind=kind,
+    )
+
+
+class OrderArchive:
+    """Closed orders moved out of the warehouse, in zlib-compressed segment files.
+
+    Each archival run writes one segment. The index lists the published segments with
+    their ID and time ranges, and holds a FinancialSummary and FinanceRollups of every
+    archived order. Those are kept in memory, so whole-history summaries and period
+    reports never read the segments; reports over a date range or by group only
+    decompress the segments that overlap it. Archived orders come back with
+    Party stand-ins for their buyers and sellers.
+    """
+
+    def __init__(self, directory: str = ARCHIVE_DIRECTORY):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # One dict per segment: file, orders, first_id, last_id, start, end
+        self.segments: List[dict] = []
+        self.summary = FinancialSummary()
+        self.rollups = FinanceRollups()
+
+        index_path = os.path.join(directory, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, "rb") as file:
+                index = pickle.load(file)
+            if index.get("version") != ARCHIVE_VERSION:
+                raise ValueError(f"Unsupported archive version: {index.get('version')}")
+            self.segments = index["segments"]
+            self.summary = index["summary"]
+            self.rollups = index["rollups"]
+
+    def __len__(self) -> int:
+        return sum(segment["orders"] for segment in self.segments)
+
+    def archive(self, warehouse: Warehouse, before: datetime) -> int:
+        """Move the warehouse's closed orders placed before a cutoff into a new segment.
+
+        The segment file is written first, then the orders leave the warehouse (a
+        journal or store commits that straight away), and only then is the segment
+        published in the index. recover() finishes or undoes a run that a crash cut
+        short, and an order some segment already holds is never published again, so
+        no order is lost or counted twice. Returns how many orders were archived.
+        """
+        started = time.perf_counter()
+        self.recover(warehouse)
+        orders = warehouse.closed_orders_before(before)
+        if not orders:
+            print("No closed orders to archive.")
+            return 0
+
+        archived = self._archived_ids(orders)
+        new_orders = [order for order in orders if order.order_id not in archived]
+        name = f"segment-{len(self.segments) + 1:06d}.z"
+        if new_orders:
+            write_atomically(
+                os.path.join(self.directory, name), _pack_segment(new_orders)
+            )
+
+        warehouse.remove_closed_orders(before)
+        if new_orders:
+            self._publish(name, new_orders)
+        elapsed = time.perf_counter() - started
+        print(f"Archived {len(new_orders)} orders in {elapsed:.2f}s")
+        return len(new_orders)
+
+    def recover(self, warehouse: Warehouse) -> int:
+        """Finish or undo an archival a crash interrupted, returning the orders published.
+
+        A segment file missing from the index was written by a run that stopped
+        before publishing it. If its orders have left the warehouse their removal was
+        committed, so the segment is published. Otherwise it is deleted and a later
+        run archives them again. Call this once the warehouse has been loaded.
+        """
+        published = 0
+        listed = {segment["file"] for segment in self.segments}
+        for name in sorted(os.listdir(self.directory)):
+            unpublished = (
+                name.startswith("segment-") and name.endswith(".z")
+            ) and name not in listed
+            if not unpublished:
+                continue
+            tables, records = self._read_segment(name)
+            orders = [_order_from_record(tables, record) for record in records]
+            if any(warehouse.get_order(order.order_id) is not None for order in orders):
+                os.remove(os.path.join(self.directory, name))
+            else:
+                self._publish(name, orders)
+                published += len(orders)
+        return published
+
+    def _archived_ids(self, orders: Iterable[Order]) -> Set[int]:
+        """IDs of the given orders that a published segment already holds."""
+        wanted = sorted(order.order_id for order in orders)
+        wanted_set = set(wanted)
+        found = set()
+        for segment in self.segments:
+            # Only read segments whose ID range takes in one of the wanted IDs
+            position = bisect.bisect_left(wanted, segment["first_id"])
+            if position == len(wanted) or wanted[position] > segment["last_id"]:
+                continue
+            _, records = self._read_segment(segment["file"])
+            found.update(record[0] for record in records if record[0] in wanted_set)
+        return found
+
+    def _publish(self, name: str, orders: List[Order]):
+        """Add a written segment to the index, with its orders in the in-memory totals."""
+        self.segments.append(
+            {
+                "file": name,
+                "orders": len(orders),
+                "first_id": min(order.order_id for order in orders),
+                "last_id": max(order.order_id for order in orders),
+                "start": min(order.timestamp for order in orders),
+                "end": max(order.timestamp for order in orders),
+            }
+        )
+        for order in orders:
+            self.summary.add_order(order)
+            self.rollups.add_order(order)
+        self._save_index()
+
+    def _save_index(self):
+        index = {
+            "version": ARCHIVE_VERSION,
+            "segments": self.segments,
+            "summary": self.summary,
+            "rollups": self.rollups,
+        }
+        write_atomically(
+            os.path.join(self.directory, INDEX_FILE),
+            pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL),
+        )
+
+    def _read_segment(self, name: str):
+        """Decompress a segment file, returning its name tables and its records."""
+        with open(os.path.join(self.directory, name), "rb") as file:
+            data = zlib.decompress(file.read())
+        (length,) = HEADER.unpack_from(data)
+        tables = json.loads(data[HEADER.size : HEADER.size + length])
+        return tables, RECORD.iter_unpack(memoryview(data)[HEADER.size + length :])
+
+    def records(self, start: datetime = None, end: datetime = None) -> Iterator[tuple]:
+        """Yield (name tables, record) for archived orders placed from start up to end."""
+        first = (start - EPOCH) // MICROSECOND if start is not None else None
+        last = (end - EPOCH) // MICROSECOND if end is not None else None
+        for segment in self.segments:
+            if (start is not None and segment["end"] < start) or (
+                end is not None and segment["start"] >= end
+            ):
+                continue  # Nothing in this segment falls in the range
+            tables, records = self._read_segment(segment["file"])
+            for record in records:
+                timestamp = record[3]
+                if (first is None or timestamp >= first) and (
+                    last is None or timestamp < last
+                ):
+                    yield tables, record
+
+    def orders(self, start: datetime = None, end: datetime = None) -> Iterator[Order]:
+        """Rebuild the archived orders placed from start up to end, oldest segment first."""
+        for tables, record in self.records(start, end):
+            yield _order_from_record(tables, record)
+
+    def summarise(
+        self, start: datetime = None, end: datetime = None
+    ) -> FinancialSummary:
+        """Totals of the archived orders, from memory unless a date range is given."""
+        if start is None and end is None:
+            return self.summary
+
+        counts = {}
+        totals = {}
+        for tables, record in self.records(start, end):
+            key = (record[8], tables["statuses"][record[7]])
+            counts[key] = counts.get(key, 0) + 1
+            totals[key] = totals.get(key, 0) + record[2]
+
+        summary = FinancialSummary()
+        for (kind, status), count in counts.items():
+            summary.add_totals(kind, status, count, totals[(kind, status)])
+        return summary
+
+
+def archive_closed_orders(
+    archive: OrderArchive, warehouse: Warehouse, older_than: timedelta = ARCHIVE_AFTER
+) -> int:
+    """Archive the warehouse's closed orders placed more than older_than ago."""
+    return archive.archive(warehouse, datetime.now() - older_than)
@@ -0,0 +1,126 @@
+# /app/binary_export.py
+
+import json
+import os
+import sys
+from array import array
+from typing import Dict, Iterable, Tuple
+from app.order import Order
+from app.order_log import OrderLog
+
+try:  # NumPy is optional, it only makes reading zero-copy
+    import numpy
+except ImportError:
+    numpy = None
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+
+# Column name -> (array typecode, NumPy dtype). Every column is little-endian and fixed width.
+COLUMNS = {
+    "order_id": ("q", "<i8"),
+    "quantity": ("q", "<i8"),
+    "total_pence": ("q", "<i8"),
+    "status": ("b", "<i1"),
+    "kind": ("b", "<i1"),
+    "timestamp": ("d", "<f8"),  # Seconds since the epoch
+    "item_name": ("i", "<i4"),  # Index into the string dictionary
+    "buyer_name": ("i", "<i4"),
+    "seller_name": ("i", "<i4"),
+}
+
+
+def _name_table(values, strings: list, string_index: Dict[str, int]) -> array:
+    """Map each object in a lookup table to the dictionary index of its name."""
+    table = array("i")
+    for value in values:
+        name = getattr(value, "name", "N/A")
+        if name not in string_index:
+            string_index[name] = len(strings)
+            strings.append(name)
+        table.append(string_index[name])
+    return table
+
+
+def write_orders_binary(orders: Iterable[Order], directory: str) -> int:
+    """Write orders as one raw little-endian file per column, plus a JSON metadata file.
+
+    Each column can be loaded on its own with numpy.fromfile or numpy.memmap using the
+    dtype recorded in the metadata. Returns the number of orders written.
+    """
+    log = orders if isinstance(orders, OrderLog) else OrderLog(orders)
+
+    strings = []
+    string_index: Dict[str, int] = {}
+    item_names = _name_table(log.items, strings, string_index)
+    party_names = _name_table(log.parties, strings, string_index)
+
+    columns = {
+        "order_id": log.order_ids,
+        "quantity": log.quantities,
+        "total_pence": log.total_pence,
+        "status": log.status_codes,
+        "kind": log.kinds,
+        "timestamp": log.timestamps,
+        "item_name": array("i", (item_names[i] for i in log.item_indices)),
+        "buyer_name": array("i", (party_names[i] for i in log.buyer_indices)),
+        "seller_name": array("i", (party_names[i] for i in log.seller_indices)),
+    }
+
+    os.makedirs(directory, exist_ok=True)
+    for name, values in columns.items():
+        if sys.byteorder == "big":
+            values = array(values.typecode, values)
+            values.byteswap()
+        with open(os.path.join(directory, f"{name}.bin"), "wb") as file:
+            values.tofile(file)
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "rows": len(log),
+        "columns": {name: dtype for name, (_, dtype) in COLUMNS.items()},
+        "statuses": log.statuses,
+        "strings": strings,
+    }
+    # Metadata goes last, so a directory with a readable meta.json is complete
+    with open(os.path.join(directory, META_FILE), "w") as file:
+        json.dump(meta, file)
+
+    return len(log)
+
+
+def read_orders_binary(directory: str, use_numpy: bool = None) -> Tuple[Dict, dict]:
+    """Load the columns written by write_orders_binary.
+
+    Returns (columns, meta). Columns are read-only numpy.memmap arrays when NumPy is
+    available (zero-copy), otherwise array.array objects. meta holds the 'statuses'
+    and 'strings' tables that the status and name columns index into.
+    """
+    with open(os.path.join(directory, META_FILE)) as file:
+        meta = json.load(file)
+    if meta.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported binary export version: {meta.get('version')}")
+
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    if use_numpy and numpy is None:
+        raise ValueError("NumPy is not installed.")
+
+    rows = meta["rows"]
+    columns = {}
+    for name, dtype in meta["columns"].items():
+        path = os.path.join(directory, f"{name}.bin")
+        if use_numpy:
+            if rows:
+                columns[name] = numpy.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+            else:
+                columns[name] = numpy.empty(0, dtype=dtype)
+        else:
+            values = array(COLUMNS[name][0])
+            with open(path, "rb") as file:
+                values.fromfile(file, rows)
+            if sys.byteorder == "big":
+                values.byteswap()
+            columns[name] = values
+
+    return columns, meta
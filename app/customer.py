@@ -39,11 +39,27 @@ class Customer(Person):
 class CustomerManager:
     def __init__(self):
         self.customers = {}
+        self._listeners = []
+
+    def __getstate__(self):
+        """Pickle without listeners."""
+        state = self.__dict__.copy()
+        state["_listeners"] = []
+        return state
+
+    def add_listener(self, listener):
+        """Register a callback given the event ('created', 'updated' or 'deleted') and the customer."""
+        self._listeners.append(listener)
+
+    def _notify(self, event, customer):
+        for listener in self._listeners:
+            listener(event, customer)
 
     def create_customer(self, name, email):
         """Create a new customer and store it."""
         customer = Customer(name, email)
         self.customers[customer.customer_id] = customer
+        self._notify("created", customer)
         return customer
 
     def get_customer_by_id(self, customer_id):
@@ -58,9 +74,18 @@ class CustomerManager:
 
         return self.customers[customer_id]
 
+    def update_customer(self, customer_id, name=None, email=None):
+        """Update a customer's profile, so that listeners see the change."""
+        if customer_id not in self.customers:
+            raise ValueError(f"No customer found with ID {customer_id}")
+        customer = self.customers[customer_id]
+        customer.update_profile(name=name, email=email)
+        self._notify("updated", customer)
+        return customer
+
     def delete_customer(self, customer_id):
         """Delete a customer by their ID."""
         if customer_id in self.customers:
-            del self.customers[customer_id]
+            self._notify("deleted", self.customers.pop(customer_id))
         else:
             raise ValueError(f"No customer found with ID {customer_id}")
@@ -1,39 +1,803 @@
 # /app/finance.py
 
+import bisect
 import csv
-from typing import List
+import heapq
+import itertools
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from operator import attrgetter
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Union
 from app.order import Order
+from app.order_log import OrderLog
+from app.storage_util import write_atomically
+
+CSV_HEADERS = [
+    "Order ID",
+    "Item",
+    "Quantity",
+    "Total Price",
+    "Buyer",
+    "Seller",
+    "Status",
+    "Date",
+]
+PATCH_HEADERS = ["Order ID", "Status", "Date"]
+CSV_BATCH_SIZE = 10_000  # Rows handed to writerows at a time
+CSV_BUFFER_SIZE = 1024 * 1024  # Bytes buffered before each write to disk
+PERIODS = ("day", "week", "month")
+GROUP_KEYS = ("item", "supplier", "customer")
+REPORT_CACHE_SIZE = 64  # Memoised reports kept per warehouse version
+ORDER_PAGE_SIZE = 20
+ORDER_SORT_KEYS = {
+    "order_id": attrgetter("order_id"),
+    "item_name": lambda order: order.item.name,
+    "quantity": attrgetter("quantity"),
+    "total_price": attrgetter("total_price"),
+    "status": attrgetter("status"),
+    "timestamp": attrgetter("timestamp"),
+}
+
+
+class FinancialSummary:
+    """Revenue, costs and order counts gathered in a single pass over the orders"""
+
+    def __init__(self):
+        self.revenue = 0.0  # Delivered customer orders
+        self.costs = 0.0  # Received supplier orders
+        self.customer_order_count = 0
+        self.supplier_order_count = 0
+        self.status_counts: Dict[str, int] = {}
+        self.status_totals: Dict[str, float] = {}
+
+    @property
+    def profit(self) -> float:
+        return self.revenue - self.costs
+
+    @property
+    def order_count(self) -> int:
+        return sum(self.status_counts.values())
+
+    def add_order(self, order: Order, status: str = None):
+        """Fold a single order into the summary (optionally as if it had another status)"""
+        status = order.status if status is None else status
+        self.add_totals(order.kind, status, 1, order.total_price)
+
+    def remove_order(self, order: Order, status: str = None):
+        """Take a previously added order back out of the summary"""
+        status = order.status if status is None else status
+        self.add_totals(order.kind, status, -1, -order.total_price)
+
+    def add_totals(self, kind: int, status: str, count: int, total_price: float):
+        """Fold a group of orders sharing a kind and status into the summary"""
+        self.status_counts[status] = self.status_counts.get(status, 0) + count
+        self.status_totals[status] = self.status_totals.get(status, 0.0) + total_price
+        if not self.status_counts[status]:
+            del self.status_counts[status]
+            del self.status_totals[status]
+
+        if kind == Order.SALE:
+            self.customer_order_count += count
+            if status == "delivered":
+                self.revenue += total_price
+        elif kind == Order.PURCHASE:
+            self.supplier_order_count += count
+            if status == "received":
+                self.costs += total_price
+
+    def merge(self, other: "FinancialSummary"):
+        """Fold another summary's totals into this one"""
+        self.revenue += other.revenue
+        self.costs += other.costs
+        self.customer_order_count += other.customer_order_count
+        self.supplier_order_count += other.supplier_order_count
+        for status, count in other.status_counts.items():
+            self.status_counts[status] = self.status_counts.get(status, 0) + count
+            self.status_totals[status] = (
+                self.status_totals.get(status, 0.0) + other.status_totals[status]
+            )
+
+    @classmethod
+    def combined(cls, *summaries: "FinancialSummary") -> "FinancialSummary":
+        """A new summary adding up the given ones, which are left untouched"""
+        total = cls()
+        for summary in summaries:
+            total.merge(summary)
+        return total
+
+    def matches(self, other: "FinancialSummary") -> bool:
+        """Check whether two summaries agree, allowing for floating point drift"""
+        return (
+            math.isclose(self.revenue, other.revenue, abs_tol=1e-6)
+            and math.isclose(self.costs, other.costs, abs_tol=1e-6)
+            and self.customer_order_count == other.customer_order_count
+            and self.supplier_order_count == other.supplier_order_count
+            and self.status_counts == other.status_counts
+        )
+
+
+class GroupTotals:
+    """Order count, units and money for one group of orders"""
+
+    def __init__(self, count: int = 0, quantity: int = 0, total: float = 0.0):
+        self.count = count
+        self.quantity = quantity
+        self.total = total
+
+    def __eq__(self, other):
+        return isinstance(other, GroupTotals) and (
+            self.count,
+            self.quantity,
+            self.total,
+        ) == (other.count, other.quantity, other.total)
+
+    def __repr__(self):
+        return f"GroupTotals(count={self.count}, quantity={self.quantity}, total={self.total})"
+
+
+class ItemMargin:
+    """Sales of an item against what was paid for it"""
+
+    def __init__(self):
+        self.units_sold = 0
+        self.revenue = 0.0  # Delivered customer orders
+        self.units_bought = 0
+        self.cost = 0.0  # Received supplier orders
+
+    @property
+    def unit_cost(self) -> float:
+        """Average price paid per unit, 0 if none have been bought"""
+        return self.cost / self.units_bought if self.units_bought else 0.0
+
+    @property
+    def cost_of_sales(self) -> float:
+        return self.units_sold * self.unit_cost
+
+    @property
+    def margin(self) -> float:
+        return self.revenue - self.cost_of_sales
+
+    @property
+    def margin_percent(self) -> float:
+        return self.margin / self.revenue * 100 if self.revenue else 0.0
+
+
+class MarginReport:
+    """Gross margin per item (keyed by name and description) and spend per supplier"""
+
+    def __init__(self):
+        self.items: Dict[Tuple[str, str], ItemMargin] = {}
+        self.suppliers: Dict[str, GroupTotals] = {}
+
+    def add_order(self, order: Order):
+        """Fold a delivered sale or received purchase into the report"""
+        key = (order.item.name, order.item.description)
+        margin = self.items.get(key)
+        if margin is None:
+            margin = self.items[key] = ItemMargin()
+
+        if order.kind == Order.SALE:
+            margin.units_sold += order.quantity
+            margin.revenue += order.total_price
+        elif order.kind == Order.PURCHASE:
+            margin.units_bought += order.quantity
+            margin.cost += order.total_price
+
+            supplier = getattr(order.seller, "name", "N/A")
+            spend = self.suppliers.get(supplier)
+            if spend is None:
+                spend = self.suppliers[supplier] = GroupTotals()
+            spend.count += 1
+            spend.quantity += order.quantity
+            spend.total += order.total_price
+
+
+def group_key(order: Order, by: str):
+    """Get the key an order is grouped under, or None if it doesn't belong to any group
+
+    Items are grouped by (name, description), suppliers and customers by name.
+    """
+    if by == "item":
+        return (order.item.name, order.item.description)
+    if by == "supplier":
+        return (
+            getattr(order.seller, "name", "N/A")
+            if order.kind == Order.PURCHASE
+            else None
+        )
+    if by == "customer":
+        return getattr(order.buyer, "name", "N/A") if order.kind == Order.SALE else None
+    raise ValueError(f"Unknown group '{by}', expected one of {', '.join(GROUP_KEYS)}.")
+
+
+def _changes_since(
+    status_changes, last_change: datetime, changes_at_last: int
+) -> List[Tuple[int, str, datetime]]:
+    """Status changes after last_change, skipping the changes_at_last made at that very time"""
+    newer = []
+    at_last = []
+    # The changes are in time order, so only walk back as far as the checkpoint
+    for change in reversed(status_changes):
+        changed_at = change[2]
+        if last_change is not None and changed_at < last_change:
+            break
+        (at_last if changed_at == last_change else newer).append(change)
+    at_last.reverse()
+    newer.reverse()
+    return at_last[changes_at_last:] + newer
+
+
+def add_to_groups(groups: Dict[str, GroupTotals], orders: Iterable[Order], by: str):
+    """Fold orders into per-group totals, skipping orders that don't belong to a group"""
+    for order in orders:
+        key = group_key(order, by)
+        if key is None:
+            continue
+        totals = groups.get(key)
+        if totals is None:
+            totals = groups[key] = GroupTotals()
+        totals.count += 1
+        totals.quantity += order.quantity
+        totals.total += order.total_price
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Linearly interpolated percentile, using the same arithmetic as numpy.percentile"""
+    virtual_index = (q / 100) * (len(sorted_values) - 1)
+    lower = math.floor(virtual_index)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    gamma = virtual_index - lower
+    low_value, high_value = sorted_values[lower], sorted_values[upper]
+    difference = high_value - low_value
+    if gamma >= 0.5:
+        return high_value - difference * (1 - gamma)
+    return low_value + difference * gamma
+
+
+def period_start(day: date, period: str) -> date:
+    """Get the first day of the day, week (Monday) or month that a date falls in"""
+    if period == "day":
+        return day
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    raise ValueError(
+        f"Unknown period '{period}', expected one of {', '.join(PERIODS)}."
+    )
+
+
+class PeriodTotals:
+    """Revenue, costs and units for one time bucket, and the number of orders behind them"""
+
+    def __init__(self):
+        self.count = 0
+        self.revenue = 0.0
+        self.costs = 0.0
+        self.units_sold = 0
+        self.units_bought = 0
+
+    @property
+    def profit(self) -> float:
+        return self.revenue - self.costs
+
+    def merge(self, other: "PeriodTotals"):
+        self.count += other.count
+        self.revenue += other.revenue
+        self.costs += other.costs
+        self.units_sold += other.units_sold
+        self.units_bought += other.units_bought
+
+
+class FinanceRollups:
+    """Daily, weekly and monthly totals (overall and per item), updated order by order"""
+
+    def __init__(self):
+        # period -> bucket start -> totals
+        self.totals: Dict[str, Dict[date, PeriodTotals]] = {p: {} for p in PERIODS}
+        # period -> (item name, description) -> bucket start -> totals
+        self.item_totals: Dict[str, Dict[Tuple[str, str], Dict[date, PeriodTotals]]] = {
+            p: {} for p in PERIODS
+        }
+
+    def add_order(self, order: Order, status: str = None, sign: int = 1):
+        """Add (or with sign=-1 remove) a delivered sale or received purchase"""
+        status = order.status if status is None else status
+        self.add_totals(
+            order.timestamp.date(),
+            (order.item.name, order.item.description),
+            order.kind,
+            status,
+            sign,
+            order.quantity * sign,
+            order.total_price * sign,
+        )
+
+    def add_totals(
+        self,
+        day: date,
+        item: Tuple[str, str],
+        kind: int,
+        status: str,
+        count: int,
+        quantity: int,
+        total_price: float,
+    ):
+        """Fold the orders of one item on one day, sharing a kind and status, into the rollups
+
+        A negative count takes orders out again, and buckets left without any orders are
+        dropped rather than reported as zeros.
+        """
+        if kind == Order.SALE and status == "delivered":
+            revenue, costs, sold, bought = total_price, 0.0, quantity, 0
+        elif kind == Order.PURCHASE and status == "received":
+            revenue, costs, sold, bought = 0.0, total_price, 0, quantity
+        else:
+            return  # Orders that don't count towards revenue or costs
+
+        for period in PERIODS:
+            bucket = period_start(day, period)
+            item_buckets = self.item_totals[period].setdefault(item, {})
+            for buckets in (self.totals[period], item_buckets):
+                totals = buckets.setdefault(bucket, PeriodTotals())
+                totals.count += count
+                totals.revenue += revenue
+                totals.costs += costs
+                totals.units_sold += sold
+                totals.units_bought += bought
+                if totals.count <= 0:
+                    del buckets[bucket]
+            if not item_buckets:
+                del self.item_totals[period][item]
+
+    def remove_order(self, order: Order, status: str = None):
+        self.add_order(order, status, sign=-1)
+
+    def merge(self, other: "FinanceRollups"):
+        """Fold another set of rollups into this one, bucket by bucket"""
+        for period in PERIODS:
+            for bucket, totals in other.totals[period].items():
+                self.totals[period].setdefault(bucket, PeriodTotals()).merge(totals)
+            for item, buckets in other.item_totals[period].items():
+                item_buckets = self.item_totals[period].setdefault(item, {})
+                for bucket, totals in buckets.items():
+                    item_buckets.setdefault(bucket, PeriodTotals()).merge(totals)
+
+    def report(
+        self,
+        period: str = "month",
+        start: date = None,
+        end: date = None,
+        item_name: str = None,
+        item_description: str = None,
+    ) -> List[Tuple[date, PeriodTotals]]:
+        """List (bucket start, totals) oldest first, for buckets starting from start up to (not including) end
+
+        With an item name and description only that item is reported. With just a
+        name, every item of that name is added up.
+        """
+        period_start(date.today(), period)  # Validates the period name
+        if item_name is None:
+            buckets = self.totals[period]
+        elif item_description is not None:
+            buckets = self.item_totals[period].get((item_name, item_description), {})
+        else:
+            buckets = {}
+            for (name, _), item_buckets in self.item_totals[period].items():
+                if name == item_name:
+                    for bucket, totals in item_buckets.items():
+                        buckets.setdefault(bucket, PeriodTotals()).merge(totals)
+
+        return sorted(
+            (bucket, totals)
+            for bucket, totals in buckets.items()
+            if (start is None or bucket >= start) and (end is None or bucket < end)
+        )
 
 
 class FinanceCompiler:
     """A class to compile financial data from orders"""
 
-    def __init__(self, orders: List[Order]):
+    def __init__(
+        self,
+        orders: Union[List[Order], OrderLog, Iterable[Order]],
+        warehouse=None,
+        use_numpy: bool = False,
+        store=None,
+        archive=None,
+    ):
         self.orders = orders
+        self.warehouse = warehouse
+        self.store = store  # e.g. an SqliteStore kept up to date with the warehouse
+        self.archive = archive  # An OrderArchive, read by reports with include_archived
+        self._running = None
+        self._rollups = None
+        self._numpy = None
+        self._cache: "OrderedDict[tuple, object]" = OrderedDict()
+        self._cache_version = None
 
-    def total_customer_revenue(self) -> float:
-        """Calculate total revenue from customer orders with status 'delivered'"""
-        customer_orders = [
+        if use_numpy:
+            from app.finance_numpy import NumpyFinanceBackend  # Optional dependency
+
+            self._numpy = NumpyFinanceBackend(orders, warehouse)
+
+        if warehouse is not None:
+            # Existing orders get indexed before the listener is added, so they
+            # are counted here once and only later changes arrive as events
+            warehouse.add_order_listener(self._on_order_event)
+            warehouse.add_archive_listener(self._on_orders_archived)
+            if warehouse.history is not None:
+                # Closed orders are only in the history, which totals its own records
+                self._running = warehouse.history.summarise()
+                self._rollups = warehouse.history.rollups()
+            else:
+                self._running = FinancialSummary()
+                self._rollups = FinanceRollups()
+                for order in warehouse.orders:
+                    self._running.add_order(order)
+                    self._rollups.add_order(order)
+
+    def _on_order_event(self, order: Order, previous_status: str):
+        """Keep the running totals and rollups in step with the warehouse's orders"""
+        if previous_status is not None:
+            self._running.remove_order(order, previous_status)
+            self._rollups.remove_order(order, previous_status)
+        self._running.add_order(order)
+        self._rollups.add_order(order)
+
+    def _on_orders_archived(self, orders: List[Order], before: datetime):
+        """Take archived orders out of the running totals, the archive keeps their own"""
+        for order in orders:
+            self._running.remove_order(order)
+            self._rollups.remove_order(order)
+
+    def _archive_backend(self, include_archived: bool):
+        """Get the archive if archived orders were asked for and there is one"""
+        return self.archive if include_archived else None
+
+    def _archived_orders(
+        self, kind: int = None, status: str = None, start=None, end=None
+    ) -> Iterator[Order]:
+        for order in self.archive.orders(start, end):
+            if (kind is None or order.kind == kind) and (
+                status is None or order.status == status
+            ):
+                yield order
+
+    def period_report(
+        self,
+        period: str = "month",
+        start: date = None,
+        end: date = None,
+        item_name: str = None,
+        include_archived: bool = False,
+        item_description: str = None,
+    ) -> List[Tuple[date, PeriodTotals]]:
+        """Revenue, costs and units per day, week or month, read from the maintained rollups"""
+        rollups = self._rollups
+        if rollups is None and hasattr(self.orders, "rollups"):
+            rollups = self.orders.rollups()  # Order stores roll up their own records
+        elif rollups is None:
+            # Not attached to a warehouse, so build the rollups with one pass instead
+            rollups = FinanceRollups()
+            for order in self.orders:
+                rollups.add_order(order)
+        archive = self._archive_backend(include_archived)
+        if archive is not None:
+            combined = FinanceRollups()
+            combined.merge(rollups)
+            combined.merge(archive.rollups)
+            rollups = combined
+        return rollups.report(period, start, end, item_name, item_description)
+
+    def running_summary(self, include_archived: bool = False) -> FinancialSummary:
+        """Get the running totals (O(1)), falling back to a full pass if not attached to a warehouse"""
+        if self._running is None:
+            return self.summarise(include_archived=include_archived)
+        archive = self._archive_backend(include_archived)
+        if archive is not None:
+            return FinancialSummary.combined(self._running, archive.summary)
+        return self._running
+
+    def verify(self) -> bool:
+        """Recompute the totals from scratch and reconcile the running totals against them"""
+        if self._running is None:
+            return True
+
+        if self.warehouse.history is not None:
+            recomputed = self.warehouse.history.summarise()
+        else:
+            recomputed = FinancialSummary()
+            for order in self.warehouse.orders:
+                recomputed.add_order(order)
+
+        if recomputed.matches(self._running):
+            return True
+
+        print(
+            "Warning: Running financial totals were out of date and have been rebuilt."
+        )
+        self._running = recomputed
+        return False
+
+    def _numpy_backend(self):
+        """Get the NumPy backend if one was requested and still covers self.orders"""
+        if self._numpy is not None and self._numpy.orders is self.orders:
+            return self._numpy
+        return None
+
+    def _store_backend(self):
+        """Get the store if one was given and self.orders is the warehouse it follows"""
+        if self.store is not None and self._attached():
+            return self.store
+        return None
+
+    def _attached(self) -> bool:
+        """Whether self.orders is all the orders of the warehouse we were given"""
+        return self.warehouse is not None and self.orders is self.warehouse.all_orders
+
+    def _cached(self, key: tuple, compute: Callable[[], object]):
+        """Memoise a report until the warehouse version changes, evicting the least recently used
+
+        Results are shared between callers, so they must not be modified. Without a
+        warehouse there is no version to check, so nothing is cached.
+        """
+        if not self._attached():
+            return compute()
+
+        version = self.warehouse.version
+        if version != self._cache_version:
+            self._cache.clear()
+            self._cache_version = version
+
+        try:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        except KeyError:
+            pass
+
+        result = self._cache[key] = compute()
+        if len(self._cache) > REPORT_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return result
+
+    def _orders_in_range(self, start: datetime = None, end: datetime = None):
+        """Get orders placed from start (inclusive) to end (exclusive), using the warehouse time index if possible"""
+        if start is None and end is None:
+            return self.orders
+        if self._attached():
+            return self.warehouse.orders_between(start, end)
+        return [
             order
             for order in self.orders
-            if order.seller.__class__.__name__ == "Warehouse"
-            and order.status == "delivered"
+            if (start is None or order.timestamp >= start)
+            and (end is None or order.timestamp < end)
         ]
 
+    def _orders_with_status(
+        self, status: str, start: datetime = None, end: datetime = None
+    ) -> List[Order]:
+        """Get orders in the given status, using the warehouse indexes if possible"""
+        if self._attached():
+            if start is None and end is None:
+                return self.warehouse.orders_with_status(status)
+            return self.warehouse.orders_between(start, end, status=status)
+        return [
+            order
+            for order in self._orders_in_range(start, end)
+            if order.status == status
+        ]
+
+    def summarise(
+        self,
+        start: datetime = None,
+        end: datetime = None,
+        include_archived: bool = False,
+    ) -> FinancialSummary:
+        """Compute revenue, costs, profit and per-status totals in one pass, optionally for a date range"""
+        if isinstance(self.orders, OrderLog):
+            summary = self._summarise_log(self.orders, start, end)
+        else:
+            summary = self._cached(
+                ("summarise", start, end), lambda: self._summarise(start, end)
+            )
+
+        archive = self._archive_backend(include_archived)
+        if archive is None:
+            return summary
+        # Keyed on the archive's size too, recovering a segment changes it without
+        # changing the warehouse
+        archived = self._cached(
+            ("archived_summary", start, end, len(archive)),
+            lambda: archive.summarise(start, end),
+        )
+        return FinancialSummary.combined(summary, archived)
+
+    def _summarise(self, start: datetime = None, end: datetime = None):
+        if hasattr(self.orders, "summarise"):
+            # Order stores such as OrderSegments total their own records
+            return self.orders.summarise(start, end)
+        if self._store_backend():
+            return self.store.summarise(start, end)
+        if self._numpy_backend():
+            return self._numpy.summarise(start, end)
+
+        summary = FinancialSummary()
+        for order in self._orders_in_range(start, end):
+            summary.add_order(order)
+        return summary
+
+    def _summarise_log(
+        self, log: OrderLog, start: datetime = None, end: datetime = None
+    ) -> FinancialSummary:
+        """Summarise an OrderLog straight from its columns, without building any orders"""
+        first = start.timestamp() if start is not None else -math.inf
+        last = end.timestamp() if end is not None else math.inf
+
+        counts = {}
+        pence = {}
+        for key, total, timestamp in zip(
+            zip(log.kinds, log.status_codes), log.total_pence, log.timestamps
+        ):
+            if first <= timestamp < last:
+                counts[key] = counts.get(key, 0) + 1
+                pence[key] = pence.get(key, 0) + total
+
+        summary = FinancialSummary()
+        for (kind, status_code), count in counts.items():
+            status = log.statuses[status_code]
+            summary.add_totals(kind, status, count, pence[(kind, status_code)] / 100)
+        return summary
+
+    def _matching_orders(
+        self, kind: int = None, status: str = None, start=None, end=None
+    ) -> Iterable[Order]:
+        orders = (
+            self._orders_with_status(status, start, end)
+            if status is not None
+            else self._orders_in_range(start, end)
+        )
+        if kind is None:
+            return orders
+        return (order for order in orders if order.kind == kind)
+
+    def _filtered_orders(
+        self, kind: int = None, status: str = None, start=None, end=None
+    ) -> List[Order]:
+        """Matching orders as a list, memoised until the warehouse changes"""
+        return self._cached(
+            ("orders", kind, status, start, end),
+            lambda: self._list_matching_orders(kind, status, start, end),
+        )
+
+    def _list_matching_orders(self, kind=None, status=None, start=None, end=None):
+        orders = self._matching_orders(kind, status, start, end)
+        return orders if kind is None else list(orders)
+
+    def group_by(
+        self,
+        by: str = "item",
+        kind: int = None,
+        status: str = None,
+        start: datetime = None,
+        end: datetime = None,
+        include_archived: bool = False,
+    ) -> Dict[str, GroupTotals]:
+        """Total orders per item, supplier (purchases) or customer (sales) in one pass"""
+        if by not in GROUP_KEYS:
+            raise ValueError(
+                f"Unknown group '{by}', expected one of {', '.join(GROUP_KEYS)}."
+            )
+        groups = self._cached(
+            ("group_by", by, kind, status, start, end),
+            lambda: self._group_by(by, kind, status, start, end),
+        )
+        if self._archive_backend(include_archived) is None:
+            return groups
+        return self._cached(
+            ("archived_group_by", by, kind, status, start, end, len(self.archive)),
+            lambda: self._with_archived_groups(groups, by, kind, status, start, end),
+        )
+
+    def _with_archived_groups(self, groups, by, kind, status, start, end):
+        combined = {
+            key: GroupTotals(totals.count, totals.quantity, totals.total)
+            for key, totals in groups.items()
+        }
+        add_to_groups(combined, self._archived_orders(kind, status, start, end), by)
+        return combined
+
+    def _group_by(self, by, kind=None, status=None, start=None, end=None):
+        if self._store_backend():
+            return self.store.group_by(by, kind, status, start, end)
+        if self._numpy_backend():
+            return self._numpy.group_by(by, kind, status, start, end)
+
+        groups: Dict[str, GroupTotals] = {}
+        add_to_groups(groups, self._matching_orders(kind, status, start, end), by)
+        return groups
+
+    def margin_report(
+        self,
+        start: datetime = None,
+        end: datetime = None,
+        include_archived: bool = False,
+    ) -> MarginReport:
+        """Gross margin per item and spend per supplier, in one pass over delivered sales and received purchases"""
+        include_archived = self._archive_backend(include_archived) is not None
+        return self._cached(
+            ("margin_report", start, end, include_archived),
+            lambda: self._margin_report(start, end, include_archived),
+        )
+
+    def _margin_report(
+        self, start: datetime = None, end: datetime = None, include_archived=False
+    ):
+        report = MarginReport()
+        sources = [self._matching_orders]
+        if include_archived:
+            sources.append(self._archived_orders)
+        for matching_orders in sources:
+            sales = matching_orders(Order.SALE, "delivered", start, end)
+            purchases = matching_orders(Order.PURCHASE, "received", start, end)
+            for order in itertools.chain(sales, purchases):
+                report.add_order(order)
+        return report
+
+    def order_value_percentiles(
+        self,
+        percentiles: Iterable[float] = (50, 90, 99),
+        kind: int = None,
+        status: str = None,
+        start: datetime = None,
+        end: datetime = None,
+    ) -> Dict[float, float]:
+        """Percentiles of order totals, empty if no orders match"""
+        percentiles = tuple(percentiles)
+        return self._cached(
+            ("percentiles", percentiles, kind, status, start, end),
+            lambda: self._order_value_percentiles(
+                percentiles, kind, status, start, end
+            ),
+        )
+
+    def _order_value_percentiles(
+        self, percentiles, kind=None, status=None, start=None, end=None
+    ):
+        if self._numpy_backend():
+            return self._numpy.order_value_percentiles(
+                percentiles, kind, status, start, end
+            )
+
+        values = sorted(
+            order.total_price
+            for order in self._matching_orders(kind, status, start, end)
+        )
+        if not values:
+            return {}
+        return {q: percentile(values, q) for q in percentiles}
+
+    def total_customer_revenue(
+        self, start: datetime = None, end: datetime = None
+    ) -> float:
+        """Calculate total revenue from customer orders with status 'delivered'"""
+        customer_orders = self._filtered_orders(Order.SALE, "delivered", start, end)
+
         if not customer_orders:
             print("Warning: No delivered customer orders found.")
             return 0.0
 
         return sum(order.total_price for order in customer_orders)
 
-    def total_supplier_costs(self) -> float:
+    def total_supplier_costs(
+        self, start: datetime = None, end: datetime = None
+    ) -> float:
         """Calculate total costs from supplier orders with status 'received'"""
-        supplier_orders = [
-            order
-            for order in self.orders
-            if order.seller.__class__.__name__ == "Supplier"
-            and order.status == "received"
-        ]
+        supplier_orders = self._filtered_orders(Order.PURCHASE, "received", start, end)
 
         if not supplier_orders:
             print("Warning: No received supplier orders found.")
@@ -41,10 +805,10 @@ class FinanceCompiler:
 
         return sum(order.total_price for order in supplier_orders)
 
-    def calculate_profit(self) -> float:
+    def calculate_profit(self, start: datetime = None, end: datetime = None) -> float:
         """Calculate profit (customer revenue - supplier costs)"""
-        customer_revenue = self.total_customer_revenue()
-        supplier_costs = self.total_supplier_costs()
+        customer_revenue = self.total_customer_revenue(start, end)
+        supplier_costs = self.total_supplier_costs(start, end)
 
         # Check if there's no revenue or costs
         if customer_revenue == 0:
@@ -54,14 +818,11 @@ class FinanceCompiler:
 
         return customer_revenue - supplier_costs
 
-    def get_customer_orders(self) -> List[Order]:
+    def get_customer_orders(
+        self, start: datetime = None, end: datetime = None
+    ) -> List[Order]:
         """Get all customer orders with status 'delivered'"""
-        customer_orders = [
-            order
-            for order in self.orders
-            if order.seller.__class__.__name__ == "Warehouse"
-            and order.status == "delivered"
-        ]
+        customer_orders = self._filtered_orders(Order.SALE, "delivered", start, end)
 
         # Check if there are no customer orders delivered
         if not customer_orders:
@@ -69,23 +830,22 @@ class FinanceCompiler:
 
         return customer_orders
 
-    def get_supplier_orders(self) -> List[Order]:
+    def get_supplier_orders(
+        self, start: datetime = None, end: datetime = None
+    ) -> List[Order]:
         """Get all supplier orders with status 'received'"""
-        supplier_orders = [
-            order
-            for order in self.orders
-            if order.seller.__class__.__name__ == "Supplier"
-            and order.status == "received"
-        ]
+        supplier_orders = self._filtered_orders(Order.PURCHASE, "received", start, end)
 
         if not supplier_orders:
             print("No supplier orders with 'received' status found.")
 
         return supplier_orders
 
-    def get_all_orders(self) -> List[Order]:
-        """Get all orders (regardless of status)"""
-        all_orders = self.orders
+    def get_all_orders(
+        self, start: datetime = None, end: datetime = None
+    ) -> List[Order]:
+        """Get all orders (regardless of status), optionally only those in a date range"""
+        all_orders = self._filtered_orders(start=start, end=end)
 
         if not all_orders:
             print("No orders found.")
@@ -105,35 +865,183 @@ class FinanceCompiler:
                 f"{order.status:<10} {order.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
             )
 
-    def export_orders_to_csv(self, orders: List[Order], file_path: str):
-        """Export orders to a CSV file"""
-        with open(file_path, mode="w", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow(
-                [
-                    "Order ID",
-                    "Item",
-                    "Quantity",
-                    "Total Price",
-                    "Buyer",
-                    "Seller",
-                    "Status",
-                    "Date",
-                ]
+    def export_orders_to_csv(
+        self,
+        orders: Iterable[Order],
+        file_path: str,
+        batch_size: int = CSV_BATCH_SIZE,
+    ) -> int:
+        """Export orders to a CSV file, streaming any iterable of orders in batches"""
+        started = time.perf_counter()
+        rows_written = self._write_csv(
+            file_path, CSV_HEADERS, self._csv_rows(orders), batch_size=batch_size
+        )
+
+        elapsed = time.perf_counter() - started
+        rate = rows_written / elapsed if elapsed > 0 else float(rows_written)
+        print(
+            f"Exported {rows_written} orders in {elapsed:.2f}s ({rate:,.0f} rows/sec)"
+        )
+        return rows_written
+
+    def export_orders_to_binary(self, orders: Iterable[Order], directory: str) -> int:
+        """Export orders in the columnar binary format (one file per column) to a directory"""
+        from app.binary_export import write_orders_binary
+
+        started = time.perf_counter()
+        rows_written = write_orders_binary(orders, directory)
+        elapsed = time.perf_counter() - started
+        print(f"Exported {rows_written} orders in {elapsed:.2f}s")
+        return rows_written
+
+    def export_orders_incremental(
+        self, file_path: str, checkpoint_path: str = None
+    ) -> Tuple[int, int]:
+        """Append only the orders added since the last export, plus status change patches.
+
+        A JSON checkpoint next to the CSV keeps the last exported order ID, the time of
+        the last exported status change and the size the CSV was left at. Later status
+        changes to orders that were already exported are appended to
+        '<file>.patches.csv'. If the CSV has been rewritten since (e.g. by a full
+        export), or status changes since the checkpoint have dropped out of the
+        warehouse's bounded history, everything is exported again instead.
+        Returns the number of new order rows and patch rows written.
+        """
+        checkpoint_path = checkpoint_path or file_path + ".checkpoint"
+        patches_path = file_path + ".patches.csv"
+        status_changes = self.warehouse.status_changes if self.warehouse else ()
+        checkpoint = self._load_checkpoint(file_path, checkpoint_path, status_changes)
+
+        if checkpoint is None:
+            # Nothing to continue from, so start again with a full export
+            last_order_id = 0
+            last_change, changes_at_last = None, 0
+            rows_written = self.export_orders_to_csv(self.orders, file_path)
+            if os.path.exists(patches_path):
+                os.remove(patches_path)  # They patched the rows just rewritten
+            patches = []
+        else:
+            last_order_id = checkpoint["last_order_id"]
+            last_change = checkpoint["last_status_change"]
+            last_change = datetime.fromisoformat(last_change) if last_change else None
+            changes_at_last = checkpoint["changes_at_last"]
+            rows_written = self._write_csv(
+                file_path,
+                CSV_HEADERS,
+                self._csv_rows(self._orders_after(last_order_id)),
+                append=True,
             )
-            for order in orders:
-                writer.writerow(
-                    [
-                        order.order_id,
-                        order.item.name,
-                        order.quantity,
-                        f"£{order.total_price:.2f}",
-                        getattr(order.buyer, "name", "N/A"),
-                        getattr(order.seller, "name", "N/A"),
-                        order.status,
-                        order.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                    ]
+            patches = [
+                [order_id, status, changed_at.isoformat(" ", "seconds")]
+                for order_id, status, changed_at in _changes_since(
+                    status_changes, last_change, changes_at_last
                 )
+                if order_id <= last_order_id
+            ]
+            if patches:
+                self._write_csv(patches_path, PATCH_HEADERS, patches, append=True)
+
+        if status_changes:
+            last_change = status_changes[-1][2]
+            changes_at_last = 0
+            for _, _, changed_at in reversed(status_changes):
+                if changed_at != last_change:
+                    break
+                changes_at_last += 1
+
+        checkpoint = {
+            "last_order_id": self.orders[-1].order_id if self.orders else last_order_id,
+            "last_status_change": last_change.isoformat() if last_change else None,
+            "changes_at_last": changes_at_last,  # Changes sharing that exact time
+            "csv_size": os.path.getsize(file_path),
+        }
+        # Never leave a half-written checkpoint
+        write_atomically(checkpoint_path, json.dumps(checkpoint).encode("utf-8"))
+
+        return rows_written, len(patches)
+
+    def _orders_after(self, last_order_id: int) -> Iterable[Order]:
+        """Orders with a higher ID than last_order_id, asking an order store if there is one"""
+        if hasattr(self.orders, "orders"):
+            return self.orders.orders(after_id=last_order_id)
+        # Orders are kept in ID order, so the new ones are everything after the last ID
+        start = bisect.bisect_right(
+            self.orders, last_order_id, key=lambda order: order.order_id
+        )
+        return self.orders[start:]
+
+    def _load_checkpoint(self, file_path: str, checkpoint_path: str, status_changes):
+        """Read an incremental export checkpoint, or None if it cannot be continued from"""
+        if not (os.path.exists(file_path) and os.path.exists(checkpoint_path)):
+            return None
+        with open(checkpoint_path) as file:
+            checkpoint = json.load(file)
+        if checkpoint.get("csv_size") != os.path.getsize(file_path):
+            return None  # Rewritten since, or written by an older version
+
+        maxlen = getattr(status_changes, "maxlen", None)
+        if maxlen is not None and len(status_changes) >= maxlen:
+            # The oldest changes have been let go, check none since the checkpoint were
+            last_change = checkpoint["last_status_change"]
+            if last_change is None or status_changes[0][2] > datetime.fromisoformat(
+                last_change
+            ):
+                return None
+        return checkpoint
+
+    def _write_csv(
+        self,
+        file_path: str,
+        headers: List[str],
+        rows: Iterable[list],
+        append: bool = False,
+        batch_size: int = CSV_BATCH_SIZE,
+    ) -> int:
+        """Write rows to a CSV file in batches, with headers unless appending to an existing file"""
+        write_headers = not (append and os.path.exists(file_path))
+        rows_written = 0
+
+        with open(
+            file_path,
+            mode="a" if append else "w",
+            newline="",
+            buffering=CSV_BUFFER_SIZE,
+        ) as file:
+            writer = csv.writer(file)
+            if write_headers:
+                writer.writerow(headers)
+
+            rows = iter(rows)
+            batch = list(itertools.islice(rows, batch_size))
+            while batch:
+                writer.writerows(batch)
+                rows_written += len(batch)
+                batch = list(itertools.islice(rows, batch_size))
+
+        return rows_written
+
+    def _csv_rows(self, orders: Iterable[Order]) -> Iterator[list]:
+        """Yield one CSV row per order, formatting each distinct second only once"""
+        last_second = None
+        last_date = ""
+        for order in orders:
+            timestamp = order.timestamp
+            second = int(timestamp.timestamp())
+            if second != last_second:
+                # Same text as strftime("%Y-%m-%d %H:%M:%S"), but much cheaper
+                last_second = second
+                last_date = timestamp.isoformat(" ", "seconds")
+
+            yield [
+                order.order_id,
+                order.item.name,
+                order.quantity,
+                f"£{order.total_price:.2f}",
+                getattr(order.buyer, "name", "N/A"),
+                getattr(order.seller, "name", "N/A"),
+                order.status,
+                last_date,
+            ]
 
     def _summarise_order(self, order: Order) -> dict:
         """Helper function to summarize a single order"""
@@ -156,4 +1064,62 @@ class FinanceCompiler:
             print("No orders found.")
             return []
 
-        return [self._summarise_order(order) for order in self.orders]
+        return self._cached(
+            ("summarise_orders",),
+            lambda: [self._summarise_order(order) for order in self.orders],
+        )
+
+    def _sort_key(self, sort_by: str):
+        key = ORDER_SORT_KEYS.get(sort_by)
+        if key is None:
+            raise ValueError(
+                f"Unknown sort key '{sort_by}', expected one of {', '.join(ORDER_SORT_KEYS)}."
+            )
+        return key
+
+    def iter_order_summaries(
+        self, sort_by: str = None, reverse: bool = False
+    ) -> Iterator[dict]:
+        """Lazily summarise orders one at a time, in list order unless a sort key is given"""
+        if sort_by is None:
+            orders = reversed(self.orders) if reverse else iter(self.orders)
+        else:
+            orders = sorted(self.orders, key=self._sort_key(sort_by), reverse=reverse)
+        for order in orders:
+            yield self._summarise_order(order)
+
+    def page_count(self, page_size: int = ORDER_PAGE_SIZE) -> int:
+        return max(1, math.ceil(len(self.orders) / page_size))
+
+    def summarise_orders_page(
+        self,
+        page: int = 1,
+        page_size: int = ORDER_PAGE_SIZE,
+        sort_by: str = None,
+        reverse: bool = False,
+    ) -> List[dict]:
+        """Summarise one page of orders (pages start at 1), without touching the rest
+
+        In list order a page is a slice. With a sort key, only the orders up to the end
+        of the page are selected (a partial heap sort), so early pages stay cheap.
+        """
+        if page < 1 or page_size < 1:
+            raise ValueError("Page and page size must be at least 1.")
+        key = self._sort_key(sort_by) if sort_by is not None else None
+        return self._cached(
+            ("orders_page", page, page_size, sort_by, reverse),
+            lambda: self._summarise_page(page, page_size, key, reverse),
+        )
+
+    def _summarise_page(self, page: int, page_size: int, key, reverse: bool):
+        first = (page - 1) * page_size
+        if key is None:
+            if reverse:
+                last = len(self.orders) - first
+                orders = self.orders[max(last - page_size, 0) : max(last, 0)][::-1]
+            else:
+                orders = self.orders[first : first + page_size]
+        else:
+            select = heapq.nlargest if reverse else heapq.nsmallest
+            orders = select(first + page_size, self.orders, key=key)[first:]
+        return [self._summarise_order(order) for order in orders]
@@ -0,0 +1,219 @@
+# /app/finance_numpy.py
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from app.finance import (
+    GROUP_KEYS,
+    FinancialSummary,
+    GroupTotals,
+    group_key,
+)
+from app.order import Order
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+INITIAL_CAPACITY = 1024
+
+# Column name -> NumPy dtype
+COLUMNS = {
+    "quantity": "i8",
+    "total": "f8",
+    "status": "i2",
+    "kind": "i1",
+    "timestamp": "f8",  # Seconds since the epoch
+    "item": "i8",  # Index into self.names["item"]
+    "supplier": "i8",  # Index into self.names["supplier"], -1 for non-purchases
+    "customer": "i8",  # Index into self.names["customer"], -1 for non-sales
+}
+
+
+class NumpyFinanceBackend:
+    """Vectorised finance calculations over NumPy columns built from a list of orders.
+
+    Columns grow as orders are appended to the list. With a warehouse, status changes
+    arrive as events. Without one, statuses are read when an order is first seen.
+    Sums run sequentially (cumsum, add.at), so results match the pure-Python path.
+    """
+
+    def __init__(self, orders: List[Order], warehouse=None):
+        if numpy is None:
+            raise ImportError("NumPy is required for the NumPy finance backend.")
+
+        self.orders = orders
+        self._rows = 0
+        self._capacity = 0
+        self._columns: Dict[str, "numpy.ndarray"] = {}
+        self._row_by_id: Dict[int, int] = {}
+        self.statuses: List[str] = []
+        self._status_index: Dict[str, int] = {}
+        self.names: Dict[str, List[str]] = {by: [] for by in GROUP_KEYS}
+        self._name_index: Dict[str, Dict[str, int]] = {by: {} for by in GROUP_KEYS}
+        self._grow(INITIAL_CAPACITY)
+
+        if warehouse is not None:
+            warehouse.add_order_listener(self._on_order_event)
+            warehouse.add_archive_listener(self._on_orders_archived)
+
+    def _grow(self, capacity: int):
+        for name, dtype in COLUMNS.items():
+            column = numpy.zeros(capacity, dtype=dtype)
+            if name in self._columns:
+                column[: self._rows] = self._columns[name][: self._rows]
+            self._columns[name] = column
+        self._capacity = capacity
+
+    def _status_code(self, status: str) -> int:
+        code = self._status_index.get(status)
+        if code is None:
+            code = self._status_index[status] = len(self.statuses)
+            self.statuses.append(status)
+        return code
+
+    def _name_code(self, by: str, name: Optional[str]) -> int:
+        if name is None:
+            return -1
+        index = self._name_index[by]
+        code = index.get(name)
+        if code is None:
+            code = index[name] = len(self.names[by])
+            self.names[by].append(name)
+        return code
+
+    def refresh(self):
+        """Add columns for any orders appended to the list since the last call."""
+        new_orders = self.orders[self._rows :]
+        if not new_orders:
+            return
+
+        end = self._rows + len(new_orders)
+        if end > self._capacity:
+            self._grow(max(end, self._capacity * 2))
+
+        rows = slice(self._rows, end)
+        columns = self._columns
+        columns["quantity"][rows] = [order.quantity for order in new_orders]
+        columns["total"][rows] = [order.total_price for order in new_orders]
+        columns["status"][rows] = [self._status_code(o.status) for o in new_orders]
+        columns["kind"][rows] = [order.kind for order in new_orders]
+        columns["timestamp"][rows] = [o.timestamp.timestamp() for o in new_orders]
+        for by in GROUP_KEYS:
+            columns[by][rows] = [
+                self._name_code(by, group_key(order, by)) for order in new_orders
+            ]
+
+        for row, order in enumerate(new_orders, start=self._rows):
+            self._row_by_id[order.order_id] = row
+        self._rows = end
+
+    def _on_order_event(self, order: Order, previous_status: Optional[str]):
+        self.refresh()
+        if previous_status is not None:
+            row = self._row_by_id[order.order_id]
+            self._columns["status"][row] = self._status_code(order.status)
+
+    def _on_orders_archived(self, orders: List[Order], before: datetime):
+        # Rows no longer line up with the list, so rebuild them on next use
+        self._rows = 0
+        self._row_by_id = {}
+
+    def column(self, name: str) -> "numpy.ndarray":
+        """A read-only view of one column, covering every order seen so far."""
+        self.refresh()
+        view = self._columns[name][: self._rows]
+        view.flags.writeable = False
+        return view
+
+    def _mask(self, kind=None, status=None, start=None, end=None) -> "numpy.ndarray":
+        mask = numpy.ones(self._rows, dtype=bool)
+        if kind is not None:
+            mask &= self.column("kind") == kind
+        if status is not None:
+            code = self._status_index.get(status)
+            if code is None:
+                return numpy.zeros(self._rows, dtype=bool)
+            mask &= self.column("status") == code
+        if start is not None:
+            mask &= self.column("timestamp") >= start.timestamp()
+        if end is not None:
+            mask &= self.column("timestamp") < end.timestamp()
+        return mask
+
+    @staticmethod
+    def _sequential_sum(values: "numpy.ndarray") -> float:
+        # cumsum adds left to right like Python's sum, unlike numpy.sum's pairwise adds
+        return float(numpy.cumsum(values)[-1]) if len(values) else 0.0
+
+    def summarise(
+        self, start: datetime = None, end: datetime = None
+    ) -> FinancialSummary:
+        self.refresh()
+        in_range = self._mask(start=start, end=end)
+        kinds = self.column("kind")
+        statuses = self.column("status")
+        totals = self.column("total")
+
+        summary = FinancialSummary()
+        sales = in_range & (kinds == Order.SALE)
+        purchases = in_range & (kinds == Order.PURCHASE)
+        summary.customer_order_count = int(sales.sum())
+        summary.supplier_order_count = int(purchases.sum())
+
+        for code, status in enumerate(self.statuses):
+            in_status = in_range & (statuses == code)
+            count = int(in_status.sum())
+            if count:
+                summary.status_counts[status] = count
+                summary.status_totals[status] = self._sequential_sum(totals[in_status])
+            if status == "delivered":
+                summary.revenue = self._sequential_sum(totals[in_status & sales])
+            elif status == "received":
+                summary.costs = self._sequential_sum(totals[in_status & purchases])
+        return summary
+
+    def group_by(
+        self,
+        by: str = "item",
+        kind: int = None,
+        status: str = None,
+        start: datetime = None,
+        end: datetime = None,
+    ) -> Dict[str, GroupTotals]:
+        self.refresh()
+        codes = self.column(by)
+        mask = self._mask(kind, status, start, end) & (codes >= 0)
+        codes = codes[mask]
+
+        size = len(self.names[by])
+        counts = numpy.bincount(codes, minlength=size)
+        quantities = numpy.zeros(size, dtype="i8")
+        totals = numpy.zeros(size, dtype="f8")
+        numpy.add.at(quantities, codes, self.column("quantity")[mask])
+        numpy.add.at(totals, codes, self.column("total")[mask])  # In row order
+
+        # Same key order as the Python path: order of first appearance
+        _, first_rows = numpy.unique(codes, return_index=True)
+        groups = {}
+        for code in codes[numpy.sort(first_rows)]:
+            groups[self.names[by][code]] = GroupTotals(
+                int(counts[code]), int(quantities[code]), float(totals[code])
+            )
+        return groups
+
+    def order_value_percentiles(
+        self,
+        percentiles: Iterable[float] = (50, 90, 99),
+        kind: int = None,
+        status: str = None,
+        start: datetime = None,
+        end: datetime = None,
+    ) -> Dict[float, float]:
+        self.refresh()
+        values = self.column("total")[self._mask(kind, status, start, end)]
+        if not len(values):
+            return {}
+        percentiles = list(percentiles)
+        results = numpy.percentile(values, percentiles)
+        return {q: float(value) for q, value in zip(percentiles, results)}
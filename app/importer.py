@@ -0,0 +1,171 @@
+# /app/importer.py
+
+import csv
+import itertools
+import multiprocessing
+from datetime import datetime
+from typing import List, Tuple
+from app.customer import CustomerManager
+from app.finance import CSV_HEADERS
+from app.item import Item
+from app.order import Order
+from app.supplier import SupplierManager
+from app.warehouse import Warehouse
+
+IMPORT_CHUNK_SIZE = 50_000  # Lines handed to a parser (or worker process) at a time
+IMPORTED_DESCRIPTION = "Imported"
+
+ParsedRow = Tuple[int, str, int, float, str, str, str, datetime]
+
+
+def _parse_lines(lines: List[str]) -> List[ParsedRow]:
+    """Parse raw report lines into typed tuples (runs in worker processes too)."""
+    parsed = []
+    parse_date = datetime.fromisoformat  # Much faster than strptime for this layout
+    for row in csv.reader(lines):
+        order_id, item_name, quantity, total, buyer, seller, status, date = row
+        parsed.append(
+            (
+                int(order_id),
+                item_name,
+                int(quantity),
+                float(total.lstrip("£")),
+                buyer,
+                seller,
+                status,
+                parse_date(date),
+            )
+        )
+    return parsed
+
+
+class _OrderBuilder:
+    """Turns parsed rows into Orders, interning items and parties by name."""
+
+    def __init__(self, warehouse, customer_manager, supplier_manager):
+        self.warehouse = warehouse
+        self.customer_manager = customer_manager
+        self.supplier_manager = supplier_manager
+        self.customers = {c.name: c for c in customer_manager.customers.values()}
+        self.suppliers = {s.name: s for s in supplier_manager.suppliers.values()}
+        self.supplier_items = {}  # (supplier ID, item name) -> Item
+        self.items = {}  # Item name -> Item used for customer sales
+        self.orders: List[Order] = []
+        self.seen_ids = set()
+
+    @staticmethod
+    def _email_for(name: str) -> str:
+        return f"{'.'.join(name.lower().split()) or 'unknown'}@imported.invalid"
+
+    def _customer(self, name: str):
+        customer = self.customers.get(name)
+        if customer is None:
+            customer = self.customer_manager.create_customer(
+                name, self._email_for(name)
+            )
+            self.customers[name] = customer
+        return customer
+
+    def _supplier(self, name: str):
+        supplier = self.suppliers.get(name)
+        if supplier is None:
+            supplier = self.supplier_manager.create_supplier(
+                name, self._email_for(name)
+            )
+            self.suppliers[name] = supplier
+        return supplier
+
+    def _supplier_item(self, supplier, name: str, unit_price: float) -> Item:
+        key = (supplier.supplier_id, name)
+        item = self.supplier_items.get(key)
+        if item is None:
+            item = next((i for i in supplier.items_supplied if i.name == name), None)
+            if item is None:
+                item = self.supplier_manager.create_supplier_item(
+                    supplier.supplier_id, name, IMPORTED_DESCRIPTION, unit_price
+                )
+            self.supplier_items[key] = item
+            self.items.setdefault(name, item)
+        return item
+
+    def _sale_item(self, name: str, unit_price: float) -> Item:
+        item = self.items.get(name)
+        if item is None:
+            item = self.items[name] = Item(name, IMPORTED_DESCRIPTION, unit_price, None)
+        return item
+
+    def add_rows(self, rows: List[ParsedRow]):
+        warehouse_name = self.warehouse.name
+        for order_id, item_name, quantity, total, buyer, seller, status, date in rows:
+            if order_id in self.seen_ids or self.warehouse.get_order(order_id):
+                raise ValueError(f"Order with ID {order_id} already exists.")
+            self.seen_ids.add(order_id)
+            unit_price = total / quantity if quantity else 0.0
+
+            if seller == warehouse_name:
+                kind = Order.SALE
+                buyer_party = self._customer(buyer)
+                seller_party = self.warehouse
+                item = self._sale_item(item_name, unit_price)
+            elif buyer == warehouse_name:
+                kind = Order.PURCHASE
+                buyer_party = self.warehouse
+                seller_party = self._supplier(seller)
+                item = self._supplier_item(seller_party, item_name, unit_price)
+            else:
+                raise ValueError(
+                    f"Order with ID {order_id} does not involve {warehouse_name}."
+                )
+
+            self.orders.append(
+                Order.from_record(
+                    order_id=order_id,
+                    item=item,
+                    quantity=quantity,
+                    buyer=buyer_party,
+                    seller=seller_party,
+                    status=status,
+                    timestamp=date,
+                    total_price=total,
+                    kind=kind,
+                )
+            )
+
+
+def import_orders_csv(
+    file_path: str,
+    warehouse: Warehouse,
+    customer_manager: CustomerManager,
+    supplier_manager: SupplierManager,
+    processes: int = 1,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+) -> int:
+    """Load a report in the export_orders_to_csv layout back into a warehouse.
+
+    Buyers and sellers are matched to existing customers and suppliers by name, and
+    created (with a placeholder email) when missing. With processes > 1, chunks of
+    lines are parsed in worker processes. Returns the number of orders imported.
+    """
+    builder = _OrderBuilder(warehouse, customer_manager, supplier_manager)
+
+    with open(file_path, newline="") as file:
+        header = next(csv.reader([file.readline()]), [])
+        if header != CSV_HEADERS:
+            raise ValueError(f"{file_path} is not an order report.")
+
+        chunks = iter(lambda: list(itertools.islice(file, chunk_size)), [])
+        if processes > 1:
+            with multiprocessing.Pool(processes) as pool:
+                for rows in pool.imap(_parse_lines, chunks):
+                    builder.add_rows(rows)
+        else:
+            for chunk in chunks:
+                builder.add_rows(_parse_lines(chunk))
+
+    # Rebuild the ID counter so new orders don't reuse imported IDs
+    if builder.orders:
+        highest_id = max(order.order_id for order in builder.orders)
+        Order._id_counter = max(Order._id_counter, highest_id + 1)
+
+    warehouse.load_orders(builder.orders)
+    return len(builder.orders)
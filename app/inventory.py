@@ -1,24 +1,71 @@
 # /app/inventory.py
 
-from typing import Dict, List, Tuple
+import heapq
+from typing import Callable, Dict, List, Optional, Tuple, Union
 from app.item import Item
 
+ItemKey = Union[str, Tuple[str, str]]  # An item name, or its (name, description)
+
 
 class Inventory:
     def __init__(self):
         self.stock: Dict[Item, Tuple[int, int]] = {}
+        self._stored_items: Dict[Item, Item] = {}  # Any equal item -> stored copy
+        self._items_by_name: Dict[str, List[Item]] = {}  # One entry per description
+        self._low_stock: Dict[Item, int] = {}  # Item -> how far below threshold
+        self._listeners: List[Callable[[Item], None]] = []
 
-    def add_stock(self, item: Item, quantity: int, threshold: int = None) -> None:
-        item_copy = item.clone()  # Ensure local copy
-        if item_copy in self.stock:
-            current_qty, current_threshold = self.stock[item_copy]
-            new_threshold = threshold if threshold is not None else current_threshold
-            self.stock[item_copy] = (current_qty + quantity, new_threshold)
+    def __getstate__(self):
+        """Pickle without listeners, their owners register again when they are restored."""
+        state = self.__dict__.copy()
+        state["_listeners"] = []
+        return state
+
+    def add_listener(self, listener: Callable[[Item], None]) -> None:
+        """Register a callback that is given the stored item whenever its stock line changes."""
+        self._listeners.append(listener)
+
+    def _notify(self, item: Item) -> None:
+        """Update the low stock set for a changed stock line and tell the listeners."""
+        quantity, threshold = self.stock.get(item, (0, 0))
+        if quantity < threshold:
+            self._low_stock[item] = threshold - quantity
         else:
-            self.stock[item_copy] = (
-                quantity,
-                threshold if threshold is not None else 0,
-            )
+            self._low_stock.pop(item, None)
+
+        for listener in self._listeners:
+            listener(item)
+
+    def get_stored_item(self, item: Item) -> Optional[Item]:
+        """Return the inventory's own copy of an item, or None if it is not stocked."""
+        return self._stored_items.get(item)
+
+    def _store(self, item: Item) -> Item:
+        stored_item = self._stored_items.get(item)
+        if stored_item is None:
+            # First receipt: keep a local copy so warehouse prices don't change the supplier's
+            stored_item = item.clone()
+            self._stored_items[stored_item] = stored_item
+            self._items_by_name.setdefault(stored_item.name, []).append(stored_item)
+        return stored_item
+
+    def add_stock(self, item: Item, quantity: int, threshold: int = None) -> None:
+        stored_item = self._store(item)
+        current_qty, current_threshold = self.stock.get(stored_item, (0, 0))
+        new_threshold = threshold if threshold is not None else current_threshold
+        self.stock[stored_item] = (current_qty + quantity, new_threshold)
+        self._notify(stored_item)
+
+    def set_stock(
+        self, item: Item, quantity: int, threshold: int, price: float = None
+    ) -> Item:
+        """Set a whole stock line at once (e.g. when restoring saved state) and return the stored item."""
+        stored_item = self._store(item)
+        if price is not None:
+            stored_item.price = price
+        self.stock[stored_item] = (quantity, threshold)
+        self._notify(stored_item)
+        return stored_item
 
     def remove_stock(self, item: Item, quantity: int) -> None:
         if item not in self.stock:
@@ -29,31 +76,72 @@ class Inventory:
             raise ValueError("Not enough stock available.")
 
         self.stock[item] = (current_quantity - quantity, threshold)
+        self._notify(self._stored_items.get(item, item))
 
     def check_stock(self, item: Item) -> int:
         return self.stock.get(item, (0, 0))[0]
 
-    def set_threshold(self, item_name: str, new_threshold: int) -> None:
-        for item, (quantity, threshold) in self.stock.items():
-            if item.name == item_name:
-                self.stock[item] = (quantity, new_threshold)
-                return
-        raise ValueError(f"Item '{item_name}' not found in inventory.")
-
-    def update_price(self, item_name: str, new_price: float) -> None:
-        for item in self.stock.keys():
-            if item.name == item_name:
-                item.price = new_price
-                return
-        raise ValueError(f"Item '{item_name}' not found in inventory.")
-
-    def low_stock_alerts(self) -> List[Item]:
+    def _find_by_name(self, item_name: str, description: str = None) -> Item:
+        """Look up a stocked item by name, and by description if several share the name."""
+        matches = [
+            item
+            for item in self._items_by_name.get(item_name, ())
+            if description is None or item.description == description
+        ]
+        if not matches:
+            raise ValueError(f"Item '{item_name}' not found in inventory.")
+        if len(matches) > 1:
+            raise ValueError(
+                f"Several items are called '{item_name}', give the description too."
+            )
+        return matches[0]
+
+    def _find_by_key(self, key: ItemKey) -> Item:
+        """Look up a stocked item by name or by (name, description)."""
+        if isinstance(key, tuple):
+            return self._find_by_name(*key)
+        return self._find_by_name(key)
+
+    def set_threshold(
+        self, item_name: str, new_threshold: int, description: str = None
+    ) -> None:
+        self.set_thresholds({(item_name, description): new_threshold})
+
+    def set_thresholds(self, thresholds: Dict[ItemKey, int]) -> None:
+        """Set the threshold of several items at once, keyed by name or (name, description)."""
+        # Resolve every key first so a bad one leaves the inventory untouched
+        updates = [
+            (self._find_by_key(key), new_threshold)
+            for key, new_threshold in thresholds.items()
+        ]
+        for item, new_threshold in updates:
+            quantity, _ = self.stock[item]
+            self.stock[item] = (quantity, new_threshold)
+            self._notify(item)
+
+    def update_price(
+        self, item_name: str, new_price: float, description: str = None
+    ) -> None:
+        self.update_prices({(item_name, description): new_price})
+
+    def update_prices(self, prices: Dict[ItemKey, float]) -> None:
+        """Update the price of several items at once, keyed by name or (name, description)."""
+        updates = [
+            (self._find_by_key(key), new_price) for key, new_price in prices.items()
+        ]
+        for item, new_price in updates:
+            item.price = new_price
+            self._notify(item)
+
+    def low_stock_alerts(self, limit: int = None) -> List[Item]:
+        """Return items below their threshold, most urgent first (optionally the top N only)."""
         if not self.stock:
             print("Nothing to see here...")
             return []
-        low_stock = [
-            item for item, (qty, threshold) in self.stock.items() if qty < threshold
-        ]
+        if limit is None:
+            low_stock = sorted(self._low_stock, key=self._low_stock.get, reverse=True)
+        else:
+            low_stock = heapq.nlargest(limit, self._low_stock, key=self._low_stock.get)
         if not low_stock:
             print("All stock levels are healthy.")
         return low_stock
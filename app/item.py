@@ -2,11 +2,17 @@
 
 
 class Item:
+    # The name and description are the item's identity and should not change after creation
+    __slots__ = ("name", "description", "price", "supplier", "_hash")
+
     def __init__(self, name: str, description: str, price: float, supplier):
         self.name = name
         self.description = description
         self.price = price
         self.supplier = supplier
+        self._hash = hash(
+            (name, description)
+        )  # Cached, items are hashed on every stock lookup
 
     def __str__(self):
         return f"{self.name} - {self.description} (£{self.price:.2f})"
@@ -14,11 +20,21 @@ class Item:
     def __repr__(self):
         return f"Item({self.name})"
 
+    def __getstate__(self):
+        """Pickle without the cached hash, string hashes differ from one process to the next."""
+        return self.name, self.description, self.price, self.supplier
+
+    def __setstate__(self, state):
+        self.name, self.description, self.price, self.supplier = state
+        self._hash = hash((self.name, self.description))
+
     def __hash__(self):
         # Only use immutable fields for hashing
-        return hash((self.name, self.description))
+        return self._hash
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return isinstance(other, Item) and (self.name, self.description) == (
             other.name,
             other.description,
@@ -0,0 +1,575 @@
+# /app/journal.py
+
+import json
+import os
+import shutil
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+from app.customer import Customer, CustomerManager
+from app.item import Item
+from app.order import Order
+from app.storage_util import sync_directory
+from app.supplier import Supplier, SupplierManager
+from app.warehouse import Warehouse
+
+JOURNAL_FILE = "warehouse.journal"
+JOURNAL_GROUP_SIZE = 1000  # Records that may share one fsync during a burst
+JOURNAL_COMMIT_INTERVAL = 0.05  # Seconds a record may wait for the rest of its group
+WAREHOUSE_REF = "warehouse"
+
+
+def _party_ref(party) -> Optional[str]:
+    """Refer to a buyer or seller by its ID, so replay can find the same object."""
+    if isinstance(party, Warehouse):
+        return WAREHOUSE_REF
+    return getattr(party, "person_id", None)
+
+
+def _supplier_ref(item: Item) -> Optional[str]:
+    return getattr(item.supplier, "supplier_id", None)
+
+
+class ChangeRecorder(ABC):
+    """Records every change to a warehouse and its managers, committing in groups.
+
+    A record is committed straight away unless another commit happened less than
+    commit_interval ago, in which case it waits for up to group_size records, or for
+    a background thread to commit it once the interval has passed (or close).
+    Commits only ever happen between operations: the records of one warehouse
+    operation (see transaction) are committed together. Subclasses decide how a
+    record is written (_write) and made durable (_sync).
+    """
+
+    def __init__(
+        self,
+        group_size: int = JOURNAL_GROUP_SIZE,
+        commit_interval: float = JOURNAL_COMMIT_INTERVAL,
+    ):
+        self.group_size = group_size
+        self.commit_interval = commit_interval
+        self.commits = 0
+        self.records = 0
+        self._pending = 0
+        self._last_commit = float("-inf")  # So the first record commits straight away
+        self._depth = 0  # How many transactions are open
+        self._commit_now = False  # Set by a record that must not wait for its group
+        # Held while writing or committing, the flusher thread commits too
+        self._lock = threading.RLock()
+        self._stop_flushing = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    @abstractmethod
+    def _write(self, op: str, fields: dict):
+        """Write one record, without waiting for it to be durable."""
+
+    @abstractmethod
+    def _sync(self):
+        """Make every record written so far durable."""
+
+    def record(self, op: str, **fields):
+        """Record one change."""
+        with self._lock:
+            self._write(op, fields)
+            self._pending += 1
+            self.records += 1
+            if not self._depth:
+                self._commit_if_due()
+
+    @contextmanager
+    def transaction(self):
+        """Hold back commits until the outermost transaction ends.
+
+        Everything recorded inside is committed together, so a crash never keeps half
+        of an operation. Transactions nest.
+        """
+        with self._lock:
+            self._depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._depth -= 1
+                if not self._depth and self._pending:
+                    self._commit_if_due()
+
+    def _commit_if_due(self):
+        if (
+            self._commit_now
+            or self._pending >= self.group_size
+            or time.monotonic() - self._last_commit >= self.commit_interval
+        ):
+            self.commit()
+        elif self._flusher is None:
+            self._flusher = threading.Thread(
+                target=self._flush_when_idle, name="change-flusher", daemon=True
+            )
+            self._flusher.start()
+
+    def _flush_when_idle(self):
+        """Commit records left waiting for their group once commit_interval has passed."""
+        while not self._stop_flushing.wait(self.commit_interval):
+            with self._lock:
+                if (
+                    self._pending
+                    and not self._depth
+                    and time.monotonic() - self._last_commit >= self.commit_interval
+                ):
+                    self.commit()
+
+    def commit(self):
+        """Make every record written so far durable at once."""
+        with self._lock:
+            if self._pending:
+                self._sync()
+                self._pending = 0
+                self.commits += 1
+            self._commit_now = False
+            self._last_commit = time.monotonic()
+
+    def close(self):
+        """Stop the background flusher and commit whatever is still pending."""
+        self._stop_flushing.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def attach(
+        self,
+        warehouse: Warehouse,
+        customer_manager: CustomerManager,
+        supplier_manager: SupplierManager,
+    ):
+        """Start recording every change made through the warehouse and the managers."""
+        self._inventory = warehouse.inventory
+        self._status_changes = warehouse.status_changes
+        warehouse.add_operation_hook(self.transaction)
+        customer_manager.add_listener(self._on_customer_event)
+        supplier_manager.add_listener(self._on_supplier_event)
+        warehouse.inventory.add_listener(self._on_stock_change)
+        warehouse.add_order_listener(self._on_order_event)
+        warehouse.add_archive_listener(self._on_orders_archived)
+
+    def _on_customer_event(self, event: str, customer: Customer):
+        if event == "created":
+            self.record(
+                "customer",
+                id=customer.customer_id,
+                name=customer.name,
+                email=customer.email,
+            )
+        elif event == "updated":
+            self.record(
+                "update_customer",
+                id=customer.customer_id,
+                name=customer.name,
+                email=customer.email,
+            )
+        elif event == "deleted":
+            self.record("delete_customer", id=customer.customer_id)
+
+    def _on_supplier_event(self, event: str, supplier: Supplier, item: Item = None):
+        if event == "created":
+            self.record(
+                "supplier",
+                id=supplier.supplier_id,
+                name=supplier.name,
+                email=supplier.email,
+            )
+        elif event == "updated":
+            self.record(
+                "update_supplier",
+                id=supplier.supplier_id,
+                name=supplier.name,
+                email=supplier.email,
+            )
+        elif event == "item_added":
+            self.record(
+                "supplier_item",
+                supplier=supplier.supplier_id,
+                name=item.name,
+                description=item.description,
+                price=item.price,
+            )
+        elif event == "item_removed":
+            self.record(
+                "remove_supplier_item",
+                supplier=supplier.supplier_id,
+                name=item.name,
+                description=item.description,
+            )
+
+    def _on_stock_change(self, item: Item):
+        # The whole stock line is recorded, so receipts, sales, prices and thresholds
+        # all replay the same way
+        quantity, threshold = self._inventory.stock.get(item, (0, 0))
+        self.record(
+            "stock",
+            name=item.name,
+            description=item.description,
+            price=item.price,
+            supplier=_supplier_ref(item),
+            quantity=quantity,
+            threshold=threshold,
+        )
+
+    def _on_order_event(self, order: Order, previous_status: Optional[str]):
+        if previous_status is not None:
+            # Keep the warehouse's own time, so replay rebuilds the same status changes
+            _, _, changed_at = self._status_changes[-1]
+            self.record(
+                "status",
+                id=order.order_id,
+                status=order.status,
+                at=changed_at.isoformat(),
+            )
+            return
+        self.record(
+            "order",
+            id=order.order_id,
+            name=order.item.name,
+            description=order.item.description,
+            price=order.item.price,
+            supplier=_supplier_ref(order.item),
+            quantity=order.quantity,
+            total=order.total_price,
+            buyer=_party_ref(order.buyer),
+            seller=_party_ref(order.seller),
+            status=order.status,
+            kind=order.kind,
+            timestamp=order.timestamp.isoformat(),
+        )
+
+    def _on_orders_archived(self, orders: List[Order], before: datetime):
+        # Replay removes the same orders, they were in the same state at this point.
+        # An archive only publishes them once this is durable, so commit it at once.
+        with self._lock:
+            self._commit_now = True
+            self.record("archive", before=before.isoformat())
+
+
+class Journal(ChangeRecorder):
+    """An append-only file of every change, one JSON line each, fsynced in groups.
+
+    replay_journal rebuilds the state from it. Offsets into the journal (such as the
+    one a snapshot keeps) count from the first record ever written, so they stay
+    valid after compact() drops the records a snapshot already covers.
+    """
+
+    def __init__(
+        self,
+        path: str = JOURNAL_FILE,
+        group_size: int = JOURNAL_GROUP_SIZE,
+        commit_interval: float = JOURNAL_COMMIT_INTERVAL,
+    ):
+        super().__init__(group_size, commit_interval)
+        self.path = path
+        _truncate_torn_tail(path)
+        self.base, self._header_size = 0, 0
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                self.base, self._header_size = _read_base(file)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _write(self, op: str, fields: dict):
+        self._file.write(_record_line(op, fields))
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    @property
+    def offset(self) -> int:
+        """Commit anything pending and return the journal's length in bytes."""
+        with self._lock:
+            self.commit()
+            size = os.fstat(self._file.fileno()).st_size
+            return self.base + size - self._header_size
+
+    def compact(self, offset: int):
+        """Drop the records before an offset, once a durable snapshot covers them.
+
+        The records after it are copied to a new file that starts with a 'base' line
+        holding the offset, which then replaces the journal atomically.
+        """
+        with self._lock:
+            self.commit()
+            if offset <= self.base:
+                return
+            header = _record_line("base", {"offset": offset}).encode("utf-8")
+            temporary_path = f"{self.path}.tmp"
+            with open(self.path, "rb") as source, open(temporary_path, "wb") as target:
+                source.seek(self._header_size + offset - self.base)
+                target.write(header)
+                shutil.copyfileobj(source, target)
+                target.flush()
+                os.fsync(target.fileno())
+            self._file.close()
+            os.replace(temporary_path, self.path)
+            sync_directory(os.path.dirname(self.path) or ".")
+            self._file = open(self.path, "a", encoding="utf-8")
+            self.base, self._header_size = offset, len(header)
+
+    def close(self):
+        if not self._file.closed:
+            super().close()
+            self._file.close()
+
+
+def _record_line(op: str, fields: dict) -> str:
+    return json.dumps({"op": op, **fields}, separators=(",", ":")) + "\n"
+
+
+def _read_base(file: BinaryIO) -> Tuple[int, int]:
+    """The offset a compacted journal starts from, and the length of the line saying so."""
+    line = file.readline()
+    if line.startswith(b'{"op":"base"'):
+        return json.loads(line)["offset"], len(line)
+    return 0, 0
+
+
+def _truncate_torn_tail(path: str, chunk_size: int = 64 * 1024):
+    """Cut a half-written last line off the journal, so new records start on a line of their own."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r+b") as file:
+        end = os.fstat(file.fileno()).st_size
+        good = end
+        while good > 0:
+            start = max(good - chunk_size, 0)
+            file.seek(start)
+            chunk = file.read(good - start)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                good = start + newline + 1
+                break
+            good = start
+        if good < end:
+            file.truncate(good)
+            file.flush()
+            os.fsync(file.fileno())
+
+
+def _id_number(person_id: str) -> int:
+    return int(person_id.rsplit("_", 1)[1])
+
+
+class _Replayer:
+    """Applies journal records to a warehouse and its managers."""
+
+    def __init__(self, warehouse, customer_manager, supplier_manager):
+        self.warehouse = warehouse
+        self.customer_manager = customer_manager
+        self.supplier_manager = supplier_manager
+        # Deleted customers stay here, their old orders still refer to them
+        self.parties = {WAREHOUSE_REF: warehouse}
+        self.parties.update(customer_manager.customers)
+        self.parties.update(supplier_manager.suppliers)
+        self.orders: Dict[int, Order] = {}  # Replayed orders not yet loaded
+        self.handlers = {
+            "customer": self._customer,
+            "update_customer": self._update_customer,
+            "delete_customer": self._delete_customer,
+            "supplier": self._supplier,
+            "update_supplier": self._update_supplier,
+            "supplier_item": self._supplier_item,
+            "remove_supplier_item": self._remove_supplier_item,
+            "stock": self._stock,
+            "received_item": self._received_item,
+            "order": self._order,
+            "status": self._status,
+            "archive": self._archive,
+        }
+
+    def apply(self, record: dict):
+        handler = self.handlers.get(record["op"])
+        if handler is None:
+            raise ValueError(f"Unknown journal record '{record['op']}'.")
+        handler(record)
+
+    def _customer(self, record: dict):
+        # Take the recorded ID by winding the counter to it
+        counter = Customer._customer_counter
+        Customer._customer_counter = _id_number(record["id"])
+        customer = self.customer_manager.create_customer(
+            record["name"], record["email"]
+        )
+        Customer._customer_counter = max(counter, Customer._customer_counter)
+        self.parties[customer.customer_id] = customer
+
+    def _update_customer(self, record: dict):
+        self.customer_manager.update_customer(
+            record["id"], record["name"], record["email"]
+        )
+
+    def _delete_customer(self, record: dict):
+        self.customer_manager.delete_customer(record["id"])
+
+    def _supplier(self, record: dict):
+        counter = Supplier._supplier_counter
+        Supplier._supplier_counter = _id_number(record["id"])
+        supplier = self.supplier_manager.create_supplier(
+            record["name"], record["email"]
+        )
+        Supplier._supplier_counter = max(counter, Supplier._supplier_counter)
+        self.parties[supplier.supplier_id] = supplier
+
+    def _update_supplier(self, record: dict):
+        self.supplier_manager.update_supplier(
+            record["id"], record["name"], record["email"]
+        )
+
+    def _supplier_item(self, record: dict):
+        self.supplier_manager.create_supplier_item(
+            record["supplier"], record["name"], record["description"], record["price"]
+        )
+
+    def _remove_supplier_item(self, record: dict):
+        item = self.supplier_manager.find_supplier_item(
+            record["supplier"], record["name"], record["description"]
+        )
+        if item is not None:
+            self.supplier_manager.remove_item_from_supplier(record["supplier"], item)
+
+    def _item(self, record: dict) -> Item:
+        """Find the object the recorded item was: a supplier's item, or a stocked copy."""
+        supplier_id = record["supplier"]
+        item = Item(
+            record["name"],
+            record["description"],
+            record["price"],
+            self.parties.get(supplier_id),
+        )
+        if record.get("kind") == Order.PURCHASE and supplier_id is not None:
+            supplier_item = self.supplier_manager.find_supplier_item(
+                supplier_id, item.name, item.description
+            )
+            if supplier_item is not None:
+                return supplier_item
+        return self.warehouse.inventory.get_stored_item(item) or item
+
+    def _stock(self, record: dict):
+        self.warehouse.inventory.set_stock(
+            self._item(record), record["quantity"], record["threshold"], record["price"]
+        )
+
+    def _received_item(self, record: dict):
+        item = Item(record["name"], record["description"], 0.0, None)
+        self.warehouse.restore_received_item(item)
+
+    def _order(self, record: dict):
+        self.orders[record["id"]] = Order.from_record(
+            order_id=record["id"],
+            item=self._item(record),
+            quantity=record["quantity"],
+            buyer=self.parties.get(record["buyer"]),
+            seller=self.parties.get(record["seller"]),
+            status=record["status"],
+            timestamp=datetime.fromisoformat(record["timestamp"]),
+            total_price=record["total"],
+            kind=record["kind"],
+        )
+
+    def _status(self, record: dict):
+        # Journals from before status times were kept get the replay time instead
+        at = record.get("at")
+        changed_at = datetime.fromisoformat(at) if at is not None else datetime.now()
+        order = self.orders.get(record["id"])
+        if order is not None:
+            order.status = record["status"]  # Not indexed yet
+            self.warehouse.status_changes.append(
+                (order.order_id, order.status, changed_at)
+            )
+        else:
+            self.warehouse.set_order_status(record["id"], record["status"], changed_at)
+
+    def _archive(self, record: dict):
+        self.finish()  # Load the orders replayed so far, so they can be removed
+        self.warehouse.remove_closed_orders(datetime.fromisoformat(record["before"]))
+
+    def finish(self):
+        """Load the replayed orders in one batch and move the ID counter past them."""
+        if self.orders:
+            self.warehouse.load_orders(list(self.orders.values()))
+            Order._id_counter = max(Order._id_counter, max(self.orders) + 1)
+            self.orders = {}
+
+
+def apply_records(
+    records: Iterable[dict],
+    warehouse: Warehouse,
+    customer_manager: CustomerManager,
+    supplier_manager: SupplierManager,
+) -> int:
+    """Apply change records to a warehouse and its managers, returning how many were applied."""
+    replayer = _Replayer(warehouse, customer_manager, supplier_manager)
+    applied = 0
+    for record in records:
+        replayer.apply(record)
+        applied += 1
+    replayer.finish()
+    return applied
+
+
+def _read_journal(path: str, offset: int) -> Iterator[dict]:
+    with open(path, "rb") as file:
+        base, header_size = _read_base(file)
+        if offset < base:
+            raise ValueError(f"{path} was compacted past offset {offset}.")
+        position = header_size + offset - base
+        if position > os.fstat(file.fileno()).st_size:
+            raise ValueError(f"{path} is shorter than the snapshot expects.")
+        file.seek(position)
+        lines = iter(file)
+        for number, line in enumerate(lines, start=1):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                if next(lines, None) is None and not line.endswith(b"\n"):
+                    print(f"Warning: Ignoring an incomplete last record in {path}.")
+                    return
+                raise ValueError(f"{path} is damaged at record {number}.")
+            yield record
+
+
+def replay_journal(
+    path: str,
+    warehouse: Warehouse,
+    customer_manager: CustomerManager,
+    supplier_manager: SupplierManager,
+    offset: int = 0,
+) -> int:
+    """Rebuild the warehouse and managers from a journal, returning the records applied.
+
+    Replay starts offset bytes in, where a snapshot left off. A missing journal
+    replays nothing. A torn last line (from a crash mid-write) is ignored, a damaged
+    line anywhere else is an error.
+    """
+    if not os.path.exists(path):
+        return 0
+    return apply_records(
+        _read_journal(path, offset), warehouse, customer_manager, supplier_manager
+    )
+
+
+def open_journal(
+    path: str,
+    warehouse: Warehouse,
+    customer_manager: CustomerManager,
+    supplier_manager: SupplierManager,
+) -> Journal:
+    """Replay an existing journal into the given objects, then keep recording to it."""
+    replay_journal(path, warehouse, customer_manager, supplier_manager)
+    journal = Journal(path)
+    journal.attach(warehouse, customer_manager, supplier_manager)
+    return journal
@@ -8,6 +8,24 @@ from app.item import Item
 class Order:
     _id_counter = 1
 
+    # Fixed attribute layout, no per-order __dict__ (matters with millions of orders)
+    __slots__ = (
+        "order_id",
+        "item",
+        "quantity",
+        "timestamp",
+        "buyer",
+        "seller",
+        "total_price",
+        "status",
+        "kind",
+    )
+
+    # Order kinds, precomputed so finance reports can classify orders with one int compare
+    OTHER = 0
+    SALE = 1  # Warehouse sells to a customer
+    PURCHASE = 2  # Warehouse buys from a supplier
+
     def __init__(
         self,
         item: Item,
@@ -15,6 +33,7 @@ class Order:
         buyer: Union["Customer", "Warehouse"],
         seller: Union["Warehouse", "Supplier"],
         status: str = "pending",
+        kind: int = None,
     ):
         """Initialises an Order instance with the given item, quantity, buyer, seller, and status."""
         self.order_id = Order._id_counter
@@ -27,6 +46,45 @@ class Order:
         self.seller = seller
         self.total_price = item.price * quantity
         self.status = status
+        self.kind = kind if kind is not None else Order._kind_for_seller(seller)
+
+    @classmethod
+    def from_record(
+        cls,
+        order_id: int,
+        item: Item,
+        quantity: int,
+        buyer,
+        seller,
+        status: str,
+        timestamp: datetime,
+        total_price: float = None,
+        kind: int = None,
+    ) -> "Order":
+        """Rebuild an existing order (e.g. from a log or an export) without taking a new ID."""
+        order = cls.__new__(cls)
+        order.order_id = order_id
+        order.item = item
+        order.quantity = quantity
+        order.timestamp = timestamp
+        order.buyer = buyer
+        order.seller = seller
+        order.total_price = (
+            total_price if total_price is not None else item.price * quantity
+        )
+        order.status = status
+        order.kind = kind if kind is not None else Order._kind_for_seller(seller)
+        return order
+
+    @staticmethod
+    def _kind_for_seller(seller) -> int:
+        """Work out the order kind from the seller when the caller does not say."""
+        seller_type = seller.__class__.__name__
+        if seller_type == "Warehouse":
+            return Order.SALE
+        if seller_type == "Supplier":
+            return Order.PURCHASE
+        return Order.OTHER
 
     def __repr__(self):
         return f"Order #{self.order_id} ({self.item.name}, Qty: {self.quantity}, Buyer: {getattr(self.buyer, 'name', 'Warehouse')}, Status: {self.status})"
@@ -0,0 +1,118 @@
+# /app/order_log.py
+
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional
+from app.order import Order
+
+
+class OrderLog:
+    """A compact, columnar, append-only store of orders.
+
+    Each order is kept as one row across parallel typed arrays instead of as an
+    Order object. Items, buyers and sellers are stored once in lookup tables and
+    referenced by index. Order objects are only built when a row is read.
+    """
+
+    STATUSES = ["pending", "received", "delivered"]
+
+    def __init__(self, orders: Iterable[Order] = ()):
+        self.order_ids = array("q")
+        self.item_indices = array("q")
+        self.quantities = array("q")
+        self.total_pence = array("q")  # Total price in pence, avoids float drift
+        self.status_codes = array("b")
+        self.kinds = array("b")
+        self.timestamps = array("d")  # Seconds since the epoch
+        self.buyer_indices = array("q")
+        self.seller_indices = array("q")
+
+        self.items = []  # Row item index -> Item
+        self.parties = []  # Row buyer/seller index -> Customer, Supplier or Warehouse
+        self.statuses = list(OrderLog.STATUSES)  # Status code -> status name
+
+        self._item_index: Dict[int, int] = {}  # id(item) -> index in self.items
+        self._party_index: Dict[int, int] = {}  # id(party) -> index in self.parties
+        self._status_index = {status: code for code, status in enumerate(self.statuses)}
+        self._row_by_id: Dict[int, int] = {}
+
+        self.extend(orders)
+
+    def _intern(self, value, table: list, index: Dict[int, int]) -> int:
+        key = id(value)
+        position = index.get(key)
+        if position is None:
+            position = index[key] = len(table)
+            table.append(value)
+        return position
+
+    def status_code(self, status: str) -> int:
+        """Get the small integer code for a status, adding new statuses as they appear."""
+        code = self._status_index.get(status)
+        if code is None:
+            code = self._status_index[status] = len(self.statuses)
+            self.statuses.append(status)
+        return code
+
+    def append(self, order: Order):
+        """Add an order to the end of the log."""
+        self._row_by_id[order.order_id] = len(self.order_ids)
+        self.order_ids.append(order.order_id)
+        self.item_indices.append(self._intern(order.item, self.items, self._item_index))
+        self.quantities.append(order.quantity)
+        self.total_pence.append(round(order.total_price * 100))
+        self.status_codes.append(self.status_code(order.status))
+        self.kinds.append(order.kind)
+        self.timestamps.append(order.timestamp.timestamp())
+        self.buyer_indices.append(
+            self._intern(order.buyer, self.parties, self._party_index)
+        )
+        self.seller_indices.append(
+            self._intern(order.seller, self.parties, self._party_index)
+        )
+
+    def extend(self, orders: Iterable[Order]):
+        for order in orders:
+            self.append(order)
+
+    def set_status(self, order_id: int, status: str):
+        """Change the status of a logged order in place."""
+        row = self._row_by_id.get(order_id)
+        if row is None:
+            raise ValueError(f"Order with ID {order_id} not found in the log.")
+        self.status_codes[row] = self.status_code(status)
+
+    def materialise(self, row: int) -> Order:
+        """Build an Order view of a single row."""
+        return Order.from_record(
+            order_id=self.order_ids[row],
+            item=self.items[self.item_indices[row]],
+            quantity=self.quantities[row],
+            buyer=self.parties[self.buyer_indices[row]],
+            seller=self.parties[self.seller_indices[row]],
+            status=self.statuses[self.status_codes[row]],
+            timestamp=datetime.fromtimestamp(self.timestamps[row]),
+            total_price=self.total_pence[row] / 100,
+            kind=self.kinds[row],
+        )
+
+    def get_order(self, order_id: int) -> Optional[Order]:
+        """Return an Order view for the given ID, or None if it is not logged."""
+        row = self._row_by_id.get(order_id)
+        return None if row is None else self.materialise(row)
+
+    def __len__(self) -> int:
+        return len(self.order_ids)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self.materialise(i) for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("OrderLog index out of range")
+        return self.materialise(row)
+
+    def __iter__(self) -> Iterator[Order]:
+        for row in range(len(self)):
+            yield self.materialise(row)
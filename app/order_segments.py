@@ -0,0 +1,491 @@
+# /app/order_segments.py
+
+import itertools
+import json
+import math
+import mmap
+import os
+import struct
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from app.finance import FinanceRollups, FinancialSummary
+from app.item import Item
+from app.order import Order
+from app.storage_util import EPOCH, MICROSECOND, Party, write_atomically
+from app.warehouse import Warehouse
+
+SEGMENT_ROWS = 65_536  # Order slots per segment file
+META_FILE = "segments.json"
+SEGMENTS_DIRECTORY = "order_segments"
+
+# order ID, quantity, total price, timestamp (microseconds since EPOCH),
+# item, buyer and seller (indexes into the name tables), status code, kind
+RECORD = struct.Struct("<qqdqiiibb2x")
+STATUS_OFFSET = struct.calcsize("<qqdqiii")  # Where the status code sits in a record
+EMPTY = 0  # Order ID of a slot that has never been written, or whose order was archived
+DAY = 86_400_000_000  # Microseconds in a day
+WAREHOUSE_REF = "warehouse"
+
+
+def _party_ref(party) -> str:
+    """Refer to a buyer or seller by its customer or supplier ID, falling back to its name."""
+    person_id = getattr(party, "person_id", None)
+    if person_id is not None:
+        return person_id
+    if isinstance(party, Warehouse):
+        return WAREHOUSE_REF
+    return f"name:{getattr(party, 'name', 'N/A')}"
+
+
+class OrderSegments:
+    """Orders stored as fixed-width records in memory-mapped segment files.
+
+    Order N lives in slot N - first_id, so finding an order is arithmetic rather than a
+    search. Segments are preallocated (sparse) files of SEGMENT_ROWS slots. Orders are
+    appended to the last, active segment; every segment before it is sealed. Reading
+    goes straight through the mapping, so resident memory stays flat however long the
+    history gets. Items (by name and description), parties (by customer or supplier
+    ID) and statuses are kept once each in a JSON table.
+
+    Attached to a warehouse and then handed to Warehouse.use_history, the segments
+    become its order history, and closed orders no longer stay in memory.
+    """
+
+    def __init__(self, directory: str = SEGMENTS_DIRECTORY):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.first_id: Optional[int] = None
+        self.statuses: List[str] = []
+        self.items: List[list] = []  # [name, description, price]
+        self.parties: List[list] = []  # [ref, name]
+        self._count = 0
+        self._meta_changed = False
+        self._closed = False
+        self._segments: List[mmap.mmap] = []
+        self._files = []
+
+        # Identity -> table index
+        self._item_index: Dict[Tuple[str, str], int] = {}
+        self._party_index: Dict[str, int] = {}
+        self._status_index: Dict[str, int] = {}
+        # Table index -> live object, handed back instead of a stand-in when reading
+        self._live_items: Dict[int, Item] = {}
+        self._live_parties: Dict[int, object] = {}
+
+        meta_path = os.path.join(directory, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as file:
+                meta = json.load(file)
+            self.first_id = meta["first_id"]
+            self.statuses = meta["statuses"]
+            self.items = meta["items"]
+            self.parties = meta["parties"]
+            self._status_index = {s: code for code, s in enumerate(self.statuses)}
+            self._item_index = {
+                (name, description): index
+                for index, (name, description, _) in enumerate(self.items)
+            }
+            self._party_index = {
+                ref: index for index, (ref, _) in enumerate(self.parties)
+            }
+            for number in range(meta["segments"]):
+                self._open_segment(number)
+            if meta.get("clean"):
+                self._count = meta["count"]
+                self._save_meta()  # No longer clean, a crash from here on means a recount
+            else:
+                self._count = sum(1 for _ in self._order_ids())
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"segment-{number:06d}.bin")
+
+    def _open_segment(self, number: int):
+        path = self._segment_path(number)
+        size = SEGMENT_ROWS * RECORD.size
+        file = open(path, "r+b" if os.path.exists(path) else "w+b")
+        if os.fstat(file.fileno()).st_size < size:
+            file.truncate(size)  # Sparse, disk is only used as slots are written
+        self._files.append(file)
+        self._segments.append(mmap.mmap(file.fileno(), size))
+
+    def _save_meta(self, clean: bool = False):
+        """Write the tables. The count is only trusted on reopening if clean, i.e. closed."""
+        self._meta_changed = False
+        meta = {
+            "first_id": self.first_id,
+            "segments": len(self._segments),
+            "record_size": RECORD.size,
+            "count": self._count,
+            "clean": clean,
+            "statuses": self.statuses,
+            "items": self.items,
+            "parties": self.parties,
+        }
+        write_atomically(
+            os.path.join(self.directory, META_FILE), json.dumps(meta).encode("utf-8")
+        )
+
+    def _slot(self, order_id: int):
+        """The segment and byte offset of an order's record."""
+        slot = order_id - self.first_id
+        return self._segments[slot // SEGMENT_ROWS], (slot % SEGMENT_ROWS) * RECORD.size
+
+    def _has_slot(self, order_id: int) -> bool:
+        return (
+            self.first_id is not None
+            and 0 <= order_id - self.first_id < len(self._segments) * SEGMENT_ROWS
+        )
+
+    def _intern_status(self, status: str) -> int:
+        code = self._status_index.get(status)
+        if code is None:
+            code = self._status_index[status] = len(self.statuses)
+            self.statuses.append(status)
+            self._meta_changed = True
+        return code
+
+    def _intern_item(self, item: Item) -> int:
+        key = (item.name, item.description)
+        index = self._item_index.get(key)
+        if index is None:
+            index = self._item_index[key] = len(self.items)
+            self.items.append([item.name, item.description, item.price])
+            self._meta_changed = True
+        self._live_items[index] = item
+        return index
+
+    def _intern_party(self, party) -> int:
+        ref = _party_ref(party)
+        index = self._party_index.get(ref)
+        if index is None:
+            index = self._party_index[ref] = len(self.parties)
+            self.parties.append([ref, getattr(party, "name", "N/A")])
+            self._meta_changed = True
+        self._live_parties[index] = party
+        return index
+
+    def append(self, order: Order):
+        """Write an order into its slot, starting new segments as needed."""
+        if self.first_id is None:
+            self.first_id = order.order_id
+            self._meta_changed = True
+        if order.order_id < self.first_id:
+            raise ValueError(
+                f"Order with ID {order.order_id} is older than the first stored order."
+            )
+        if self.contains(order.order_id):
+            raise ValueError(f"Order with ID {order.order_id} is already stored.")
+
+        while not self._has_slot(order.order_id):
+            self._open_segment(len(self._segments))
+            self._meta_changed = True
+
+        record = RECORD.pack(
+            order.order_id,
+            order.quantity,
+            order.total_price,
+            (order.timestamp - EPOCH) // MICROSECOND,
+            self._intern_item(order.item),
+            self._intern_party(order.buyer),
+            self._intern_party(order.seller),
+            self._intern_status(order.status),
+            order.kind,
+        )
+        segment, offset = self._slot(order.order_id)
+        segment[offset : offset + RECORD.size] = record
+        self._count += 1
+        if self._meta_changed:
+            self._save_meta()
+
+    def set_status(self, order_id: int, status: str):
+        """Overwrite the status code of a stored order in place."""
+        if not self.contains(order_id):
+            raise ValueError(f"Order with ID {order_id} not found in the segments.")
+        code = self._intern_status(status)
+        if self._meta_changed:
+            self._save_meta()
+        segment, offset = self._slot(order_id)
+        segment[offset + STATUS_OFFSET] = code
+
+    def contains(self, order_id: int) -> bool:
+        if not self._has_slot(order_id):
+            return False
+        segment, offset = self._slot(order_id)
+        return struct.unpack_from("<q", segment, offset)[0] != EMPTY
+
+    def attach(self, warehouse, customer_manager=None, supplier_manager=None):
+        """Store the warehouse's orders, then follow its new orders, status changes and archiving.
+
+        Given the managers, orders stored before a restart are read back with the live
+        customers, suppliers and items rather than stand-ins, and renames are kept.
+        """
+        for order in warehouse.orders:
+            if not self.contains(order.order_id):
+                self.append(order)
+            else:
+                # Stored before a restart, but the status may have moved on since
+                self.set_status(order.order_id, order.status)
+        self._bind(warehouse, customer_manager, supplier_manager)
+        warehouse.add_order_listener(self._on_order_event)
+        warehouse.add_archive_listener(self._on_orders_archived)
+        if customer_manager is not None:
+            customer_manager.add_listener(self._on_party_event)
+        if supplier_manager is not None:
+            supplier_manager.add_listener(self._on_party_event)
+
+    def _bind(self, warehouse, customer_manager=None, supplier_manager=None):
+        """Hand back the live warehouse, parties and stocked items for stored records."""
+        parties = {WAREHOUSE_REF: warehouse}
+        if customer_manager is not None:
+            parties.update(customer_manager.customers)
+        if supplier_manager is not None:
+            parties.update(supplier_manager.suppliers)
+        for ref, party in parties.items():
+            index = self._party_index.get(ref)
+            if index is not None:
+                self._live_parties.setdefault(index, party)
+                self._rename_party(index, party.name)
+
+        catalogue = {}
+        if supplier_manager is not None:
+            for supplier in supplier_manager.suppliers.values():
+                for item in supplier.items_supplied:
+                    catalogue.setdefault((item.name, item.description), item)
+        for (name, description), index in self._item_index.items():
+            if index in self._live_items:
+                continue
+            key = Item(name, description, self.items[index][2], None)
+            item = warehouse.inventory.get_stored_item(key) or catalogue.get(
+                (name, description)
+            )
+            if item is not None:
+                self._live_items[index] = item
+        if self._meta_changed:
+            self._save_meta()
+
+    def _rename_party(self, index: int, name: str):
+        if self.parties[index][1] != name:
+            self.parties[index][1] = name
+            self._meta_changed = True
+
+    def _on_party_event(self, event: str, party, _item: Item = None):
+        """Keep the stored name of a renamed customer or supplier up to date."""
+        index = self._party_index.get(_party_ref(party))
+        if event == "updated" and index is not None:
+            self._rename_party(index, party.name)
+            if self._meta_changed:
+                self._save_meta()
+
+    def _on_order_event(self, order: Order, previous_status: Optional[str]):
+        if previous_status is None:
+            self.append(order)
+        else:
+            self.set_status(order.order_id, order.status)
+
+    def _on_orders_archived(self, orders: List[Order], before: datetime):
+        for order in orders:
+            self.discard(order.order_id)
+
+    def discard(self, order_id: int):
+        """Clear an order's slot (e.g. once it is archived), so it is no longer read back."""
+        if self.contains(order_id):
+            segment, offset = self._slot(order_id)
+            segment[offset : offset + RECORD.size] = bytes(RECORD.size)
+            self._count -= 1
+
+    @property
+    def sealed_segments(self) -> int:
+        """Segments before the active one, which no new order will be appended to."""
+        return max(len(self._segments) - 1, 0)
+
+    def records(self, segments: range = None) -> Iterator[tuple]:
+        """Yield the raw record tuples, in ID order, read straight from the mappings."""
+        for number in segments if segments is not None else range(len(self._segments)):
+            for record in RECORD.iter_unpack(memoryview(self._segments[number])):
+                if record[0] != EMPTY:
+                    yield record
+
+    def _order_ids(self) -> Iterator[int]:
+        for record in self.records():
+            yield record[0]
+
+    def _materialise(self, record: tuple) -> Order:
+        order_id, quantity, total, timestamp, item, buyer, seller, status, kind = record
+        live_item = self._live_items.get(item)
+        if live_item is None:
+            name, description, price = self.items[item]
+            live_item = Item(name, description, price, None)
+        return Order.from_record(
+            order_id=order_id,
+            item=live_item,
+            quantity=quantity,
+            buyer=self._party(buyer),
+            seller=self._party(seller),
+            status=self.statuses[status],
+            timestamp=EPOCH + timedelta(microseconds=timestamp),
+            total_price=total,
+            kind=kind,
+        )
+
+    def _party(self, index: int):
+        party = self._live_parties.get(index)
+        if party is None:
+            ref, name = self.parties[index]
+            party = Party(name, None if ":" in ref or ref == WAREHOUSE_REF else ref)
+        return party
+
+    def get_order(self, order_id: int) -> Optional[Order]:
+        """Read one order by ID, or None if it is not stored."""
+        if not self.contains(order_id):
+            return None
+        segment, offset = self._slot(order_id)
+        return self._materialise(RECORD.unpack_from(segment, offset))
+
+    def orders(
+        self,
+        start: datetime = None,
+        end: datetime = None,
+        status: str = None,
+        kind: int = None,
+        buyer=None,
+        after_id: int = None,
+    ) -> Iterator[Order]:
+        """Yield the orders matching every filter given, in ID order.
+
+        Orders are placed from start (inclusive) to end (exclusive), and come after
+        after_id. Records are filtered as they are read, only matches become orders.
+        """
+        first, last = self._time_bounds(start, end)
+        status_code = self._status_index.get(status, -1) if status is not None else None
+        buyer_index = (
+            self._party_index.get(_party_ref(buyer), -1) if buyer is not None else None
+        )
+        segments = None
+        if after_id is not None and self.first_id is not None:
+            first_segment = max(after_id + 1 - self.first_id, 0) // SEGMENT_ROWS
+            segments = range(
+                min(first_segment, len(self._segments)), len(self._segments)
+            )
+
+        for record in self.records(segments):
+            if (
+                first <= record[3] < last
+                and (after_id is None or record[0] > after_id)
+                and (status_code is None or record[7] == status_code)
+                and (kind is None or record[8] == kind)
+                and (buyer_index is None or record[5] == buyer_index)
+            ):
+                yield self._materialise(record)
+
+    @staticmethod
+    def _time_bounds(start: datetime = None, end: datetime = None):
+        first = (start - EPOCH) // MICROSECOND if start is not None else -math.inf
+        last = (end - EPOCH) // MICROSECOND if end is not None else math.inf
+        return first, last
+
+    def summarise(
+        self, start: datetime = None, end: datetime = None
+    ) -> FinancialSummary:
+        """Totals straight from the mapped records, without building any orders."""
+        first, last = self._time_bounds(start, end)
+
+        counts = {}
+        totals = {}
+        for _, _, total, timestamp, _, _, _, status_code, kind in self.records():
+            if first <= timestamp < last:
+                key = (kind, status_code)
+                counts[key] = counts.get(key, 0) + 1
+                totals[key] = totals.get(key, 0) + total
+
+        summary = FinancialSummary()
+        for (kind, status_code), count in counts.items():
+            status = self.statuses[status_code]
+            summary.add_totals(kind, status, count, totals[(kind, status_code)])
+        return summary
+
+    def rollups(self) -> FinanceRollups:
+        """Daily, weekly and monthly rollups straight from the mapped records."""
+        totals = {}
+        for (
+            _,
+            quantity,
+            total,
+            timestamp,
+            item,
+            _,
+            _,
+            status_code,
+            kind,
+        ) in self.records():
+            key = (timestamp // DAY, item, kind, status_code)
+            if key in totals:
+                totals[key][0] += 1
+                totals[key][1] += quantity
+                totals[key][2] += total
+            else:
+                totals[key] = [1, quantity, total]
+
+        rollups = FinanceRollups()
+        epoch_day = EPOCH.date()
+        for (day, item, kind, status_code), (count, quantity, total) in totals.items():
+            rollups.add_totals(
+                epoch_day + timedelta(days=day),
+                tuple(self.items[item][:2]),
+                kind,
+                self.statuses[status_code],
+                count,
+                quantity,
+                total,
+            )
+        return rollups
+
+    def flush(self):
+        """Write the mapped records out to disk."""
+        for segment in self._segments:
+            segment.flush()
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        self._save_meta(clean=True)
+        for segment in self._segments:
+            segment.close()
+        for file in self._files:
+            file.close()
+        self._segments, self._files = [], []
+        self._closed = True
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, position):
+        """Read orders by position (not ID), walking the records up to it."""
+        if isinstance(position, slice):
+            return [
+                self._materialise(record)
+                for record in itertools.islice(
+                    self.records(), *position.indices(len(self))
+                )
+            ]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("OrderSegments index out of range")
+        from_end = len(self) - 1 - position
+        if from_end < position:
+            # Nearer the end, e.g. segments[-1] for the latest order
+            return next(itertools.islice(reversed(self), from_end, None))
+        return self._materialise(next(itertools.islice(self.records(), position, None)))
+
+    def __iter__(self) -> Iterator[Order]:
+        for record in self.records():
+            yield self._materialise(record)
+
+    def __reversed__(self) -> Iterator[Order]:
+        """Newest first, walking the segments and their records backwards."""
+        for segment in reversed(self._segments):
+            for offset in range(len(segment) - RECORD.size, -1, -RECORD.size):
+                record = RECORD.unpack_from(segment, offset)
+                if record[0] != EMPTY:
+                    yield self._materialise(record)
@@ -0,0 +1,308 @@
+# /app/snapshot.py
+
+import io
+import os
+import pickle
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from app.customer import Customer, CustomerManager
+from app.journal import Journal, replay_journal
+from app.order import Order
+from app.storage_util import EPOCH, MICROSECOND, write_atomically
+from app.supplier import Supplier, SupplierManager
+from app.warehouse import Warehouse
+
+SNAPSHOT_FILE = "warehouse.snapshot"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_EVERY = 50_000  # Journal records between periodic snapshots
+
+
+class _OrderColumns:
+    """Orders as parallel typed arrays, which pickle far faster than Order objects.
+
+    Items, buyers, sellers and statuses are kept once in tables and referenced by
+    index. Totals are kept as floats and timestamps as whole microseconds, so every
+    order comes back exactly as it was.
+    """
+
+    def __init__(self, orders: List[Order]):
+        self.order_ids = array("q")
+        self.quantities = array("q")
+        self.totals = array("d")
+        self.kinds = array("b")
+        self.timestamps = array("q")  # Microseconds since EPOCH
+        self.status_codes = array("q")
+        self.item_indices = array("q")
+        self.buyer_indices = array("q")
+        self.seller_indices = array("q")
+        self.tables: Dict[str, list] = {"items": [], "parties": [], "statuses": []}
+
+        # Table name -> {id(object), or the status itself: index}
+        index: Dict[str, dict] = {name: {} for name in self.tables}
+
+        def intern(table: str, value) -> int:
+            key = value if table == "statuses" else id(value)
+            position = index[table].get(key)
+            if position is None:
+                position = index[table][key] = len(self.tables[table])
+                self.tables[table].append(value)
+            return position
+
+        for order in orders:
+            self.order_ids.append(order.order_id)
+            self.quantities.append(order.quantity)
+            self.totals.append(order.total_price)
+            self.kinds.append(order.kind)
+            self.timestamps.append((order.timestamp - EPOCH) // MICROSECOND)
+            self.status_codes.append(intern("statuses", order.status))
+            self.item_indices.append(intern("items", order.item))
+            self.buyer_indices.append(intern("parties", order.buyer))
+            self.seller_indices.append(intern("parties", order.seller))
+
+    def fill(self, orders: Dict[int, Order]):
+        """Fill in the order objects that the rest of the snapshot refers to by ID."""
+        items, parties, statuses = (
+            self.tables["items"],
+            self.tables["parties"],
+            self.tables["statuses"],
+        )
+        for row, order_id in enumerate(self.order_ids):
+            order = orders.get(order_id)
+            if order is None:
+                order = orders[order_id] = Order.__new__(Order)
+            order.order_id = order_id
+            order.item = items[self.item_indices[row]]
+            order.quantity = self.quantities[row]
+            order.timestamp = EPOCH + timedelta(microseconds=self.timestamps[row])
+            order.buyer = parties[self.buyer_indices[row]]
+            order.seller = parties[self.seller_indices[row]]
+            order.total_price = self.totals[row]
+            order.status = statuses[self.status_codes[row]]
+            order.kind = self.kinds[row]
+
+
+class _SnapshotPickler(pickle.Pickler):
+    """Writes orders as references to the order columns, instead of one by one."""
+
+    def persistent_id(self, obj):
+        if type(obj) is Order:
+            return obj.order_id
+        return None
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    """Hands out empty orders for the references, filled from the columns afterwards."""
+
+    def __init__(self, file):
+        super().__init__(file)
+        self.orders: Dict[int, Order] = {}
+
+    def persistent_load(self, order_id):
+        order = self.orders.get(order_id)
+        if order is None:
+            order = self.orders[order_id] = Order.__new__(Order)
+        return order
+
+
+def _dump_snapshot(
+    warehouse: Warehouse,
+    customer_manager: CustomerManager,
+    supplier_manager: SupplierManager,
+    journal_offset: int,
+) -> bytes:
+    state = {
+        "version": SNAPSHOT_VERSION,
+        "taken": datetime.now(),
+        "journal_offset": journal_offset,
+        "counters": {
+            "order": Order._id_counter,
+            "customer": Customer._customer_counter,
+            "supplier": Supplier._supplier_counter,
+        },
+        "warehouse": warehouse,
+        "customer_manager": customer_manager,
+        "supplier_manager": supplier_manager,
+        "orders": _OrderColumns(warehouse.orders),
+    }
+    buffer = io.BytesIO()
+    _SnapshotPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(state)
+    return buffer.getvalue()
+
+
+def _snapshot_in_child(path: str, *state):
+    """Runs in a forked child: pickle and write the parent's state as it was at the fork."""
+    exit_code = 1
+    try:
+        write_atomically(path, _dump_snapshot(*state))
+        exit_code = 0
+    finally:
+        os._exit(exit_code)  # Never run the parent's cleanup (or tests) in the child
+
+
+def _wait_for_child(pid: int) -> bool:
+    _, status = os.waitpid(pid, 0)
+    if os.waitstatus_to_exitcode(status) != 0:
+        print("Warning: The snapshot could not be written.")
+        return False
+    return True
+
+
+def write_snapshot(
+    path: str,
+    warehouse: Warehouse,
+    customer_manager: CustomerManager,
+    supplier_manager: SupplierManager,
+    journal: Journal = None,
+    background: bool = False,
+    on_durable: Callable[[int], None] = None,
+) -> Optional[threading.Thread]:
+    """Save the whole warehouse state, and how much of the journal it already covers.
+
+    The state is captured straight away. With background=True a forked child process
+    pickles and writes it from its copy-on-write image of this one, so the caller only
+    waits for the fork. Without fork (e.g. on Windows) the state is pickled here and
+    only the file is written in the background. Either way a thread is returned that
+    finishes once the snapshot is on disk. The snapshot replaces the previous one
+    atomically, so a crash never leaves a partial file. on_durable is then called
+    with the journal offset the snapshot covers.
+    """
+    journal_offset = journal.offset if journal is not None else 0
+    state = (warehouse, customer_manager, supplier_manager, journal_offset)
+
+    def finished(written: bool = True):
+        if written and on_durable is not None:
+            on_durable(journal_offset)
+
+    if not background:
+        write_atomically(path, _dump_snapshot(*state))
+        finished()
+        return None
+
+    if hasattr(os, "fork"):
+        pid = os.fork()
+        if pid == 0:
+            _snapshot_in_child(path, *state)
+
+        def write():
+            finished(_wait_for_child(pid))
+
+    else:
+        data = _dump_snapshot(*state)
+
+        def write():
+            write_atomically(path, data)
+            finished()
+
+    thread = threading.Thread(target=write, name="snapshot-writer")
+    thread.start()
+    return thread
+
+
+def load_snapshot(
+    path: str,
+) -> Tuple[Warehouse, CustomerManager, SupplierManager, int]:
+    """Load a snapshot, returning the warehouse, both managers and the journal offset."""
+    with open(path, "rb") as file:
+        unpickler = _SnapshotUnpickler(file)
+        state = unpickler.load()
+    if state.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version: {state.get('version')}")
+
+    state["orders"].fill(unpickler.orders)
+
+    counters = state["counters"]
+    Order._id_counter = max(Order._id_counter, counters["order"])
+    Customer._customer_counter = max(Customer._customer_counter, counters["customer"])
+    Supplier._supplier_counter = max(Supplier._supplier_counter, counters["supplier"])
+
+    warehouse = state["warehouse"]
+    warehouse.version  # Rebuild the order indexes now rather than on first use
+    return (
+        warehouse,
+        state["customer_manager"],
+        state["supplier_manager"],
+        state["journal_offset"],
+    )
+
+
+def restore(
+    snapshot_path: str, journal_path: str, warehouse_name: str = "Main Warehouse"
+) -> Tuple[Warehouse, CustomerManager, SupplierManager]:
+    """Load the latest snapshot (if any) and replay the journal written after it."""
+    started = time.perf_counter()
+    if os.path.exists(snapshot_path):
+        warehouse, customer_manager, supplier_manager, offset = load_snapshot(
+            snapshot_path
+        )
+    else:
+        warehouse = Warehouse(name=warehouse_name)
+        customer_manager = CustomerManager()
+        supplier_manager = SupplierManager()
+        offset = 0
+
+    replayed = replay_journal(
+        journal_path, warehouse, customer_manager, supplier_manager, offset
+    )
+    elapsed = time.perf_counter() - started
+    print(
+        f"Restored {len(warehouse.orders)} orders ({replayed} journal records replayed) in {elapsed:.2f}s"
+    )
+    return warehouse, customer_manager, supplier_manager
+
+
+class Snapshotter:
+    """Takes a background snapshot whenever enough journal records have built up.
+
+    Once a snapshot is on disk, the journal records it covers are compacted away.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        warehouse: Warehouse,
+        customer_manager: CustomerManager,
+        supplier_manager: SupplierManager,
+        journal: Journal,
+        every: int = SNAPSHOT_EVERY,
+    ):
+        self.path = path
+        self.warehouse = warehouse
+        self.customer_manager = customer_manager
+        self.supplier_manager = supplier_manager
+        self.journal = journal
+        self.every = every
+        self._last_records = journal.records
+        self._writer: Optional[threading.Thread] = None
+
+    def maybe_snapshot(self) -> bool:
+        """Snapshot if due. Call between operations, never from inside one."""
+        if self.journal.records - self._last_records < self.every:
+            return False
+        if self._writer is not None and self._writer.is_alive():
+            return False  # The previous snapshot is still being written
+        self.snapshot()
+        return True
+
+    def snapshot(self, background: bool = True):
+        self._last_records = self.journal.records
+        if self.warehouse.history is not None:
+            # Closed orders are only in the history, which must be on disk before the
+            # journal records that also hold them are compacted away
+            self.warehouse.history.flush()
+        self._writer = write_snapshot(
+            self.path,
+            self.warehouse,
+            self.customer_manager,
+            self.supplier_manager,
+            self.journal,
+            background,
+            on_durable=self.journal.compact,
+        )
+
+    def wait(self):
+        """Wait for a snapshot that is still being written."""
+        if self._writer is not None:
+            self._writer.join()
@@ -0,0 +1,533 @@
+# /app/sqlite_store.py
+
+import itertools
+import sqlite3
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional
+from app.customer import CustomerManager
+from app.finance import GROUP_KEYS, FinanceRollups, FinancialSummary, GroupTotals
+from app.item import Item
+from app.journal import (
+    JOURNAL_COMMIT_INTERVAL,
+    WAREHOUSE_REF,
+    ChangeRecorder,
+    apply_records,
+)
+from app.order import Order
+from app.storage_util import Party
+from app.supplier import SupplierManager
+from app.warehouse import CLOSED_STATUSES, Warehouse
+
+DATABASE_FILE = "warehouse.db"
+SQLITE_GROUP_SIZE = 10_000  # Records written per transaction during a burst
+SQLITE_PAGE_SIZE = 1_000  # Orders read per query when iterating over the history
+CLOSED_LIST = ", ".join(repr(status) for status in CLOSED_STATUSES)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS suppliers (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS supplier_items (
+    supplier TEXT NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    price REAL NOT NULL,
+    PRIMARY KEY (supplier, name, description)
+);
+CREATE TABLE IF NOT EXISTS stock (
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    price REAL NOT NULL,
+    supplier TEXT,
+    quantity INTEGER NOT NULL,
+    threshold INTEGER NOT NULL,
+    PRIMARY KEY (name, description)
+);
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    price REAL NOT NULL,
+    supplier TEXT,
+    quantity INTEGER NOT NULL,
+    total REAL NOT NULL,
+    buyer TEXT,
+    seller TEXT,
+    status TEXT NOT NULL,
+    kind INTEGER NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_by_status ON orders (status);
+CREATE INDEX IF NOT EXISTS orders_by_timestamp ON orders (timestamp);
+CREATE INDEX IF NOT EXISTS orders_by_item ON orders (name, description);
+CREATE TABLE IF NOT EXISTS status_changes (
+    id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    at TEXT NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS status_changes_update_orders
+AFTER INSERT ON status_changes
+BEGIN
+    UPDATE orders SET status = NEW.status WHERE id = NEW.id;
+END;
+CREATE TABLE IF NOT EXISTS received_items (
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    PRIMARY KEY (name, description)
+);
+CREATE TRIGGER IF NOT EXISTS received_orders_mark_items
+AFTER INSERT ON orders WHEN NEW.status = 'received'
+BEGIN
+    INSERT OR IGNORE INTO received_items VALUES (NEW.name, NEW.description);
+END;
+CREATE TRIGGER IF NOT EXISTS received_status_marks_items
+AFTER INSERT ON status_changes WHEN NEW.status = 'received'
+BEGIN
+    INSERT OR IGNORE INTO received_items
+    SELECT name, description FROM orders WHERE id = NEW.id;
+END;
+INSERT OR IGNORE INTO received_items
+SELECT DISTINCT name, description FROM orders WHERE status = 'received';
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS orders_raise_last_order_id
+AFTER INSERT ON orders
+BEGIN
+    INSERT INTO counters VALUES ('last_order_id', NEW.id)
+    ON CONFLICT (name) DO UPDATE SET value = MAX(value, excluded.value);
+END;
+INSERT OR IGNORE INTO counters
+SELECT 'last_order_id', MAX(id) FROM orders HAVING MAX(id) IS NOT NULL;
+"""
+
+# Journal record -> (statement, its parameters in order)
+STATEMENTS = {
+    "customer": (
+        "INSERT INTO customers (id, name, email) VALUES (?, ?, ?)",
+        ("id", "name", "email"),
+    ),
+    "update_customer": (
+        "UPDATE customers SET name = ?, email = ? WHERE id = ?",
+        ("name", "email", "id"),
+    ),
+    "delete_customer": ("UPDATE customers SET deleted = 1 WHERE id = ?", ("id",)),
+    "supplier": (
+        "INSERT INTO suppliers (id, name, email) VALUES (?, ?, ?)",
+        ("id", "name", "email"),
+    ),
+    "update_supplier": (
+        "UPDATE suppliers SET name = ?, email = ? WHERE id = ?",
+        ("name", "email", "id"),
+    ),
+    "supplier_item": (
+        "INSERT OR REPLACE INTO supplier_items VALUES (?, ?, ?, ?)",
+        ("supplier", "name", "description", "price"),
+    ),
+    "remove_supplier_item": (
+        "DELETE FROM supplier_items WHERE supplier = ? AND name = ? AND description = ?",
+        ("supplier", "name", "description"),
+    ),
+    "stock": (
+        "INSERT OR REPLACE INTO stock VALUES (?, ?, ?, ?, ?, ?)",
+        ("name", "description", "price", "supplier", "quantity", "threshold"),
+    ),
+    "order": (
+        "INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            "id",
+            "name",
+            "description",
+            "price",
+            "supplier",
+            "quantity",
+            "total",
+            "buyer",
+            "seller",
+            "status",
+            "kind",
+            "timestamp",
+        ),
+    ),
+    # A trigger moves the order itself to the new status
+    "status": (
+        "INSERT INTO status_changes VALUES (?, ?, ?)",
+        ("id", "status", "at"),
+    ),
+    "archive": (
+        f"DELETE FROM orders WHERE timestamp < ? AND status IN ({CLOSED_LIST})",
+        ("before",),
+    ),
+}
+
+# Group -> (key columns, extra join, orders it applies to)
+GROUP_COLUMNS = {
+    "item": ("o.name, o.description", "", ""),
+    "supplier": (
+        "COALESCE(p.name, 'N/A')",
+        "LEFT JOIN suppliers p ON p.id = o.seller",
+        f"AND o.kind = {Order.PURCHASE}",
+    ),
+    "customer": (
+        "COALESCE(p.name, 'N/A')",
+        "LEFT JOIN customers p ON p.id = o.buyer",
+        f"AND o.kind = {Order.SALE}",
+    ),
+}
+
+
+class SqliteStore(ChangeRecorder):
+    """Keeps the warehouse, its inventory and both managers in an SQLite database.
+
+    Changes arrive as the same records the journal writes and are applied with
+    cached, parameterised statements. Items that have ever been received are kept
+    in their own table, so they stay on sale after their orders are archived. A
+    transaction is committed per group of records, and never part way through a
+    warehouse operation (see ChangeRecorder). The database runs in WAL mode, so
+    finance queries can read while changes are written. Orders are indexed by ID,
+    status, timestamp and item, and summaries run as SQL aggregates.
+
+    The store is also the warehouse's order history (see Warehouse.use_history):
+    only open orders are loaded into memory, closed ones are queried when asked for.
+    """
+
+    def __init__(
+        self,
+        path: str = DATABASE_FILE,
+        group_size: int = SQLITE_GROUP_SIZE,
+        commit_interval: float = JOURNAL_COMMIT_INTERVAL,
+    ):
+        super().__init__(group_size, commit_interval)
+        self.path = path
+        # The background flusher commits from its own thread, under the recorder's lock
+        self.connection = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+        self._warehouse: Optional[Warehouse] = None
+        self._customer_manager: Optional[CustomerManager] = None
+        self._supplier_manager: Optional[SupplierManager] = None
+
+    def _write(self, op: str, fields: dict):
+        statement = STATEMENTS.get(op)
+        if statement is None:
+            raise ValueError(f"Unknown change record '{op}'.")
+        sql, names = statement
+        if not self.connection.in_transaction:
+            self.connection.execute("BEGIN")
+        self.connection.execute(sql, [fields[name] for name in names])
+
+    def _sync(self):
+        self.connection.execute("COMMIT")
+
+    def close(self):
+        super().close()
+        self.connection.close()
+
+    def attach(
+        self,
+        warehouse: Warehouse,
+        customer_manager: CustomerManager,
+        supplier_manager: SupplierManager,
+    ):
+        """Start recording every change, and hand out the live parties in orders read back."""
+        super().attach(warehouse, customer_manager, supplier_manager)
+        self._warehouse = warehouse
+        self._customer_manager = customer_manager
+        self._supplier_manager = supplier_manager
+
+    def _records(self) -> Iterator[dict]:
+        """Turn the stored rows back into change records, in an order that replays."""
+        connection = self.connection
+
+        def rows(op: str, sql: str):
+            cursor = connection.execute(sql)
+            names = [column[0] for column in cursor.description]
+            for row in cursor:
+                record = dict(zip(names, row))
+                record["op"] = op
+                yield record
+
+        yield from rows("customer", "SELECT id, name, email FROM customers")
+        yield from rows("supplier", "SELECT id, name, email FROM suppliers")
+        yield from rows("supplier_item", "SELECT * FROM supplier_items")
+        yield from rows("stock", "SELECT * FROM stock")
+        yield from rows("received_item", "SELECT * FROM received_items")
+        # Closed orders stay in the database, they are read back when asked for
+        yield from rows(
+            "order",
+            f"SELECT * FROM orders WHERE status NOT IN ({CLOSED_LIST}) ORDER BY id",
+        )
+        # Deleted customers go last, their orders still refer to them
+        yield from rows("delete_customer", "SELECT id FROM customers WHERE deleted = 1")
+
+    def load(
+        self,
+        warehouse: Warehouse,
+        customer_manager: CustomerManager,
+        supplier_manager: SupplierManager,
+    ) -> int:
+        """Rebuild the in-memory warehouse and managers from the database.
+
+        Only open orders are loaded, use the store as the warehouse's history (as
+        open_store does) to reach the closed ones.
+        """
+        applied = apply_records(
+            self._records(), warehouse, customer_manager, supplier_manager
+        )
+        # Archived orders leave the table, but their IDs must never be handed out again
+        last_id = self.connection.execute(
+            "SELECT value FROM counters WHERE name = 'last_order_id'"
+        ).fetchone()
+        if last_id is not None:
+            Order._id_counter = max(Order._id_counter, last_id[0] + 1)
+        # The orders already have their latest status, only the history is missing
+        latest = self.connection.execute(
+            "SELECT id, status, at FROM status_changes ORDER BY rowid DESC LIMIT ?",
+            (warehouse.status_changes.maxlen,),
+        ).fetchall()
+        warehouse.status_changes.extend(
+            (order_id, status, datetime.fromisoformat(at))
+            for order_id, status, at in reversed(latest)
+        )
+        return applied
+
+    def _party(self, ref: Optional[str]):
+        """The live buyer or seller with an ID, or a stand-in if it is gone (or unattached)."""
+        if ref == WAREHOUSE_REF and self._warehouse is not None:
+            return self._warehouse
+        if self._customer_manager is not None:
+            party = self._customer_manager.customers.get(
+                ref
+            ) or self._supplier_manager.suppliers.get(ref)
+            if party is not None:
+                return party
+        row = self.connection.execute(
+            "SELECT name FROM customers WHERE id = ? "
+            "UNION ALL SELECT name FROM suppliers WHERE id = ?",
+            (ref, ref),
+        ).fetchone()
+        return Party(row[0] if row else "N/A", ref)
+
+    def _order(self, row: tuple) -> Order:
+        (
+            order_id,
+            name,
+            description,
+            price,
+            supplier,
+            quantity,
+            total,
+            buyer,
+            seller,
+            status,
+            kind,
+            timestamp,
+        ) = row
+        supplier = self._party(supplier) if supplier is not None else None
+        return Order.from_record(
+            order_id=order_id,
+            item=Item(name, description, price, supplier),
+            quantity=quantity,
+            buyer=self._party(buyer),
+            seller=self._party(seller),
+            status=status,
+            timestamp=datetime.fromisoformat(timestamp),
+            total_price=total,
+            kind=kind,
+        )
+
+    def _select_orders(self, sql: str, parameters=()) -> List[Order]:
+        with self._lock:
+            return [
+                self._order(row) for row in self.connection.execute(sql, parameters)
+            ]
+
+    def get_order(self, order_id: int) -> Optional[Order]:
+        """Read one order by ID, or None if it is not stored."""
+        orders = self._select_orders("SELECT * FROM orders WHERE id = ?", (order_id,))
+        return orders[0] if orders else None
+
+    def orders(
+        self,
+        start: datetime = None,
+        end: datetime = None,
+        status: str = None,
+        kind: int = None,
+        buyer=None,
+        after_id: int = None,
+    ) -> Iterator[Order]:
+        """Yield the orders matching every filter given, in ID order.
+
+        Orders are read a page at a time, so only one page is ever held in memory.
+        """
+        where, parameters = self._range_filter(start, end)
+        for column, value in (("status", status), ("kind", kind)):
+            if value is not None:
+                where += f" AND o.{column} = ?"
+                parameters.append(value)
+        if buyer is not None:
+            where += " AND o.buyer = ?"
+            parameters.append(getattr(buyer, "person_id", None))
+
+        last_id = after_id if after_id is not None else -1
+        while True:
+            page = self._select_orders(
+                f"SELECT * FROM orders o WHERE o.id > ? {where} ORDER BY o.id LIMIT ?",
+                [last_id, *parameters, SQLITE_PAGE_SIZE],
+            )
+            yield from page
+            if len(page) < SQLITE_PAGE_SIZE:
+                return
+            last_id = page[-1].order_id
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    def __iter__(self) -> Iterator[Order]:
+        return self.orders()
+
+    def __reversed__(self) -> Iterator[Order]:
+        """Newest first, a page at a time."""
+        last_id = None
+        while True:
+            page = self._select_orders(
+                "SELECT * FROM orders WHERE id < COALESCE(?, id + 1) "
+                "ORDER BY id DESC LIMIT ?",
+                (last_id, SQLITE_PAGE_SIZE),
+            )
+            yield from page
+            if len(page) < SQLITE_PAGE_SIZE:
+                return
+            last_id = page[-1].order_id
+
+    def __getitem__(self, position):
+        """Read orders by position (not ID) in ID order, with LIMIT and OFFSET."""
+        if isinstance(position, slice):
+            first, last, step = position.indices(len(self))
+            if step != 1:
+                return list(itertools.islice(self, first, last, step))
+            return self._select_orders(
+                "SELECT * FROM orders ORDER BY id LIMIT ? OFFSET ?",
+                (max(last - first, 0), first),
+            )
+        if position < 0:
+            position += len(self)
+        orders = self._select_orders(
+            "SELECT * FROM orders ORDER BY id LIMIT 1 OFFSET ?", (position,)
+        )
+        if position < 0 or not orders:
+            raise IndexError("SqliteStore index out of range")
+        return orders[0]
+
+    def _range_filter(self, start: datetime = None, end: datetime = None):
+        conditions, parameters = [], []
+        if start is not None:
+            conditions.append("AND o.timestamp >= ?")
+            parameters.append(start.isoformat())
+        if end is not None:
+            conditions.append("AND o.timestamp < ?")
+            parameters.append(end.isoformat())
+        return " ".join(conditions), parameters
+
+    def summarise(
+        self, start: datetime = None, end: datetime = None
+    ) -> FinancialSummary:
+        """Revenue, costs and per-status totals as one GROUP BY over the orders table."""
+        where, parameters = self._range_filter(start, end)
+        summary = FinancialSummary()
+        with self._lock:
+            self.commit()
+            rows = self.connection.execute(
+                "SELECT o.kind, o.status, COUNT(*), SUM(o.total) FROM orders o "
+                f"WHERE 1 {where} GROUP BY o.kind, o.status",
+                parameters,
+            ).fetchall()
+        for kind, status, count, total in rows:
+            summary.add_totals(kind, status, count, total)
+        return summary
+
+    def rollups(self) -> FinanceRollups:
+        """Daily, weekly and monthly rollups from one GROUP BY per day, item, kind and status."""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT substr(timestamp, 1, 10), name, description, kind, status, "
+                "COUNT(*), SUM(quantity), SUM(total) FROM orders GROUP BY 1, 2, 3, 4, 5"
+            ).fetchall()
+        rollups = FinanceRollups()
+        for day, name, description, kind, status, count, quantity, total in rows:
+            rollups.add_totals(
+                date.fromisoformat(day),
+                (name, description),
+                kind,
+                status,
+                count,
+                quantity,
+                total,
+            )
+        return rollups
+
+    def group_by(
+        self,
+        by: str = "item",
+        kind: int = None,
+        status: str = None,
+        start: datetime = None,
+        end: datetime = None,
+    ) -> Dict[str, GroupTotals]:
+        """Totals per item (name and description), supplier or customer name as one GROUP BY."""
+        if by not in GROUP_KEYS:
+            raise ValueError(
+                f"Unknown group '{by}', expected one of {', '.join(GROUP_KEYS)}."
+            )
+        name, join, applies_to = GROUP_COLUMNS[by]
+        where, parameters = self._range_filter(start, end)
+        if kind is not None:
+            where += " AND o.kind = ?"
+            parameters.append(kind)
+        if status is not None:
+            where += " AND o.status = ?"
+            parameters.append(status)
+
+        with self._lock:
+            self.commit()
+            rows = self.connection.execute(
+                f"SELECT {name}, COUNT(*), SUM(o.quantity), SUM(o.total) FROM orders o {join} "
+                f"WHERE 1 {applies_to} {where} GROUP BY {name} ORDER BY MIN(o.id)",
+                parameters,
+            ).fetchall()
+        groups = {}
+        for *key, count, quantity, total in rows:
+            key = tuple(key) if len(key) > 1 else key[0]
+            groups[key] = GroupTotals(count, quantity, total)
+        return groups
+
+
+def open_store(
+    path: str,
+    warehouse: Warehouse,
+    customer_manager: CustomerManager,
+    supplier_manager: SupplierManager,
+) -> SqliteStore:
+    """Load what is saved in the database, then keep it up to date.
+
+    The store becomes the warehouse's order history, so closed orders are queried
+    from it rather than loaded.
+    """
+    store = SqliteStore(path)
+    store.load(warehouse, customer_manager, supplier_manager)
+    store.attach(warehouse, customer_manager, supplier_manager)
+    warehouse.use_history(store)
+    return store
@@ -0,0 +1,50 @@
+# /app/storage_util.py
+
+import os
+from datetime import datetime, timedelta
+
+# Timestamps are stored as whole microseconds since EPOCH
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class Party:
+    """Stands in for a buyer or seller when orders are read back without the live objects."""
+
+    __slots__ = ("name", "person_id")
+
+    def __init__(self, name: str, person_id: str = None):
+        self.name = name
+        self.person_id = person_id
+
+    def __repr__(self):
+        return f"Party({self.name})"
+
+
+def write_atomically(path: str, data: bytes):
+    """Write to a temporary file, make it durable, then move it into place.
+
+    The directory is synced after the rename as well, so the new file is still the
+    one in place after a crash.
+    """
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+    sync_directory(os.path.dirname(path) or ".")
+
+
+def sync_directory(directory: str):
+    """Make renames and new files in a directory durable, where the platform allows it."""
+    try:
+        descriptor = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # e.g. Windows, where directories cannot be opened
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass  # Not every file system supports syncing a directory
+    finally:
+        os.close(descriptor)
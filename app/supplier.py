@@ -40,6 +40,25 @@ class Supplier(Person):
 class SupplierManager:
     def __init__(self):
         self.suppliers = {}
+        self._items = {}  # (supplier_id, name, description) -> Item
+        self._listeners = []
+
+    def __getstate__(self):
+        """Pickle without listeners."""
+        state = self.__dict__.copy()
+        state["_listeners"] = []
+        return state
+
+    def add_listener(self, listener):
+        """Register a callback given the event, the supplier and the item (if any).
+
+        Events are 'created', 'updated', 'item_added' and 'item_removed'.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, event, supplier, item=None):
+        for listener in self._listeners:
+            listener(event, supplier, item)
 
     def get_all_suppliers(self):
         """Return a list of all suppliers, or raise an error if none exist."""
@@ -51,6 +70,16 @@ class SupplierManager:
         """Create a new supplier and assign them a unique ID."""
         supplier = Supplier(name, email)
         self.suppliers[supplier.supplier_id] = supplier
+        self._notify("created", supplier)
+        return supplier
+
+    def update_supplier(self, supplier_id, name=None, email=None):
+        """Update a supplier's profile, so that listeners see the change."""
+        if supplier_id not in self.suppliers:
+            raise ValueError(f"No supplier found with ID {supplier_id}")
+        supplier = self.suppliers[supplier_id]
+        supplier.update_profile(name=name, email=email)
+        self._notify("updated", supplier)
         return supplier
 
     def get_supplier_by_id(self, supplier_id):
@@ -85,10 +114,10 @@ class SupplierManager:
         if not supplier:
             raise ValueError(f"No supplier found with ID {supplier_id}")
 
-        if any(
-            existing_item.name == name and existing_item.description == description
-            for existing_item in supplier.items_supplied
-        ):
+        if item is not None:
+            name, description = item.name, item.description
+        key = (supplier_id, name, description)
+        if key in self._items:
             raise ValueError(
                 f"Item '{name}' with description '{description}' already exists."
             )
@@ -100,12 +129,20 @@ class SupplierManager:
                 )
             item = Item(name, description, price, supplier)
         supplier.add_item(item)
+        self._items[key] = item
+        self._notify("item_added", supplier, item)
         return item
 
+    def find_supplier_item(self, supplier_id, name, description):
+        """Return the supplier's item with the given name and description, or None."""
+        return self._items.get((supplier_id, name, description))
+
     def remove_item_from_supplier(self, supplier_id, item):
         """Remove an item from the supplier's inventory."""
         supplier = self.get_supplier_by_id(supplier_id)
         if supplier:
             supplier.remove_item(item)
+            self._items.pop((supplier_id, item.name, item.description), None)
+            self._notify("item_removed", supplier, item)
         else:
             raise ValueError(f"Supplier with ID {supplier_id} not found.")
@@ -1,17 +1,65 @@
 # /app/warehouse.py
 
-from typing import List, Dict
+import bisect
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from operator import attrgetter
+from typing import Callable, ContextManager, Deque, List, Dict, Optional, Tuple
 from app.inventory import Inventory
 from app.customer import Customer
 from app.order import Order
 from app.item import Item
 
+CLOSED_STATUSES = ("received", "delivered")  # Orders that will not change again
+STATUS_CHANGE_LIMIT = 100_000  # Latest status changes kept for incremental exports
+
 
 class Warehouse:
     def __init__(self, name: str):
         self.name = name
         self.inventory = Inventory()
         self.orders: List[Order] = []
+        self._orders_by_id: Dict[int, Order] = {}
+        self._orders_by_status: Dict[str, Dict[int, Order]] = {}
+        self._indexed_count = 0  # How many entries of self.orders are indexed
+        self._times_sorted = True  # Whether self.orders is also in timestamp order
+        self._received_items = set()  # Items that have had a 'received' order
+        self._available_items: Dict[Item, int] = {}
+        # Keeps every order (e.g. OrderSegments) once use_history is called, so that
+        # closed orders need not stay in memory
+        self.history = None
+        # (order ID, new status, when) for the latest status changes, oldest first
+        self.status_changes: Deque[Tuple[int, str, datetime]] = deque(
+            maxlen=STATUS_CHANGE_LIMIT
+        )
+        self._order_listeners: List[Callable[[Order, Optional[str]], None]] = []
+        self._archive_listeners: List[Callable[[List[Order], datetime], None]] = []
+        self._operation_hooks: List[Callable[[], ContextManager]] = []
+        self._version = 0  # Bumped on every change to the orders or the inventory
+        self.inventory.add_listener(self._refresh_availability)
+        self.inventory.add_listener(self._bump_version)
+
+    def __getstate__(self):
+        """Pickle without listeners or indexes, the indexes are rebuilt on first use.
+
+        Received items are kept, their orders may have been archived since.
+        """
+        state = self.__dict__.copy()
+        state["_order_listeners"] = []
+        state["_archive_listeners"] = []
+        state["_operation_hooks"] = []
+        state["history"] = None  # Files on disk, handed back with use_history
+        state["_orders_by_id"] = {}
+        state["_orders_by_status"] = {}
+        state["_indexed_count"] = 0
+        state["_times_sorted"] = True
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.inventory.add_listener(self._refresh_availability)
+        self.inventory.add_listener(self._bump_version)
 
     def view_inventory(self):
         inventory = self.inventory.get_all_items()
@@ -21,11 +69,275 @@ class Warehouse:
 
         return inventory
 
+    def _index_new_orders(self):
+        """Index any orders appended to self.orders since the last call."""
+        previous = self.orders[self._indexed_count - 1] if self._indexed_count else None
+        for order in self.orders[self._indexed_count :]:
+            if previous is not None and order.timestamp < previous.timestamp:
+                self._times_sorted = False
+            previous = order
+            self._orders_by_id[order.order_id] = order
+            bucket = self._orders_by_status.setdefault(order.status, {})
+            bucket[order.order_id] = order
+            if order.status == "received":
+                self._mark_item_received(order.item)
+            self._indexed_count += 1
+            self._version += 1
+            self._notify_order_listeners(order, None)
+
+    @property
+    def version(self) -> int:
+        """A counter that increases whenever an order or stock line changes."""
+        self._index_new_orders()
+        return self._version
+
+    def _bump_version(self, _item: Item = None):
+        self._version += 1
+
+    def add_order_listener(self, listener: Callable[[Order, Optional[str]], None]):
+        """Register a callback for new orders and status changes.
+
+        The callback receives the order and its previous status (None for a new order).
+        Orders that already exist are indexed first and are not reported.
+        """
+        self._index_new_orders()
+        self._order_listeners.append(listener)
+
+    def add_archive_listener(self, listener: Callable[[List[Order], datetime], None]):
+        """Register a callback for closed orders being taken out by remove_closed_orders.
+
+        The callback receives the removed orders and the cutoff they were removed with.
+        """
+        self._archive_listeners.append(listener)
+
+    def watch_parties(self, customer_manager, supplier_manager):
+        """Bump the version when a customer or supplier profile changes.
+
+        Reports show the names of the parties to an order, so memoised reports must
+        not outlive a rename.
+        """
+        customer_manager.add_listener(self._on_party_event)
+        supplier_manager.add_listener(self._on_party_event)
+
+    def _on_party_event(self, event: str, _party, _item: Item = None):
+        if event == "updated":
+            self._version += 1
+
+    def add_operation_hook(self, hook: Callable[[], ContextManager]):
+        """Register a context manager factory entered around every warehouse operation.
+
+        An operation such as receiving an order changes several things (the order's
+        status, then the stock). A journal hooks its transaction() in here, so all of
+        an operation's records are committed together or not at all.
+        """
+        self._operation_hooks.append(hook)
+
+    @contextmanager
+    def operation(self):
+        """Treat the changes made inside as one operation for the operation hooks."""
+        if not self._operation_hooks:
+            yield
+            return
+        with ExitStack() as stack:
+            for hook in self._operation_hooks:
+                stack.enter_context(hook())
+            yield
+
+    def _notify_order_listeners(self, order: Order, previous_status: Optional[str]):
+        for listener in self._order_listeners:
+            listener(order, previous_status)
+
+    def restore_received_item(self, item: Item):
+        """Mark an item as received before, when the orders that did so are not loaded."""
+        self._mark_item_received(self.inventory.get_stored_item(item) or item)
+
+    def _mark_item_received(self, item: Item):
+        if item not in self._received_items:
+            self._received_items.add(item)
+            self._refresh_availability(item)
+
+    def _refresh_availability(self, item: Item):
+        """Re-evaluate whether a single item can currently be sold to customers."""
+        if item not in self._received_items:
+            return
+
+        stored_item = self.inventory.get_stored_item(item)
+        quantity, threshold = self.inventory.stock.get(item, (0, 0))
+        if stored_item is not None and quantity > threshold:
+            self._available_items[stored_item] = quantity
+        else:
+            self._available_items.pop(item, None)
+
+    def use_history(self, history):
+        """Keep the order history in a store such as OrderSegments instead of in memory.
+
+        The store must already be attached, so that it holds every order and follows
+        the changes. From then on only open orders stay in self.orders and the indexes;
+        closed ones are let go once the store has them, and lookups, history queries
+        and all_orders read the store.
+        """
+        self.history = history
+        self._index_new_orders()
+        self._retire_closed_orders(self.orders)
+        self._version += 1
+
+    @property
+    def all_orders(self):
+        """Every order: the history store if there is one, otherwise self.orders."""
+        return self.history if self.history is not None else self.orders
+
+    def _retire_closed_orders(self, orders: List[Order]):
+        """With a history store, let closed orders go from memory, the store keeps them."""
+        if self.history is not None:
+            self._forget_orders(
+                [order for order in orders if order.status in CLOSED_STATUSES]
+            )
+
+    def _forget_orders(self, orders: List[Order]):
+        """Take orders out of the order list, the indexes and their customers' histories."""
+        if not orders:
+            return
+        forgotten_ids = {order.order_id for order in orders}
+        customers = {}
+        for order in orders:
+            self._orders_by_id.pop(order.order_id, None)
+            self._orders_by_status.get(order.status, {}).pop(order.order_id, None)
+            if isinstance(order.buyer, Customer):
+                customers[id(order.buyer)] = order.buyer
+
+        # In place, the list is shared with finance reports
+        self.orders[:] = [o for o in self.orders if o.order_id not in forgotten_ids]
+        self._indexed_count = len(self.orders)
+        for customer in customers.values():
+            customer.order_history[:] = [
+                o for o in customer.order_history if o.order_id not in forgotten_ids
+            ]
+
+    def _live(self, orders) -> List[Order]:
+        """Orders read from the history, swapping in the objects still held in memory."""
+        return [self._orders_by_id.get(order.order_id, order) for order in orders]
+
+    def get_order(self, order_id: int) -> Optional[Order]:
+        """Return the order with the given ID, or None if it does not exist."""
+        self._index_new_orders()
+        order = self._orders_by_id.get(order_id)
+        if order is None and self.history is not None:
+            return self.history.get_order(order_id)
+        return order
+
+    def _set_status(self, order: Order, status: str, changed_at: datetime = None):
+        """Change an order's status, moving it to the matching status bucket."""
+        self._index_new_orders()
+        previous_status = order.status
+        self._orders_by_status.get(previous_status, {}).pop(order.order_id, None)
+        order.status = status
+        self._orders_by_status.setdefault(status, {})[order.order_id] = order
+        self.status_changes.append(
+            (order.order_id, status, changed_at or datetime.now())
+        )
+        if status == "received":
+            self._mark_item_received(order.item)
+        self._version += 1
+        self._notify_order_listeners(order, previous_status)
+        self._retire_closed_orders([order])
+
+    def set_order_status(
+        self, order_id: int, status: str, changed_at: datetime = None
+    ) -> Order:
+        """Change an order's status without moving any stock (e.g. when restoring saved state)."""
+        order = self.get_order(order_id)
+        if order is None:
+            raise ValueError(f"Order with ID {order_id} not found.")
+        with self.operation():
+            self._set_status(order, status, changed_at)
+        return order
+
+    def orders_with_status(self, status: str) -> List[Order]:
+        """Return all orders currently in the given status, oldest first."""
+        self._index_new_orders()
+        if self.history is not None and status in CLOSED_STATUSES:
+            return list(self.history.orders(status=status))
+        bucket = self._orders_by_status.get(status, {})
+        return [bucket[order_id] for order_id in sorted(bucket)]
+
+    def orders_between(
+        self,
+        start: datetime = None,
+        end: datetime = None,
+        status: str = None,
+        kind: int = None,
+    ) -> List[Order]:
+        """Return orders placed from start (inclusive) to end (exclusive), oldest first.
+
+        Either bound can be left open, and the result can be narrowed to a status and/or
+        an order kind. Orders are appended in time order, so the range is found by bisection.
+        With a history store the store is queried instead.
+        """
+        self._index_new_orders()
+        if self.history is not None:
+            return self._live(self.history.orders(start, end, status=status, kind=kind))
+        if self._times_sorted:
+            timestamp_of = attrgetter("timestamp")
+            low = 0
+            high = len(self.orders)
+            if start is not None:
+                low = bisect.bisect_left(self.orders, start, key=timestamp_of)
+            if end is not None:
+                high = bisect.bisect_left(self.orders, end, lo=low, key=timestamp_of)
+            orders = self.orders[low:high]
+        else:
+            # Imported history made the list out of time order, fall back to a scan
+            orders = [
+                order
+                for order in self.orders
+                if (start is None or order.timestamp >= start)
+                and (end is None or order.timestamp < end)
+            ]
+
+        if status is not None:
+            orders = [order for order in orders if order.status == status]
+        if kind is not None:
+            orders = [order for order in orders if order.kind == kind]
+        return orders
+
+    def closed_orders_before(self, before: datetime) -> List[Order]:
+        """Return received and delivered orders placed before a cutoff, oldest first."""
+        return [
+            order
+            for order in self.orders_between(end=before)
+            if order.status in CLOSED_STATUSES
+        ]
+
+    def customer_orders(self, customer: Customer) -> List[Order]:
+        """Return a customer's orders, oldest first, including those only in the history."""
+        if self.history is None:
+            return list(customer.order_history)
+        return self._live(self.history.orders(buyer=customer))
+
+    def remove_closed_orders(self, before: datetime) -> List[Order]:
+        """Take the orders closed_orders_before finds out of the warehouse, returning them.
+
+        They leave the order list, the indexes and their customers' order histories, so
+        scans over live orders stop paying for them. Archive listeners are told, so that
+        an archive, journal or store can follow.
+        """
+        with self.operation():
+            return self._remove_closed_orders(before)
+
+    def _remove_closed_orders(self, before: datetime) -> List[Order]:
+        removed = self.closed_orders_before(before)
+        if not removed:
+            return []
+
+        self._forget_orders(removed)
+        self._version += 1
+        for listener in self._archive_listeners:
+            listener(removed, before)
+        return removed
+
     def mark_order_as_received(self, order_id: int):
         """Marks an order as 'received' and adds stock to inventory."""
-        order = next(
-            (order for order in self.orders if order.order_id == order_id), None
-        )
+        order = self.get_order(order_id)
 
         if not order:
             print(f"Order with ID {order_id} not found.")
@@ -35,15 +347,16 @@ class Warehouse:
             print(f"Order #{order_id} has already been marked as received.")
             return
 
-        order.status = "received"
+        with self.operation():
+            self._set_status(order, "received")
 
-        # Add stock to inventory now
-        self.inventory.add_stock(order.item, order.quantity)
+            # Add stock to inventory now
+            self.inventory.add_stock(order.item, order.quantity)
         print(f"Order #{order_id} marked as received and stock updated.")
 
     def list_pending_orders(self):
         """Prints and returns a list of all pending orders."""
-        pending_orders = [order for order in self.orders if order.status != "received" or order.status !="delivered"]
+        pending_orders = self.orders_with_status("pending")
 
         if not pending_orders:
             print("No pending orders to mark as received.")
@@ -52,46 +365,72 @@ class Warehouse:
 
     def get_available_items(self) -> Dict[Item, int]:
         """Returns items that are above the threshold and marked as 'received'."""
-        available_items = {}
-
-        for item, (quantity, threshold) in self.inventory.get_full_item_info().items():
-            if quantity > threshold and any(
-                order.item == item and order.status == "received"
-                for order in self.orders
-            ):
-                available_items[item] = quantity
+        self._index_new_orders()
+        available_items = dict(self._available_items)
 
         if not available_items:
             print("No items are currently available for purchase.")
 
         return available_items
 
-    def _record_transaction(self, item: Item, quantity: int, buyer, seller) -> Order:
-        order = Order(item=item, quantity=quantity, buyer=buyer, seller=seller)
-        self.orders.append(order)
+    def _record_transaction(
+        self, item: Item, quantity: int, buyer, seller, kind: int = None
+    ) -> Order:
+        order = Order(
+            item=item, quantity=quantity, buyer=buyer, seller=seller, kind=kind
+        )
+        with self.operation():
+            self.orders.append(order)
+            self._index_new_orders()
 
         if isinstance(buyer, Customer):
             buyer.order_history.append(order)
+        self._retire_closed_orders([order])
 
         return order
 
+    def load_orders(self, orders: List[Order]):
+        """Bulk-add existing orders (e.g. imported history), keeping self.orders in ID order."""
+        self._index_new_orders()
+        with self.operation():
+            self.orders.extend(orders)
+            self._index_new_orders()
+
+        for order in orders:
+            if isinstance(order.buyer, Customer):
+                order.buyer.order_history.append(order)
+
+        # Nearly-sorted input, so this is close to linear
+        self.orders.sort(key=lambda order: order.order_id)
+        self._indexed_count = len(self.orders)
+        self._version += 1
+        self._times_sorted = all(
+            earlier.timestamp <= later.timestamp
+            for earlier, later in zip(self.orders, self.orders[1:])
+        )
+        self._retire_closed_orders(orders)
+
     def place_order(self, customer: Customer, item: Item, quantity: int) -> Order:
         """Customer places an order from the warehouse inventory, default status 'delivered'."""
         if self.inventory.check_stock(item) < quantity:
             raise ValueError("Not enough stock.")
 
-        self.inventory.remove_stock(item, quantity)
-        order = Order(
-            item=item,
-            quantity=quantity,
-            buyer=customer,
-            seller=self,
-            status="delivered",
-        )
-        self.orders.append(order)
+        with self.operation():
+            self.inventory.remove_stock(item, quantity)
+            order = Order(
+                item=item,
+                quantity=quantity,
+                buyer=customer,
+                seller=self,
+                status="delivered",
+                kind=Order.SALE,
+            )
+            self.orders.append(order)
+            self._index_new_orders()
 
         if isinstance(customer, Customer):
             customer.order_history.append(order)
+        self._retire_closed_orders([order])
 
         return order
 
@@ -105,5 +444,7 @@ class Warehouse:
         if not supplier.items_supplied:
             raise ValueError(f"{supplier.name} has no items available.")
 
-        order = self._record_transaction(item, quantity, buyer=self, seller=supplier)
+        order = self._record_transaction(
+            item, quantity, buyer=self, seller=supplier, kind=Order.PURCHASE
+        )
         return order
@@ -71,8 +71,7 @@ def create_mock_orders_to_supplier(supplier_manager, warehouse):
     )  # Gold Ore
 
     for order in orders_to_receive:
-        order.status = "received"
-        warehouse.inventory.add_stock(order.item, order.quantity)
+        warehouse.mark_order_as_received(order.order_id)
 
     warehouse.order_from_supplier(
         supplier1, supplier1.items_supplied[1], 128
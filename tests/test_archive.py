@@ -0,0 +1,303 @@
+# /tests/test_archive.py
+
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from app.archive import OrderArchive, archive_closed_orders
+from app.customer import CustomerManager
+from app.finance import FinanceCompiler, FinancialSummary
+from app.journal import Journal, open_journal, replay_journal
+from app.order import Order
+from app.snapshot import restore, write_snapshot
+from app.sqlite_store import SqliteStore, open_store
+from app.supplier import SupplierManager
+from app.warehouse import Warehouse
+
+
+class TestOrderArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "archive")
+
+        self.warehouse = Warehouse(name="Main Warehouse")
+        self.customers = CustomerManager()
+        self.suppliers = SupplierManager()
+        self.alice = self.customers.create_customer("Alice", "alice@example.com")
+        self.supplier = self.suppliers.create_supplier("Steve", "steve@example.com")
+        self.dirt = self.suppliers.create_supplier_item(
+            self.supplier.supplier_id, "Dirt", "Just dirt", 10.0
+        )
+        self.archive = OrderArchive(self.path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _trade(self):
+        """Old received and delivered orders, an old pending one and a recent sale."""
+        received = self.warehouse.order_from_supplier(self.supplier, self.dirt, 100)
+        self.warehouse.mark_order_as_received(received.order_id)
+        stocked_dirt = next(iter(self.warehouse.get_available_items()))
+        sale = self.warehouse.place_order(self.alice, stocked_dirt, 3)
+        pending = self.warehouse.order_from_supplier(self.supplier, self.dirt, 7)
+        recent = self.warehouse.place_order(self.alice, stocked_dirt, 2)
+        for days, order in zip((120, 110, 100), (received, sale, pending)):
+            order.timestamp = datetime.now() - timedelta(days=days)
+        return received, sale, pending, recent
+
+    def _fields(self, orders):
+        return [
+            (o.order_id, o.item.name, o.quantity, o.total_price, o.status, o.timestamp)
+            for o in orders
+        ]
+
+    def test_closed_orders_move_to_disk(self):
+        """Test that old closed orders leave the warehouse and can be read back."""
+        received, sale, pending, recent = self._trade()
+
+        self.assertEqual(archive_closed_orders(self.archive, self.warehouse), 2)
+
+        self.assertEqual(self.warehouse.orders, [pending, recent])
+        self.assertEqual(self.alice.order_history, [recent])
+        self.assertEqual(len(self.archive), 2)
+        self.assertEqual(
+            self._fields(self.archive.orders()), self._fields([received, sale])
+        )
+        self.assertEqual(
+            [o.buyer.name for o in self.archive.orders()], ["Main Warehouse", "Alice"]
+        )
+        # Nothing closed is old enough any more
+        self.assertEqual(archive_closed_orders(self.archive, self.warehouse), 0)
+
+    def test_archive_is_reopened_from_disk(self):
+        """Test that the segments and the in-memory totals survive a restart."""
+        received, sale, _, _ = self._trade()
+        archive_closed_orders(self.archive, self.warehouse)
+
+        archive = OrderArchive(self.path)
+        self.assertEqual(len(archive), 2)
+        self.assertTrue(archive.summary.matches(self.archive.summary))
+        self.assertEqual(archive.summary.revenue, sale.total_price)
+        self.assertEqual(archive.summary.costs, received.total_price)
+        self.assertEqual(self._fields(archive.orders()), self._fields([received, sale]))
+
+        between = archive.summarise(
+            start=sale.timestamp - timedelta(days=1),
+            end=sale.timestamp + timedelta(days=1),
+        )
+        self.assertEqual((between.order_count, between.revenue), (1, sale.total_price))
+        self.assertEqual(
+            archive.summarise(start=datetime.now() - timedelta(days=1)).order_count, 0
+        )
+
+    def test_reports_include_archived_orders_when_asked(self):
+        """Test that live reports leave archived orders out unless asked to include them."""
+        self._trade()
+        finance = FinanceCompiler(
+            self.warehouse.orders, warehouse=self.warehouse, archive=self.archive
+        )
+        before = finance.summarise()
+        # The running summary keeps changing in place, so take a copy
+        running_before = FinancialSummary.combined(finance.running_summary())
+        groups_before = finance.group_by("item")
+        margins_before = finance.margin_report()
+        periods_before = [
+            (bucket, totals.revenue, totals.costs)
+            for bucket, totals in finance.period_report("day")
+        ]
+
+        archive_closed_orders(self.archive, self.warehouse)
+
+        self.assertEqual(finance.summarise().order_count, 2)
+        self.assertEqual(finance.running_summary().order_count, 2)
+        self.assertTrue(finance.verify())
+        self.assertTrue(finance.summarise(include_archived=True).matches(before))
+        self.assertTrue(
+            running_before.matches(finance.running_summary(include_archived=True))
+        )
+        self.assertEqual(finance.group_by("item", include_archived=True), groups_before)
+        margin = finance.margin_report(include_archived=True).items[
+            ("Dirt", "Just dirt")
+        ]
+        self.assertEqual(
+            (margin.units_sold, margin.revenue, margin.units_bought, margin.cost),
+            (
+                margins_before.items[("Dirt", "Just dirt")].units_sold,
+                margins_before.items[("Dirt", "Just dirt")].revenue,
+                margins_before.items[("Dirt", "Just dirt")].units_bought,
+                margins_before.items[("Dirt", "Just dirt")].cost,
+            ),
+        )
+        self.assertEqual(
+            [
+                (bucket, totals.revenue, totals.costs)
+                for bucket, totals in finance.period_report(
+                    "day", include_archived=True
+                )
+            ],
+            periods_before,
+        )
+
+    def test_journal_replays_the_archival(self):
+        """Test that replaying a journal leaves archived orders out again."""
+        warehouse, customers, suppliers = (
+            Warehouse(name="Main Warehouse"),
+            CustomerManager(),
+            SupplierManager(),
+        )
+        journal_path = os.path.join(self.directory.name, "warehouse.journal")
+        with open_journal(journal_path, warehouse, customers, suppliers):
+            supplier = suppliers.create_supplier("Steve", "steve@example.com")
+            dirt = suppliers.create_supplier_item(
+                supplier.supplier_id, "Dirt", "Just dirt", 10.0
+            )
+            received = warehouse.order_from_supplier(supplier, dirt, 100)
+            warehouse.mark_order_as_received(received.order_id)
+            # The journal has the real timestamps, so archive everything closed
+            self.archive.archive(warehouse, datetime.now() + timedelta(seconds=1))
+            pending = warehouse.order_from_supplier(supplier, dirt, 5)
+
+        replayed = Warehouse(name="Main Warehouse")
+        replay_journal(journal_path, replayed, CustomerManager(), SupplierManager())
+        self.assertEqual([o.order_id for o in replayed.orders], [pending.order_id])
+        self.assertEqual(replayed.inventory.check_stock(dirt), 100)
+
+    def test_sqlite_store_deletes_archived_orders(self):
+        """Test that an SQLite store drops the rows of archived orders."""
+        store = SqliteStore(os.path.join(self.directory.name, "warehouse.db"))
+        store.attach(self.warehouse, self.customers, self.suppliers)
+        self._trade()
+        # The store saw the original timestamps, so archive everything closed
+        self.archive.archive(self.warehouse, datetime.now() + timedelta(seconds=1))
+
+        (count,) = store.connection.execute("SELECT COUNT(*) FROM orders").fetchone()
+        store.close()
+        self.assertEqual(count, 1)  # Only the pending order is left
+
+    def test_run_cut_short_before_the_removal_is_undone(self):
+        """Test that a segment written by a run that crashed before removing its orders is dropped."""
+        self._trade()
+        with patch.object(
+            self.warehouse, "remove_closed_orders", side_effect=RuntimeError("crash")
+        ):
+            with self.assertRaises(RuntimeError):
+                archive_closed_orders(self.archive, self.warehouse)
+        self.assertEqual(len(self.warehouse.orders), 4)
+
+        archive = OrderArchive(self.path)
+        self.assertEqual(archive.recover(self.warehouse), 0)
+        self.assertEqual(os.listdir(self.path), [])
+        self.assertEqual(archive_closed_orders(archive, self.warehouse), 2)
+        self.assertEqual(archive.summary.order_count, 2)
+
+    def test_run_cut_short_after_the_removal_is_published(self):
+        """Test that a segment whose orders were already removed is published on recovery."""
+        received, sale, _, _ = self._trade()
+        with patch.object(OrderArchive, "_publish", side_effect=RuntimeError("crash")):
+            with self.assertRaises(RuntimeError):
+                archive_closed_orders(self.archive, self.warehouse)
+        self.assertEqual(len(self.warehouse.orders), 2)
+
+        archive = OrderArchive(self.path)
+        self.assertEqual(len(archive), 0)
+        self.assertEqual(archive.recover(self.warehouse), 2)
+        self.assertEqual(self._fields(archive.orders()), self._fields([received, sale]))
+        self.assertEqual(archive.summary.order_count, 2)
+        self.assertEqual(OrderArchive(self.path).summary.order_count, 2)
+
+    def test_orders_already_in_a_segment_are_not_archived_twice(self):
+        """Test that orders left in the warehouse after being published are only removed."""
+        self._trade()
+        # As if the removal had been lost after the segment was published
+        with patch.object(self.warehouse, "remove_closed_orders"):
+            self.assertEqual(archive_closed_orders(self.archive, self.warehouse), 2)
+        self.assertEqual(len(self.warehouse.orders), 4)
+
+        self.assertEqual(archive_closed_orders(self.archive, self.warehouse), 0)
+        self.assertEqual(len(self.warehouse.orders), 2)
+        self.assertEqual((len(self.archive), self.archive.summary.order_count), (2, 2))
+
+    def test_journal_commits_the_archival_straight_away(self):
+        """Test that an archival is durable before the archive publishes anything."""
+        journal_path = os.path.join(self.directory.name, "warehouse.journal")
+        self._trade()
+        with Journal(journal_path, group_size=1000, commit_interval=60) as journal:
+            journal.attach(self.warehouse, self.customers, self.suppliers)
+            self.customers.create_customer(
+                "Bob", "bob@example.com"
+            )  # First, so committed
+            self.customers.create_customer("Carol", "carol@example.com")  # Held back
+            commits = journal.commits
+            archive_closed_orders(self.archive, self.warehouse)
+            self.assertEqual(journal.commits, commits + 1)
+            self.assertEqual(journal._pending, 0)
+
+    def _receive_and_archive(self, warehouse, customers, suppliers):
+        """Receive dirt, then archive the only order that received it."""
+        supplier = suppliers.create_supplier("Steve", "steve@example.com")
+        dirt = suppliers.create_supplier_item(
+            supplier.supplier_id, "Dirt", "Just dirt", 10.0
+        )
+        received = warehouse.order_from_supplier(supplier, dirt, 5)
+        warehouse.mark_order_as_received(received.order_id)
+        self.archive.archive(warehouse, datetime.now() + timedelta(seconds=1))
+        self.assertEqual(warehouse.orders, [])
+        return dirt
+
+    def test_received_items_stay_on_sale_after_a_snapshot_restart(self):
+        """Test that archived receipts still count once a snapshot is restored."""
+        snapshot_path = os.path.join(self.directory.name, "warehouse.snapshot")
+        journal_path = os.path.join(self.directory.name, "warehouse.journal")
+        warehouse, customers, suppliers = (
+            Warehouse(name="Main Warehouse"),
+            CustomerManager(),
+            SupplierManager(),
+        )
+        with open_journal(journal_path, warehouse, customers, suppliers) as journal:
+            dirt = self._receive_and_archive(warehouse, customers, suppliers)
+            write_snapshot(snapshot_path, warehouse, customers, suppliers, journal)
+
+        with patch("builtins.print"):
+            restored, _, _ = restore(snapshot_path, journal_path)
+        self.assertEqual(restored.get_available_items(), {dirt: 5})
+
+    def test_received_items_stay_on_sale_after_an_sqlite_restart(self):
+        """Test that archived receipts still count once an SQLite store is reopened."""
+        path = os.path.join(self.directory.name, "warehouse.db")
+        warehouse, customers, suppliers = (
+            Warehouse(name="Main Warehouse"),
+            CustomerManager(),
+            SupplierManager(),
+        )
+        with open_store(path, warehouse, customers, suppliers):
+            dirt = self._receive_and_archive(warehouse, customers, suppliers)
+
+        reopened = Warehouse(name="Main Warehouse")
+        with open_store(path, reopened, CustomerManager(), SupplierManager()):
+            self.assertEqual(reopened.get_available_items(), {dirt: 5})
+
+    def test_order_ids_are_not_reused_after_an_sqlite_restart(self):
+        """Test that archiving every order does not let a restart hand out their IDs again."""
+        path = os.path.join(self.directory.name, "warehouse.db")
+        warehouse, customers, suppliers = (
+            Warehouse(name="Main Warehouse"),
+            CustomerManager(),
+            SupplierManager(),
+        )
+        with open_store(path, warehouse, customers, suppliers):
+            dirt = self._receive_and_archive(warehouse, customers, suppliers)
+        archived_id = next(self.archive.orders()).order_id
+
+        Order._id_counter = 1  # As in a new process
+        reopened = Warehouse(name="Main Warehouse")
+        reopened_suppliers = SupplierManager()
+        with open_store(path, reopened, CustomerManager(), reopened_suppliers):
+            supplier = next(iter(reopened_suppliers.suppliers.values()))
+            order = reopened.order_from_supplier(supplier, dirt, 1)
+        self.assertGreater(order.order_id, archived_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+# /tests/test_binary_export.py
+
+import os
+import tempfile
+import unittest
+from app.binary_export import numpy, read_orders_binary, write_orders_binary
+from app.customer import CustomerManager
+from app.order_log import OrderLog
+from app.supplier import SupplierManager
+from app.warehouse import Warehouse
+
+
+class TestBinaryExport(unittest.TestCase):
+
+    def setUp(self):
+        self.warehouse = Warehouse(name="Main Warehouse")
+        self.customer = CustomerManager().create_customer("Alice", "alice@example.com")
+        supplier_manager = SupplierManager()
+        self.supplier = supplier_manager.create_supplier("Steve", "steve@example.com")
+        self.item = supplier_manager.create_supplier_item(
+            self.supplier.supplier_id, "Dirt", "Just dirt", 10.0
+        )
+
+        purchase = self.warehouse.order_from_supplier(self.supplier, self.item, 10)
+        self.warehouse.mark_order_as_received(purchase.order_id)
+        self.warehouse.place_order(self.customer, self.item, 3)
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def _check_columns(self, columns, meta):
+        purchase, sale = self.warehouse.orders
+        strings = meta["strings"]
+
+        self.assertEqual(meta["rows"], 2)
+        self.assertEqual(list(columns["order_id"]), [purchase.order_id, sale.order_id])
+        self.assertEqual(list(columns["quantity"]), [10, 3])
+        self.assertEqual(list(columns["total_pence"]), [10000, 3000])
+        self.assertEqual(
+            [meta["statuses"][code] for code in columns["status"]],
+            ["received", "delivered"],
+        )
+        self.assertEqual([strings[i] for i in columns["item_name"]], ["Dirt", "Dirt"])
+        self.assertEqual(
+            [strings[i] for i in columns["buyer_name"]], ["Main Warehouse", "Alice"]
+        )
+        self.assertEqual(
+            [strings[i] for i in columns["seller_name"]], ["Steve", "Main Warehouse"]
+        )
+        self.assertEqual(columns["timestamp"][0], purchase.timestamp.timestamp())
+
+    def test_round_trip(self):
+        """Test that written columns read back with the same values."""
+        rows = write_orders_binary(self.warehouse.orders, self.directory.name)
+        self.assertEqual(rows, 2)
+        self._check_columns(*read_orders_binary(self.directory.name, use_numpy=False))
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_round_trip_numpy_memmap(self):
+        """Test that columns can be memory-mapped with NumPy."""
+        write_orders_binary(OrderLog(self.warehouse.orders), self.directory.name)
+        self._check_columns(*read_orders_binary(self.directory.name, use_numpy=True))
+
+    def test_fixed_width_columns(self):
+        """Test that each column file is exactly rows x width bytes."""
+        write_orders_binary(self.warehouse.orders, self.directory.name)
+        size = os.path.getsize(os.path.join(self.directory.name, "order_id.bin"))
+        self.assertEqual(size, 2 * 8)
+
+    def test_empty_export(self):
+        """Test exporting and reading back no orders."""
+        write_orders_binary([], self.directory.name)
+        columns, meta = read_orders_binary(self.directory.name, use_numpy=False)
+        self.assertEqual(meta["rows"], 0)
+        self.assertEqual(len(columns["order_id"]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
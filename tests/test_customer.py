@@ -84,6 +84,20 @@ class TestCustomerManager(unittest.TestCase):
         customer = self.manager.get_customer_by_id(non_existent_id)
         self.assertIsNone(customer)
 
+    def test_update_customer_notifies_listeners(self):
+        """Test that update_customer changes the profile and reports the change."""
+        customer = self.manager.create_customer("Alice", "alice@example.com")
+        events = []
+        self.manager.add_listener(lambda event, c: events.append((event, c.name)))
+
+        self.manager.update_customer(customer.customer_id, name="Alicia")
+        self.assertEqual(
+            (customer.name, customer.email), ("Alicia", "alice@example.com")
+        )
+        self.assertEqual(events, [("updated", "Alicia")])
+        with self.assertRaises(ValueError):
+            self.manager.update_customer("cu_9999", name="Nobody")
+
     def test_view_order_history_empty(self):
         """Test that view_order_history returns None when there is no order history."""
         customer = Customer("Charlie", "charlie@example.com")
@@ -3,9 +3,12 @@
 import unittest
 import io
 import os
+import tempfile
+from datetime import date, datetime
 from unittest.mock import patch
-from app.finance import FinanceCompiler
+from app.finance import FinanceCompiler, GroupTotals
 from app.order import Order
+from app.order_log import OrderLog
 from app.item import Item
 from app.supplier import Supplier, SupplierManager
 from app.warehouse import Warehouse
@@ -157,6 +160,407 @@ class TestFinanceCompiler(unittest.TestCase):
         finally:
             os.remove(file_path)
 
+    def test_finance_uses_warehouse_status_buckets(self):
+        """Test that a compiler attached to a warehouse reads its status buckets."""
+        self.supplier_manager.create_supplier_item(
+            self.supplier.supplier_id, "Widget", "A small widget", 19.99
+        )
+        compiler = FinanceCompiler(self.warehouse.orders, warehouse=self.warehouse)
+        order = self.warehouse.order_from_supplier(self.supplier, self.item1, 4)
+        self.assertEqual(compiler.get_supplier_orders(), [])
+
+        self.warehouse.mark_order_as_received(order.order_id)
+        self.assertEqual(compiler.get_supplier_orders(), [order])
+        self.assertEqual(compiler.total_supplier_costs(), order.total_price)
+
+    def test_summarise_matches_individual_totals(self):
+        """Test that the single-pass summary agrees with the separate calculations."""
+        self.order2.status = "received"
+        summary = self.finance_compiler.summarise()
+
+        self.assertEqual(
+            summary.revenue, self.finance_compiler.total_customer_revenue()
+        )
+        self.assertEqual(summary.costs, self.finance_compiler.total_supplier_costs())
+        self.assertEqual(summary.profit, self.finance_compiler.calculate_profit())
+        self.assertEqual(summary.customer_order_count, 1)
+        self.assertEqual(summary.supplier_order_count, 1)
+        self.assertEqual(summary.status_counts, {"delivered": 1, "received": 1})
+        self.assertEqual(summary.status_totals["received"], self.order2.total_price)
+
+    def test_running_summary_follows_warehouse_events(self):
+        """Test that running totals track new orders and status changes."""
+        self.supplier_manager.create_supplier_item(
+            self.supplier.supplier_id, "Widget", "A small widget", 19.99
+        )
+        compiler = FinanceCompiler(self.warehouse.orders, warehouse=self.warehouse)
+
+        purchase = self.warehouse.order_from_supplier(self.supplier, self.item1, 10)
+        self.assertEqual(compiler.running_summary().costs, 0.0)
+        self.assertEqual(compiler.running_summary().status_counts, {"pending": 1})
+
+        self.warehouse.mark_order_as_received(purchase.order_id)
+        sale = self.warehouse.place_order(self.customer, self.item1, 4)
+
+        summary = compiler.running_summary()
+        self.assertEqual(summary.costs, purchase.total_price)
+        self.assertEqual(summary.revenue, sale.total_price)
+        self.assertEqual(summary.status_counts, {"received": 1, "delivered": 1})
+        self.assertTrue(compiler.verify())
+
+    def test_verify_rebuilds_stale_running_totals(self):
+        """Test that verify detects and repairs running totals that drifted."""
+        compiler = FinanceCompiler(self.warehouse.orders, warehouse=self.warehouse)
+        compiler.running_summary().revenue = 100.0
+
+        self.assertFalse(compiler.verify())
+        self.assertEqual(compiler.running_summary().revenue, 0.0)
+
+    def test_export_orders_to_csv_streams_generator_in_batches(self):
+        """Test exporting from a generator with batches smaller than the order count."""
+        file_path = "test_orders_stream.csv"
+        orders = (order for order in self.orders)
+        with patch("sys.stdout", new=io.StringIO()):
+            rows = self.finance_compiler.export_orders_to_csv(
+                orders, file_path, batch_size=1
+            )
+        try:
+            with open(file_path, "r") as file:
+                lines = file.read().splitlines()
+        finally:
+            os.remove(file_path)
+
+        self.assertEqual(rows, 2)
+        self.assertEqual(
+            lines[0], "Order ID,Item,Quantity,Total Price,Buyer,Seller,Status,Date"
+        )
+        self.assertEqual(
+            lines[1],
+            f"{self.order1.order_id},Widget,5,£{self.order1.total_price:.2f},Alice,"
+            f"Main Warehouse,delivered,{self.order1.timestamp.strftime('%Y-%m-%d %H:%M:%S')}",
+        )
+
+    def test_export_orders_incremental_appends_new_orders_and_patches(self):
+        """Test that a second incremental export only appends what changed."""
+        self.supplier_manager.create_supplier_item(
+            self.supplier.supplier_id, "Widget", "A small widget", 19.99
+        )
+        compiler = FinanceCompiler(self.warehouse.orders, warehouse=self.warehouse)
+        first = self.warehouse.order_from_supplier(self.supplier, self.item1, 10)
+
+        with tempfile.TemporaryDirectory() as directory, patch(
+            "sys.stdout", new=io.StringIO()
+        ):
+            file_path = os.path.join(directory, "report.csv")
+            self.assertEqual(compiler.export_orders_incremental(file_path), (1, 0))
+            self.assertEqual(compiler.export_orders_incremental(file_path), (0, 0))
+
+            self.warehouse.mark_order_as_received(first.order_id)
+            second = self.warehouse.order_from_supplier(self.supplier, self.item1, 3)
+            self.assertEqual(compiler.export_orders_incremental(file_path), (1, 1))
+
+            with open(file_path) as file:
+                rows = file.read().splitlines()
+            with open(file_path + ".patches.csv") as file:
+                patches = file.read().splitlines()
+
+        self.assertEqual(len(rows), 3)  # Header, then one row per order
+        self.assertTrue(rows[2].startswith(f"{second.order_id},Widget,3,"))
+        self.assertEqual(patches[0], "Order ID,Status,Date")
+        self.assertTrue(patches[1].startswith(f"{first.order_id},received,"))
+
+    def test_incremental_export_starts_again_after_a_full_export(self):
+        """Test that a full export to the same file does not leave a stale checkpoint."""
+        self.supplier_manager.create_supplier_item(
+            self.supplier.supplier_id, "Widget", "A small widget", 19.99
+        )
+        compiler = FinanceCompiler(self.warehouse.orders, warehouse=self.warehouse)
+        self.warehouse.order_from_supplier(self.supplier, self.item1, 10)
+
+        with tempfile.TemporaryDirectory() as directory, patch(
+            "sys.stdout", new=io.StringIO()
+        ):
+            file_path = os.path.join(directory, "report.csv")
+            compiler.export_orders_incremental(file_path)
+            self.warehouse.order_from_supplier(self.supplier, self.item1, 3)
+            compiler.export_orders_to_csv(self.warehouse.orders, file_path)
+            self.warehouse.order_from_supplier(self.supplier, self.item1, 5)
+            compiler.export_orders_incremental(file_path)
+
+            with open(file_path) as file:
+                ids = [line.split(",")[0] for line in file.read().splitlines()[1:]]
+
+        self.assertEqual(ids, [str(o.order_id) for o in self.warehouse.orders])
+
+    def test_incremental_export_starts_again_when_status_changes_were_dropped(self):
+        """Test that a gap in the bounded status change history forces a full export."""
+        self.supplier_manager.create_supplier_item(
+            self.supplier.supplier_id, "Widget", "A small widget", 19.99
+        )
+        with patch("app.warehouse.STATUS_CHANGE_LIMIT", 2):
+            warehouse = Warehouse(name="Main Warehouse")
+        compiler = FinanceCompiler(warehouse.orders, warehouse=warehouse)
+        orders = [
+            warehouse.order_from_supplier(self.supplier, self.item1, 1)
+            for _ in range(3)
+        ]
+
+        with tempfile.TemporaryDirectory() as directory, patch(
+            "sys.stdout", new=io.StringIO()
+        ):
+            file_path = os.path.join(directory, "report.csv")
+            self.assertEqual(compiler.export_orders_incremental(file_path), (3, 0))
+            warehouse.mark_order_as_received(orders[0].order_id)
+            self.assertEqual(compiler.export_orders_incremental(file_path), (0, 1))
+            for order in orders[1:]:
+                warehouse.mark_order_as_received(order.order_id)
+            # Only two changes are kept, so there is no telling what else was missed
+            self.assertEqual(compiler.export_orders_incremental(file_path), (3, 0))
+            self.assertFalse(os.path.exists(file_path + ".patches.csv"))
+
+    def test_finance_date_range(self):
+        """Test that finance figures can be limited to a date range."""
+        self.order2.status = "received"
+        self.order1.timestamp = datetime(2025, 1, 15)
+        self.order2.timestamp = datetime(2025, 2, 15)
+        january = (datetime(2025, 1, 1), datetime(2025, 2, 1))
+
+        summary = self.finance_compiler.summarise(*january)
+        self.assertEqual(summary.revenue, self.order1.total_price)
+        self.assertEqual(summary.costs, 0.0)
+        self.assertEqual(self.finance_compiler.get_all_orders(*january), [self.order1])
+        self.assertEqual(
+            self.finance_compiler.total_supplier_costs(datetime(2025, 2, 1)),
+            self.order2.total_price,
+        )
+        self.assertEqual(
+            FinanceCompiler(OrderLog(self.orders)).summarise(*january).revenue,
+            round(self.order1.total_price, 2),
+        )
+
+    def _load_history(self):
+        """Load a purchase and a sale in January and a pending purchase in February"""
+        history = [
+            Order.from_record(
+                1001,
+                self.item1,
+                10,
+                self.warehouse,
+                self.supplier,
+                "received",
+                datetime(2025, 1, 6),
+            ),
+            Order.from_record(
+                1002,
+                self.item1,
+                4,
+                self.customer,
+                self.warehouse,
+                "delivered",
+                datetime(2025, 1, 20),
+                total_price=100.0,
+            ),
+            Order.from_record(
+                1003,
+                self.item2,
+                2,
+                self.warehouse,
+                self.supplier,
+                "pending",
+                datetime(2025, 2, 3),
+            ),
+        ]
+        self.warehouse.load_orders(history)
+        return history
+
+    def test_period_report_from_rollups(self):
+        """Test that monthly and weekly rollups follow loaded orders and status changes."""
+        compiler = FinanceCompiler(self.warehouse.orders, warehouse=self.warehouse)
+        purchase, sale, pending = self._load_history()
+
+        ((month, totals),) = compiler.period_report("month")
+        self.assertEqual(month, date(2025, 1, 1))
+        self.assertEqual(totals.revenue, 100.0)
+        self.assertEqual(totals.costs, purchase.total_price)
+        self.assertEqual((totals.units_sold, totals.units_bought), (4, 10))
+
+        self.warehouse.mark_order_as_received(pending.order_id)
+        report = compiler.period_report("week", start=date(2025, 1, 13))
+        self.assertEqual(
+            [bucket for bucket, _ in report], [date(2025, 1, 20), date(2025, 2, 3)]
+        )
+        self.assertEqual(report[1][1].costs, pending.total_price)
+
+        gadget = compiler.period_report("month", item_name="Gadget")
+        self.assertEqual([bucket for bucket, _ in gadget], [date(2025, 2, 1)])
+
+    def test_rollups_drop_buckets_whose_orders_are_removed(self):
+        """Test that buckets emptied by removing orders are not reported as zeros."""
+        compiler = FinanceCompiler(self.warehouse.orders, warehouse=self.warehouse)
+        purchase, sale, pending = self._load_history()
+        self.warehouse.mark_order_as_received(pending.order_id)
+
+        self.warehouse.remove_closed_orders(before=datetime(2025, 2, 1))
+        self.assertEqual(
+            [bucket for bucket, _ in compiler.period_report("day")], [date(2025, 2, 3)]
+        )
+        self.assertEqual(compiler.period_report("month", item_name="Widget"), [])
+        self.assertNotIn(
+            ("Widget", "A small widget"), compiler._rollups.item_totals["day"]
+        )
+
+    def test_period_report_without_warehouse(self):
+        """Test that a compiler without a warehouse builds the same report in one pass."""
+        self._load_history()
+        attached = FinanceCompiler(self.warehouse.orders, warehouse=self.warehouse)
+        detached = FinanceCompiler(self.warehouse.orders)
+
+        for period in ("day", "week", "month"):
+            self.assertEqual(
+                [(b, t.revenue, t.costs) for b, t in attached.period_report(period)],
+                [(b, t.revenue, t.costs) for b, t in detached.period_report(period)],
+            )
+        with self.assertRaises(ValueError):
+            detached.period_report("year")
+
+    def test_margin_report(self):
+        """Test item margins and supplier spend from delivered sales and received purchases."""
+        compiler = FinanceCompiler(self.warehouse.orders, warehouse=self.warehouse)
+        purchase, sale, pending = self._load_history()
+
+        report = compiler.margin_report()
+        widget = report.items[("Widget", "A small widget")]
+        self.assertEqual((widget.units_sold, widget.units_bought), (4, 10))
+        self.assertEqual(widget.revenue, 100.0)
+        self.assertAlmostEqual(widget.unit_cost, 19.99)
+        self.assertAlmostEqual(widget.margin, 100.0 - 4 * 19.99)
+        self.assertNotIn(
+            ("Gadget", "A useful gadget"), report.items
+        )  # Its purchase is still pending
+        self.assertEqual(
+            report.suppliers, {"Supplier A": GroupTotals(1, 10, purchase.total_price)}
+        )
+
+        self.warehouse.mark_order_as_received(pending.order_id)
+        report = FinanceCompiler(self.warehouse.orders).margin_report()
+        self.assertEqual(report.items[("Gadget", "A useful gadget")].margin, 0.0)
+        self.assertEqual(report.suppliers["Supplier A"].count, 2)
+
+    def test_items_sharing_a_name_are_kept_apart(self):
+        """Test that margins, groups and rollups key items by name and description."""
+        solid = Item("Stone", "Solid stone", 1.0, self.supplier)
+        polished = Item("Stone", "Polished stone", 8.0, self.supplier)
+        day = datetime(2025, 3, 3)
+        self.warehouse.load_orders(
+            [
+                Order.from_record(
+                    2001, solid, 10, self.warehouse, self.supplier, "received", day
+                ),
+                Order.from_record(
+                    2002, polished, 10, self.warehouse, self.supplier, "received", day
+                ),
+                Order.from_record(
+                    2003,
+                    solid,
+                    10,
+                    self.customer,
+                    self.warehouse,
+                    "delivered",
+                    day,
+                    total_price=20.0,
+                ),
+            ]
+        )
+        compiler = FinanceCompiler(self.warehouse.orders, warehouse=self.warehouse)
+
+        margin = compiler.margin_report().items[("Stone", "Solid stone")]
+        self.assertAlmostEqual(margin.margin, 10.0)
+        groups = compiler.group_by("item", start=day)
+        self.assertEqual(groups[("Stone", "Solid stone")].quantity, 20)
+        self.assertEqual(groups[("Stone", "Polished stone")].quantity, 10)
+
+        ((_, solid_totals),) = compiler.period_report(
+            "day", item_name="Stone", item_description="Solid stone"
+        )
+        self.assertEqual((solid_totals.revenue, solid_totals.costs), (20.0, 10.0))
+        ((_, both),) = compiler.period_report("day", item_name="Stone")
+        self.assertEqual(both.costs, 90.0)
+
+    def test_reports_are_cached_until_the_warehouse_changes(self):
+        """Test that repeated reports are memoised and recomputed after a change."""
+        compiler = FinanceCompiler(self.warehouse.orders, warehouse=self.warehouse)
+        purchase, sale, pending = self._load_history()
+
+        summary = compiler.summarise()
+        self.assertIs(compiler.summarise(), summary)
+        self.assertIs(compiler.summarise_orders(), compiler.summarise_orders())
+        self.assertIs(compiler.get_supplier_orders(), compiler.get_supplier_orders())
+
+        self.warehouse.mark_order_as_received(pending.order_id)
+        self.assertIsNot(compiler.summarise(), summary)
+        self.assertEqual(compiler.summarise().costs, compiler.total_supplier_costs())
+        self.assertEqual(len(compiler.get_supplier_orders()), 2)
+        self.assertEqual(compiler.summarise_orders()[2]["status"], "received")
+
+    def test_cached_reports_follow_party_renames(self):
+        """Test that renaming a supplier or customer recomputes the cached reports."""
+        self.warehouse.watch_parties(self.customer_manager, self.supplier_manager)
+        compiler = FinanceCompiler(self.warehouse.orders, warehouse=self.warehouse)
+        self._load_history()
+        self.assertIn("Supplier A", compiler.group_by("supplier"))
+        self.assertEqual(
+            compiler.summarise_orders_page()[0]["seller_name"], "Supplier A"
+        )
+
+        self.supplier_manager.update_supplier(self.supplier.supplier_id, name="Steven")
+        self.customer_manager.update_customer(self.customer.customer_id, name="Alicia")
+
+        self.assertEqual(list(compiler.group_by("supplier")), ["Steven"])
+        self.assertEqual(list(compiler.group_by("customer")), ["Alicia"])
+        self.assertEqual(compiler.summarise_orders_page()[0]["seller_name"], "Steven")
+
+    def test_report_cache_is_bounded(self):
+        """Test that the least recently used reports are evicted from the cache."""
+        compiler = FinanceCompiler(self.warehouse.orders, warehouse=self.warehouse)
+        self._load_history()
+
+        with patch("app.finance.REPORT_CACHE_SIZE", 2):
+            first = compiler.summarise(start=datetime(2025, 1, 1))
+            compiler.summarise(start=datetime(2025, 1, 2))
+            compiler.summarise(start=datetime(2025, 1, 1))  # Now most recently used
+            compiler.summarise(start=datetime(2025, 1, 3))
+
+            self.assertEqual(len(compiler._cache), 2)
+            self.assertIs(compiler.summarise(start=datetime(2025, 1, 1)), first)
+
+    def test_summarise_orders_page(self):
+        """Test paging through order summaries in list order and sorted order."""
+        self._load_history()  # Orders 1001-1003 after the two from setUp
+        ids = [o.order_id for o in self.warehouse.orders]
+        compiler = FinanceCompiler(self.warehouse.orders, warehouse=self.warehouse)
+
+        pages = [compiler.summarise_orders_page(page, 2) for page in (1, 2, 3)]
+        self.assertEqual(
+            [[s["order_id"] for s in p] for p in pages], [ids[:2], ids[2:]] + [[]]
+        )
+        self.assertEqual(compiler.page_count(2), 2)
+
+        newest = compiler.summarise_orders_page(1, 2, reverse=True)
+        self.assertEqual([s["order_id"] for s in newest], ids[::-1][:2])
+
+        by_total = [
+            s["total_price"]
+            for s in compiler.iter_order_summaries("total_price", reverse=True)
+        ]
+        self.assertEqual(by_total, sorted(by_total, reverse=True))
+        second_page = compiler.summarise_orders_page(2, 2, "total_price", reverse=True)
+        self.assertEqual([s["total_price"] for s in second_page], by_total[2:4])
+
+        with self.assertRaises(ValueError):
+            compiler.summarise_orders_page(1, 2, "colour")
+        with self.assertRaises(ValueError):
+            compiler.summarise_orders_page(0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,125 @@
+# /tests/test_finance_numpy.py
+
+import random
+import unittest
+from datetime import datetime, timedelta
+from app.customer import CustomerManager
+from app.finance import FinanceCompiler
+from app.finance_numpy import numpy
+from app.item import Item
+from app.order import Order
+from app.supplier import SupplierManager
+from app.warehouse import Warehouse
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestNumpyFinanceBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.warehouse = Warehouse(name="Main Warehouse")
+        customer_manager = CustomerManager()
+        supplier_manager = SupplierManager()
+        customers = [
+            customer_manager.create_customer(name, f"{name}@example.com")
+            for name in ("Alice", "Bob", "Cara")
+        ]
+        suppliers = [
+            supplier_manager.create_supplier(name, f"{name}@example.com")
+            for name in ("Steve", "Alex")
+        ]
+        items = [
+            Item(name, "Stock", price, suppliers[i % 2])
+            for i, (name, price) in enumerate(
+                [("Dirt", 0.1), ("Stone", 19.99), ("Oak", 3.33), ("Gold", 500.01)]
+            )
+        ]
+
+        # Awkward float prices, so any change in summation order would show up
+        randomiser = random.Random(42)
+        start = datetime(2025, 1, 1)
+        history = []
+        for order_id in range(1, 2001):
+            item = randomiser.choice(items)
+            quantity = randomiser.randint(1, 50)
+            if randomiser.random() < 0.5:
+                buyer, seller = self.warehouse, item.supplier
+                status = randomiser.choice(["pending", "received"])
+            else:
+                buyer, seller = randomiser.choice(customers), self.warehouse
+                status = "delivered"
+            history.append(
+                Order.from_record(
+                    order_id=10_000 + order_id,
+                    item=item,
+                    quantity=quantity,
+                    buyer=buyer,
+                    seller=seller,
+                    status=status,
+                    timestamp=start + timedelta(hours=order_id),
+                    total_price=item.price * quantity,
+                )
+            )
+        self.warehouse.load_orders(history)
+
+        self.python = FinanceCompiler(self.warehouse.orders, warehouse=self.warehouse)
+        self.vectorised = FinanceCompiler(
+            self.warehouse.orders, warehouse=self.warehouse, use_numpy=True
+        )
+
+    def _assert_identical(self):
+        for compiler_range in [
+            (None, None),
+            (datetime(2025, 1, 20), datetime(2025, 2, 5)),
+        ]:
+            python = self.python.summarise(*compiler_range)
+            vectorised = self.vectorised.summarise(*compiler_range)
+            self.assertEqual(vectorised.revenue, python.revenue)
+            self.assertEqual(vectorised.costs, python.costs)
+            self.assertEqual(vectorised.profit, python.profit)
+            self.assertEqual(vectorised.status_counts, python.status_counts)
+            self.assertEqual(vectorised.status_totals, python.status_totals)
+            self.assertEqual(
+                vectorised.customer_order_count, python.customer_order_count
+            )
+
+            for by in ("item", "supplier", "customer"):
+                self.assertEqual(
+                    list(self.vectorised.group_by(by, start=compiler_range[0]).items()),
+                    list(self.python.group_by(by, start=compiler_range[0]).items()),
+                )
+            self.assertEqual(
+                self.vectorised.group_by("item", Order.PURCHASE, "received"),
+                self.python.group_by("item", Order.PURCHASE, "received"),
+            )
+            self.assertEqual(
+                self.vectorised.order_value_percentiles((0, 25, 50, 90, 99.9, 100)),
+                self.python.order_value_percentiles((0, 25, 50, 90, 99.9, 100)),
+            )
+
+    def test_results_identical_to_python(self):
+        """Test that every vectorised figure matches the pure-Python path exactly."""
+        self._assert_identical()
+
+    def test_columns_follow_new_orders_and_status_changes(self):
+        """Test that the columns extend with new orders and pick up status changes."""
+        self.vectorised.summarise()  # Build the columns first
+        for order in self.warehouse.orders_with_status("pending")[:100]:
+            self.warehouse.mark_order_as_received(order.order_id)
+
+        supplier_item = self.warehouse.orders[0].item
+        supplier = supplier_item.supplier
+        supplier.add_item(supplier_item)
+        self.warehouse.order_from_supplier(supplier, supplier_item, 7)
+
+        self._assert_identical()
+
+    def test_empty_orders(self):
+        """Test the backend with no orders at all."""
+        compiler = FinanceCompiler([], use_numpy=True)
+        self.assertEqual(compiler.summarise().revenue, 0.0)
+        self.assertEqual(compiler.group_by("item"), {})
+        self.assertEqual(compiler.order_value_percentiles(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
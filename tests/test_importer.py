@@ -0,0 +1,114 @@
+# /tests/test_importer.py
+
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from app.customer import CustomerManager
+from app.finance import FinanceCompiler
+from app.importer import import_orders_csv
+from app.order import Order
+from app.supplier import SupplierManager
+from app.warehouse import Warehouse
+
+
+class TestImporter(unittest.TestCase):
+
+    def setUp(self):
+        self.source = Warehouse("Main Warehouse")
+        customer_manager = CustomerManager()
+        supplier_manager = SupplierManager()
+        customers = [
+            customer_manager.create_customer("Bkar", "mock@mockemail.com"),
+            customer_manager.create_customer("Aisha", "anothermock@mockemail.com"),
+        ]
+        steve = supplier_manager.create_supplier("Steve", "steve@mockemail.com")
+        alex = supplier_manager.create_supplier("Alex, Ltd", "alex@mockemail.com")
+        dirt = supplier_manager.create_supplier_item(
+            steve.supplier_id, "Dirt", "Just dirt", 10.0
+        )
+        stone = supplier_manager.create_supplier_item(
+            alex.supplier_id, "Cobblestone", "Rough stone", 19.99
+        )
+
+        with patch("sys.stdout", new=io.StringIO()):
+            for supplier, item, quantity in [(steve, dirt, 64), (alex, stone, 32)]:
+                order = self.source.order_from_supplier(supplier, item, quantity)
+                self.source.mark_order_as_received(order.order_id)
+            self.source.order_from_supplier(steve, dirt, 16)
+            self.source.order_from_supplier(alex, stone, 8)
+            self.source.inventory.update_price("Dirt", 12.5)
+            for customer, quantity in zip(customers, [5, 10]):
+                self.source.place_order(customer, dirt, quantity)
+
+            self.directory = tempfile.TemporaryDirectory()
+            self.addCleanup(self.directory.cleanup)
+            self.file_path = os.path.join(self.directory.name, "report.csv")
+            FinanceCompiler(self.source.orders).export_orders_to_csv(
+                self.source.orders, self.file_path
+            )
+
+        self.warehouse = Warehouse("Main Warehouse")
+        self.customer_manager = CustomerManager()
+        self.supplier_manager = SupplierManager()
+
+    def _import(self, **kwargs):
+        return import_orders_csv(
+            self.file_path,
+            self.warehouse,
+            self.customer_manager,
+            self.supplier_manager,
+            **kwargs,
+        )
+
+    def _check_imported(self):
+        self.assertEqual(len(self.warehouse.orders), len(self.source.orders))
+        for original, imported in zip(self.source.orders, self.warehouse.orders):
+            self.assertEqual(imported.order_id, original.order_id)
+            self.assertEqual(imported.item.name, original.item.name)
+            self.assertEqual(imported.quantity, original.quantity)
+            self.assertEqual(imported.total_price, round(original.total_price, 2))
+            self.assertEqual(imported.buyer.name, original.buyer.name)
+            self.assertEqual(imported.seller.name, original.seller.name)
+            self.assertEqual(imported.status, original.status)
+            self.assertEqual(imported.kind, original.kind)
+            self.assertEqual(
+                imported.timestamp, original.timestamp.replace(microsecond=0)
+            )
+
+    def test_import_round_trip(self):
+        """Test that an exported report imports back into equivalent orders."""
+        self.assertEqual(self._import(), len(self.source.orders))
+        self._check_imported()
+
+        # Parties and items are interned, one object per name
+        self.assertEqual(
+            sorted(c.name for c in self.customer_manager.customers.values()),
+            ["Aisha", "Bkar"],
+        )
+        self.assertEqual(len(self.supplier_manager.suppliers), 2)
+        self.assertEqual(len(self.warehouse.orders_with_status("pending")), 2)
+        self.assertGreater(Order._id_counter, self.warehouse.orders[-1].order_id)
+
+    def test_import_with_worker_processes(self):
+        """Test that parsing across worker processes gives the same result."""
+        self._import(processes=2, chunk_size=3)
+        self._check_imported()
+
+    def test_import_rejects_duplicate_order_ids(self):
+        """Test that importing the same report twice is refused."""
+        self._import()
+        with self.assertRaises(ValueError):
+            self._import()
+
+    def test_import_rejects_other_files(self):
+        """Test that a file without the report header is refused."""
+        with open(self.file_path, "w") as file:
+            file.write("not,a,report\n")
+        with self.assertRaises(ValueError):
+            self._import()
+
+
+if __name__ == "__main__":
+    unittest.main()
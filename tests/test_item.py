@@ -1,5 +1,6 @@
 # /tests/test_item.py
 
+import pickle
 import unittest
 from app.item import Item
 
@@ -29,6 +30,17 @@ class TestItem(unittest.TestCase):
         self.assertEqual(hash(item1), hash(item2))
         self.assertNotEqual(hash(item1), hash(item3))
 
+    def test_unpickled_item_hashes_afresh(self):
+        """Test that a pickled item gets the hash of this process, not the one it was saved in."""
+        item = Item("Dirt", "Just dirt", 10.0, supplier=None)
+        item._hash = 0  # As if the hash had come from another process
+        restored = pickle.loads(pickle.dumps(item))
+        self.assertEqual(hash(restored), hash(Item("Dirt", "Just dirt", 1.0, None)))
+        self.assertEqual(
+            (restored.name, restored.description, restored.price),
+            ("Dirt", "Just dirt", 10.0),
+        )
+
     def test_get_details_with_supplier(self):
         supplier = MockSupplier("Steve")
         item = Item("Dirt", "Just dirt", 10.0, supplier=supplier)
@@ -0,0 +1,193 @@
+# /tests/test_journal.py
+
+import os
+import tempfile
+import time
+import unittest
+from app.customer import CustomerManager
+from app.journal import ChangeRecorder, Journal, open_journal, replay_journal
+from app.order import Order
+from app.supplier import SupplierManager
+from app.warehouse import Warehouse
+
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "warehouse.journal")
+        self.warehouse, self.customers, self.suppliers = self._fresh()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _fresh(self):
+        return Warehouse(name="Main Warehouse"), CustomerManager(), SupplierManager()
+
+    def _run_session(self):
+        """Make one of every kind of change while a journal is recording."""
+        journal = open_journal(
+            self.path, self.warehouse, self.customers, self.suppliers
+        )
+        with journal:
+            alice = self.customers.create_customer("Alice", "alice@example.com")
+            bob = self.customers.create_customer("Bob", "bob@example.com")
+            supplier = self.suppliers.create_supplier("Steve", "steve@example.com")
+            dirt = self.suppliers.create_supplier_item(
+                supplier.supplier_id, "Dirt", "Just dirt", 10.0
+            )
+            stone = self.suppliers.create_supplier_item(
+                supplier.supplier_id, "Stone", "Solid stone", 30.0
+            )
+
+            received = self.warehouse.order_from_supplier(supplier, dirt, 20)
+            self.warehouse.order_from_supplier(supplier, stone, 5)  # Left pending
+            self.warehouse.mark_order_as_received(received.order_id)
+            self.warehouse.inventory.set_threshold("Dirt", 3)
+            self.warehouse.inventory.update_price("Dirt", 12.5)
+            stocked_dirt = next(iter(self.warehouse.get_available_items()))
+            self.warehouse.place_order(alice, stocked_dirt, 4)
+            self.suppliers.remove_item_from_supplier(supplier.supplier_id, stone)
+            self.customers.delete_customer(bob.customer_id)
+            self.customers.update_customer(alice.customer_id, name="Alicia")
+            self.suppliers.update_supplier(
+                supplier.supplier_id, email="steven@example.com"
+            )
+        return journal
+
+    def test_replay_rebuilds_the_same_state(self):
+        """Test that replaying a journal rebuilds the warehouse and both managers."""
+        self._run_session()
+        warehouse, customers, suppliers = self._fresh()
+        applied = replay_journal(self.path, warehouse, customers, suppliers)
+
+        self.assertGreater(applied, 0)
+        self.assertEqual(list(customers.customers), list(self.customers.customers))
+        self.assertEqual(list(suppliers.suppliers), list(self.suppliers.suppliers))
+        (supplier,) = suppliers.suppliers.values()
+        self.assertEqual([i.name for i in supplier.items_supplied], ["Dirt"])
+        self.assertEqual(supplier.email, "steven@example.com")
+        self.assertEqual([c.name for c in customers.customers.values()], ["Alicia"])
+
+        self.assertEqual(
+            [(i.name, i.price, line) for i, line in warehouse.inventory.stock.items()],
+            [
+                (i.name, i.price, line)
+                for i, line in self.warehouse.inventory.stock.items()
+            ],
+        )
+        self.assertEqual(
+            [
+                (o.order_id, o.item.name, o.quantity, o.total_price, o.status, o.kind)
+                for o in warehouse.orders
+            ],
+            [
+                (o.order_id, o.item.name, o.quantity, o.total_price, o.status, o.kind)
+                for o in self.warehouse.orders
+            ],
+        )
+        self.assertEqual(
+            [o.timestamp for o in warehouse.orders],
+            [o.timestamp for o in self.warehouse.orders],
+        )
+
+        sale = warehouse.orders[-1]
+        self.assertIs(sale.buyer, next(iter(customers.customers.values())))
+        self.assertEqual(sale.buyer.order_history, [sale])
+        self.assertIs(sale.item, warehouse.inventory.get_stored_item(sale.item))
+        self.assertEqual(
+            warehouse.get_available_items(), self.warehouse.get_available_items()
+        )
+        self.assertEqual(
+            [o.order_id for o in warehouse.list_pending_orders()],
+            [o.order_id for o in self.warehouse.list_pending_orders()],
+        )
+        self.assertGreater(Order._id_counter, sale.order_id)
+        self.assertEqual(
+            list(warehouse.status_changes), list(self.warehouse.status_changes)
+        )
+
+    def test_replayed_state_keeps_recording(self):
+        """Test that a second session appends to the journal and both replay together."""
+        self._run_session()
+        warehouse, customers, suppliers = self._fresh()
+        with open_journal(self.path, warehouse, customers, suppliers):
+            order = warehouse.list_pending_orders()[0]
+            warehouse.mark_order_as_received(order.order_id)
+
+        warehouse, customers, suppliers = self._fresh()
+        replay_journal(self.path, warehouse, customers, suppliers)
+        self.assertEqual(warehouse.list_pending_orders(), [])
+        self.assertEqual(len(warehouse.orders_with_status("received")), 2)
+
+    def test_fsyncs_are_grouped(self):
+        """Test that records written in a burst share fsyncs."""
+        with Journal(self.path, group_size=10, commit_interval=60) as journal:
+            for number in range(25):
+                journal.record("status", id=number, status="received")
+            self.assertEqual(journal.commits, 3)  # The first record, then 10 and 10
+        self.assertEqual(journal.commits, 4)  # The last 4 on close
+
+        with open(self.path) as file:
+            self.assertEqual(len(file.readlines()), 25)
+
+    def test_operations_are_committed_whole(self):
+        """Test that every record of one warehouse operation shares a single commit."""
+        supplier = self.suppliers.create_supplier("Steve", "steve@example.com")
+        dirt = self.suppliers.create_supplier_item(
+            supplier.supplier_id, "Dirt", "Just dirt", 10.0
+        )
+        order = self.warehouse.order_from_supplier(supplier, dirt, 20)
+        with Journal(self.path, group_size=1, commit_interval=60) as journal:
+            journal.attach(self.warehouse, self.customers, self.suppliers)
+            # The status record fills the group, but the stock record belongs with it
+            self.warehouse.mark_order_as_received(order.order_id)
+            self.assertEqual((journal.records, journal.commits), (2, 1))
+            self.assertEqual(journal._pending, 0)
+
+    def test_waiting_records_are_flushed_in_the_background(self):
+        """Test that a record held back for its group is committed without another record."""
+        with Journal(self.path, group_size=100, commit_interval=0.01) as journal:
+            journal.record("status", id=1, status="received")  # Commits straight away
+            journal.record("status", id=2, status="received")
+            deadline = time.monotonic() + 5
+            while journal.commits < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(journal.commits, 2)
+            self.assertEqual(journal._pending, 0)
+
+    def test_recorders_must_say_how_to_write(self):
+        """Test that a change recorder without _write and _sync cannot be created."""
+        with self.assertRaises(TypeError):
+            ChangeRecorder()
+
+    def test_torn_last_record_is_ignored(self):
+        """Test that a half-written last record from a crash is skipped and then cut off."""
+        with open_journal(self.path, self.warehouse, self.customers, self.suppliers):
+            self.customers.create_customer("Alice", "alice@example.com")
+        with open(self.path, "a") as file:
+            file.write('{"op":"customer","id":"cu_')
+
+        warehouse, customers, suppliers = self._fresh()
+        self.assertEqual(replay_journal(self.path, warehouse, customers, suppliers), 1)
+        self.assertEqual(len(customers.customers), 1)
+
+        # Recording again drops the torn line rather than appending onto it
+        with open_journal(self.path, warehouse, customers, suppliers):
+            customers.create_customer("Bob", "bob@example.com")
+        warehouse, customers, suppliers = self._fresh()
+        self.assertEqual(replay_journal(self.path, warehouse, customers, suppliers), 2)
+        self.assertEqual(
+            [c.name for c in customers.customers.values()], ["Alice", "Bob"]
+        )
+
+    def test_missing_journal_replays_nothing(self):
+        """Test that replaying a journal that doesn't exist yet changes nothing."""
+        self.assertEqual(
+            replay_journal(self.path, self.warehouse, self.customers, self.suppliers), 0
+        )
+        self.assertEqual(self.warehouse.orders, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,8 @@ import unittest
 from app.order import Order
 from app.item import Item
 from app.customer import Customer
+from app.supplier import SupplierManager
+from app.warehouse import Warehouse
 
 
 class TestOrderRepr(
@@ -16,3 +18,29 @@ class TestOrderRepr(
         order = Order(item=item, quantity=5, buyer=customer, seller="Warehouse")
         expected_repr = f"Order #{order.order_id} ({item.name}, Qty: {order.quantity}, Buyer: {customer.name}, Status: {order.status})"
         self.assertEqual(repr(order), expected_repr)
+
+
+class TestOrderKind(unittest.TestCase):
+    def test_kind_defaults_from_seller(self):
+        """Test that the order kind is worked out from the seller when not given."""
+        item = Item("Dirt", "Just dirt", 10.0, supplier=None)
+        customer = Customer("bkar", "bkarowna@gmail.com")
+        order = Order(item=item, quantity=1, buyer=customer, seller="Warehouse")
+        self.assertEqual(order.kind, Order.OTHER)
+
+    def test_kind_set_by_warehouse(self):
+        """Test that the warehouse tags customer sales and supplier purchases."""
+        warehouse = Warehouse("Main Warehouse")
+        supplier_manager = SupplierManager()
+        supplier = supplier_manager.create_supplier("Steve", "steve@example.com")
+        item = supplier_manager.create_supplier_item(
+            supplier.supplier_id, "Dirt", "Just dirt", 10.0
+        )
+        customer = Customer("bkar", "bkarowna@gmail.com")
+
+        purchase = warehouse.order_from_supplier(supplier, item, 5)
+        warehouse.mark_order_as_received(purchase.order_id)
+        sale = warehouse.place_order(customer, item, 2)
+
+        self.assertEqual(purchase.kind, Order.PURCHASE)
+        self.assertEqual(sale.kind, Order.SALE)
@@ -0,0 +1,65 @@
+# /tests/test_order_log.py
+
+import unittest
+from app.customer import CustomerManager
+from app.finance import FinanceCompiler
+from app.order import Order
+from app.order_log import OrderLog
+from app.supplier import SupplierManager
+from app.warehouse import Warehouse
+
+
+class TestOrderLog(unittest.TestCase):
+
+    def setUp(self):
+        self.warehouse = Warehouse(name="Main Warehouse")
+        self.customer = CustomerManager().create_customer("Alice", "alice@example.com")
+        supplier_manager = SupplierManager()
+        self.supplier = supplier_manager.create_supplier("Steve", "steve@example.com")
+        self.item = supplier_manager.create_supplier_item(
+            self.supplier.supplier_id, "Dirt", "Just dirt", 10.0
+        )
+
+        purchase = self.warehouse.order_from_supplier(self.supplier, self.item, 10)
+        self.warehouse.mark_order_as_received(purchase.order_id)
+        self.warehouse.place_order(self.customer, self.item, 3)
+        self.warehouse.order_from_supplier(self.supplier, self.item, 5)
+
+        self.log = OrderLog(self.warehouse.orders)
+
+    def test_rows_materialise_as_orders(self):
+        """Test that reading a row gives back an equivalent Order."""
+        self.assertEqual(len(self.log), 3)
+        for original, view in zip(self.warehouse.orders, self.log):
+            self.assertIsInstance(view, Order)
+            self.assertEqual(view.order_id, original.order_id)
+            self.assertIs(view.item, original.item)
+            self.assertIs(view.buyer, original.buyer)
+            self.assertIs(view.seller, original.seller)
+            self.assertEqual(view.quantity, original.quantity)
+            self.assertEqual(view.status, original.status)
+            self.assertEqual(view.kind, original.kind)
+            self.assertEqual(view.total_price, original.total_price)
+            self.assertEqual(view.timestamp, original.timestamp)
+
+    def test_set_status(self):
+        """Test that statuses can be changed in place by order ID."""
+        pending = self.warehouse.orders[2]
+        self.log.set_status(pending.order_id, "received")
+        self.assertEqual(self.log.get_order(pending.order_id).status, "received")
+
+        with self.assertRaises(ValueError):
+            self.log.set_status(9999, "received")
+
+    def test_finance_summary_from_log(self):
+        """Test that a compiler over a log agrees with one over the Order objects."""
+        from_log = FinanceCompiler(self.log).summarise()
+        from_orders = FinanceCompiler(self.warehouse.orders).summarise()
+
+        self.assertTrue(from_log.matches(from_orders))
+        self.assertEqual(from_log.revenue, 30.0)
+        self.assertEqual(from_log.costs, 100.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
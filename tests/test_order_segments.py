@@ -0,0 +1,287 @@
+# /tests/test_order_segments.py
+
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from app.customer import CustomerManager
+from app.finance import FinanceCompiler
+from app.item import Item
+from app.order import Order
+from app.order_segments import RECORD, OrderSegments, Party
+from app.supplier import SupplierManager
+from app.warehouse import Warehouse
+
+
+class TestOrderSegments(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "orders")
+
+        self.warehouse = Warehouse(name="Main Warehouse")
+        self.customers = CustomerManager()
+        self.suppliers = SupplierManager()
+        self.alice = self.customers.create_customer("Alice", "alice@example.com")
+        self.supplier = self.suppliers.create_supplier("Steve", "steve@example.com")
+        self.dirt = self.suppliers.create_supplier_item(
+            self.supplier.supplier_id, "Dirt", "Just dirt", 10.0
+        )
+
+        self.segments = OrderSegments(self.path)
+        self.segments.attach(self.warehouse)
+        self.history = None
+
+    def tearDown(self):
+        self.segments.close()
+        if self.history is not None:
+            self.history.close()
+        self.directory.cleanup()
+
+    def _receive(self, quantity: int) -> Order:
+        order = self.warehouse.order_from_supplier(self.supplier, self.dirt, quantity)
+        self.warehouse.mark_order_as_received(order.order_id)
+        return order
+
+    def _use_history(self) -> OrderSegments:
+        """Segments of their own as the warehouse's history, the fixture's are attached already."""
+        self.history = OrderSegments(os.path.join(self.directory.name, "history"))
+        self.history.attach(self.warehouse)
+        self.warehouse.use_history(self.history)
+        return self.history
+
+    def _periods(self, finance: FinanceCompiler):
+        return [
+            (bucket, totals.revenue, totals.costs, totals.units_sold)
+            for bucket, totals in finance.period_report("day")
+        ]
+
+    def _fields(self, order: Order):
+        return (
+            order.order_id,
+            order.item.name,
+            order.quantity,
+            order.total_price,
+            order.status,
+            order.timestamp,
+            order.kind,
+        )
+
+    def test_orders_are_found_by_id(self):
+        """Test that stored orders read back by ID, with the live objects."""
+        received = self._receive(100)
+        sale = self.warehouse.place_order(self.alice, self.dirt, 3)
+
+        self.assertEqual(len(self.segments), 2)
+        stored = self.segments.get_order(sale.order_id)
+        self.assertEqual(self._fields(stored), self._fields(sale))
+        self.assertIs(stored.buyer, self.alice)
+        self.assertIs(stored.seller, self.warehouse)
+        self.assertEqual(self.segments.get_order(received.order_id).status, "received")
+        self.assertIsNone(self.segments.get_order(sale.order_id + 1))
+        self.assertEqual(
+            [o.order_id for o in self.segments], [received.order_id, sale.order_id]
+        )
+        self.assertEqual(self.segments[-1].order_id, sale.order_id)
+
+    def test_status_changes_are_written_in_place(self):
+        """Test that a status change rewrites the stored record."""
+        order = self.warehouse.order_from_supplier(self.supplier, self.dirt, 5)
+        self.assertEqual(self.segments.get_order(order.order_id).status, "pending")
+
+        self.warehouse.mark_order_as_received(order.order_id)
+        self.assertEqual(self.segments.get_order(order.order_id).status, "received")
+        with self.assertRaises(ValueError):
+            self.segments.set_status(order.order_id + 10, "received")
+
+    def test_reopen_reads_the_same_orders(self):
+        """Test that orders survive closing and reopening the segments."""
+        self._receive(100)
+        self.warehouse.place_order(self.alice, self.dirt, 3)
+        expected = [self._fields(o) for o in self.warehouse.orders]
+        self.segments.close()
+
+        self.segments = OrderSegments(self.path)
+        self.assertEqual([self._fields(o) for o in self.segments], expected)
+        sale = self.segments[1]
+        self.assertIsInstance(sale.buyer, Party)
+        self.assertEqual(sale.buyer.name, "Alice")
+        self.assertEqual(sale.item.price, 10.0)
+
+    def test_new_segments_start_when_one_fills_up(self):
+        """Test that orders roll over into new segment files."""
+        self.segments.close()
+        with patch("app.order_segments.SEGMENT_ROWS", 4):
+            self.segments = OrderSegments(os.path.join(self.directory.name, "small"))
+            self.segments.attach(self.warehouse)
+            orders = [self._receive(10) for _ in range(10)]
+
+            self.assertEqual(self.segments.sealed_segments, 2)
+            self.assertEqual(
+                os.path.getsize(self.segments._segment_path(0)), 4 * RECORD.size
+            )
+            for order in orders:
+                self.assertEqual(
+                    self._fields(self.segments.get_order(order.order_id)),
+                    self._fields(order),
+                )
+            self.assertEqual(len(list(self.segments.records(range(1)))), 4)
+
+    def test_older_orders_are_rejected(self):
+        """Test that an order from before the first stored one is refused."""
+        order = self._receive(10)
+        with self.assertRaises(ValueError):
+            self.segments.append(order)
+
+        older = Order(self.dirt, 1, self.supplier, self.warehouse)
+        older.order_id = order.order_id - 1
+        with self.assertRaises(ValueError):
+            self.segments.append(older)
+
+    def test_restarts_read_back_live_parties_and_items(self):
+        """Test that after a restart orders come back with the live parties and items."""
+        purchase = self._receive(100)
+        sale = self.warehouse.place_order(self.alice, self.dirt, 3)
+        self.segments.close()
+
+        self.segments = OrderSegments(self.path)
+        self.segments.attach(self.warehouse, self.customers, self.suppliers)
+        self.customers.update_customer(self.alice.customer_id, name="Alicia")
+
+        read_back = self.segments.get_order(sale.order_id)
+        self.assertIs(read_back.buyer, self.alice)
+        self.assertIs(read_back.seller, self.warehouse)
+        self.assertIs(
+            read_back.item, self.warehouse.inventory.get_stored_item(self.dirt)
+        )
+        self.assertIs(self.segments.get_order(purchase.order_id).seller, self.supplier)
+        self.segments.close()
+
+        # The rename is kept for readers without the managers
+        self.segments = OrderSegments(self.path)
+        self.assertEqual(self.segments.get_order(sale.order_id).buyer.name, "Alicia")
+
+    def test_finance_summary_matches_in_memory(self):
+        """Test that summarising the segments agrees with summarising the orders."""
+        self._receive(100)
+        self.warehouse.place_order(self.alice, self.dirt, 3)
+        self.warehouse.order_from_supplier(self.supplier, self.dirt, 7)
+
+        summary = FinanceCompiler(self.segments).summarise()
+        self.assertTrue(
+            summary.matches(FinanceCompiler(self.warehouse.orders).summarise())
+        )
+        self.assertEqual(summary.order_count, 3)
+
+        tomorrow = datetime.now() + timedelta(days=1)
+        self.assertEqual(
+            FinanceCompiler(self.segments).summarise(start=tomorrow).order_count, 0
+        )
+
+    def test_items_and_parties_are_stored_once_each(self):
+        """Test that equal items and the same customer share table rows across sessions."""
+        self._receive(100)
+        self.warehouse.place_order(self.alice, self.dirt, 3)
+        self.segments.close()
+
+        # A restart brings new objects for the same item and customer
+        self.segments = OrderSegments(self.path)
+        warehouse = Warehouse(name="Main Warehouse")
+        self.segments.attach(warehouse)
+        dirt = Item("Dirt", "Just dirt", 10.0, self.supplier)
+        order = warehouse.order_from_supplier(self.supplier, dirt, 5)
+        warehouse.mark_order_as_received(order.order_id)
+        sale = warehouse.place_order(self.alice, dirt, 1)
+
+        self.assertEqual(len(self.segments.items), 1)
+        self.assertEqual(len(self.segments.parties), 3)  # Warehouse, Steve, Alice
+        self.assertEqual(
+            [o.order_id for o in self.segments.orders(buyer=self.alice)],
+            [sale.order_id - 2, sale.order_id],
+        )
+
+    def test_count_is_read_from_the_metadata_after_a_clean_close(self):
+        """Test that reopening only scans the records when the last run did not close."""
+        self._receive(100)
+        self.warehouse.place_order(self.alice, self.dirt, 3)
+        self.segments.close()
+
+        with patch.object(OrderSegments, "_order_ids") as order_ids:
+            self.segments = OrderSegments(self.path)
+            order_ids.assert_not_called()
+        self.assertEqual(len(self.segments), 2)
+        self.segments.flush()  # Left open, as if the process had died
+
+        reopened = OrderSegments(self.path)
+        self.assertEqual(len(reopened), 2)
+        reopened.close()
+
+    def test_warehouse_reads_closed_orders_from_the_history(self):
+        """Test that closed orders leave memory but are still found through the warehouse."""
+        received = self._receive(100)
+        sale = self.warehouse.place_order(self.alice, self.dirt, 3)
+        pending = self.warehouse.order_from_supplier(self.supplier, self.dirt, 7)
+        history = self._use_history()
+
+        self.assertEqual(self.warehouse.orders, [pending])
+        self.assertEqual(self.alice.order_history, [])
+        self.assertIs(self.warehouse.all_orders, history)
+        self.assertEqual(self.warehouse.get_order(sale.order_id).quantity, 3)
+        self.assertEqual(
+            [o.order_id for o in self.warehouse.orders_with_status("received")],
+            [received.order_id],
+        )
+        self.assertEqual(
+            [o.order_id for o in self.warehouse.customer_orders(self.alice)],
+            [sale.order_id],
+        )
+        between = self.warehouse.orders_between(start=received.timestamp)
+        self.assertEqual(len(between), 3)
+        self.assertIs(between[-1], pending)  # Open orders are the live objects
+
+        # New closed orders go straight to the history
+        later = self.warehouse.place_order(self.alice, self.dirt, 2)
+        self.warehouse.mark_order_as_received(pending.order_id)
+        self.assertEqual(self.warehouse.orders, [])
+        self.assertEqual(len(history), 4)
+        self.assertEqual(history.get_order(later.order_id).status, "delivered")
+
+    def test_finance_reads_the_history(self):
+        """Test that finance over all_orders agrees with finance over the orders in memory."""
+        self._receive(100)
+        self.warehouse.place_order(self.alice, self.dirt, 3)
+        self.warehouse.order_from_supplier(self.supplier, self.dirt, 7)
+        expected = FinanceCompiler(list(self.warehouse.orders)).summarise()
+        expected_periods = self._periods(FinanceCompiler(list(self.warehouse.orders)))
+        self._use_history()
+
+        finance = FinanceCompiler(self.warehouse.all_orders, warehouse=self.warehouse)
+        self.assertTrue(finance.summarise().matches(expected))
+        self.assertTrue(finance.running_summary().matches(expected))
+        self.assertEqual(self._periods(finance), expected_periods)
+        self.assertTrue(finance.verify())
+        self.assertEqual(len(finance.summarise_orders_page(1)), 3)
+
+        self.warehouse.place_order(self.alice, self.dirt, 1)
+        self.assertTrue(finance.running_summary().matches(finance.summarise()))
+        self.assertEqual(finance.summarise().order_count, 4)
+
+    def test_archived_orders_leave_the_segments(self):
+        """Test that orders taken out by remove_closed_orders are no longer stored."""
+        received = self._receive(100)
+        pending = self.warehouse.order_from_supplier(self.supplier, self.dirt, 7)
+        history = self._use_history()
+
+        removed = self.warehouse.remove_closed_orders(
+            datetime.now() + timedelta(seconds=1)
+        )
+        self.assertEqual([o.order_id for o in removed], [received.order_id])
+        self.assertIsNone(history.get_order(received.order_id))
+        self.assertIsNone(self.warehouse.get_order(received.order_id))
+        self.assertEqual([o.order_id for o in history], [pending.order_id])
+        self.assertEqual(len(history), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,232 @@
+# /tests/test_snapshot.py
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from app.customer import Customer, CustomerManager
+from app.finance import FinanceCompiler
+from app.journal import Journal
+from app.order import Order
+from app.order_segments import OrderSegments
+from app.snapshot import Snapshotter, load_snapshot, restore, write_snapshot
+from app.supplier import SupplierManager
+from app.warehouse import Warehouse
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.snapshot_path = os.path.join(self.directory.name, "warehouse.snapshot")
+        self.journal_path = os.path.join(self.directory.name, "warehouse.journal")
+
+        self.warehouse = Warehouse(name="Main Warehouse")
+        self.customers = CustomerManager()
+        self.suppliers = SupplierManager()
+        self.journal = Journal(self.journal_path)
+        self.journal.attach(self.warehouse, self.customers, self.suppliers)
+        # Listeners that must not end up in a snapshot
+        self.finance = FinanceCompiler(self.warehouse.orders, warehouse=self.warehouse)
+
+        self.alice = self.customers.create_customer("Alice", "alice@example.com")
+        self.supplier = self.suppliers.create_supplier("Steve", "steve@example.com")
+        self.dirt = self.suppliers.create_supplier_item(
+            self.supplier.supplier_id, "Dirt", "Just dirt", 10.0
+        )
+
+    def tearDown(self):
+        self.journal.close()
+        self.directory.cleanup()
+
+    def _receive(self, quantity: int) -> Order:
+        order = self.warehouse.order_from_supplier(self.supplier, self.dirt, quantity)
+        self.warehouse.mark_order_as_received(order.order_id)
+        return order
+
+    def _state(self, warehouse, customers):
+        return (
+            [
+                (
+                    o.order_id,
+                    o.item.name,
+                    o.quantity,
+                    o.total_price,
+                    o.status,
+                    o.timestamp,
+                )
+                for o in warehouse.orders
+            ],
+            {i.name: (i.price, line) for i, line in warehouse.inventory.stock.items()},
+            {
+                c: [o.order_id for o in customer.order_history]
+                for c, customer in customers.customers.items()
+            },
+        )
+
+    def test_snapshot_round_trip(self):
+        """Test that a snapshot restores orders, stock, parties and order histories."""
+        self._receive(20)
+        stocked = next(iter(self.warehouse.get_available_items()))
+        sale = self.warehouse.place_order(self.alice, stocked, 3)
+        write_snapshot(
+            self.snapshot_path,
+            self.warehouse,
+            self.customers,
+            self.suppliers,
+            self.journal,
+        )
+
+        warehouse, customers, suppliers, offset = load_snapshot(self.snapshot_path)
+        self.assertEqual(offset, os.path.getsize(self.journal_path))
+        self.assertEqual(
+            self._state(warehouse, customers),
+            self._state(self.warehouse, self.customers),
+        )
+        restored_sale = warehouse.get_order(sale.order_id)
+        self.assertIs(
+            customers.customers[self.alice.customer_id].order_history[0], restored_sale
+        )
+        self.assertIs(restored_sale.item, warehouse.inventory.get_stored_item(stocked))
+        self.assertIs(restored_sale.seller, warehouse)
+        self.assertEqual(warehouse.get_available_items(), {stocked: 17})
+
+        # Listeners are left behind and the restored objects start with none
+        self.assertEqual(warehouse._order_listeners, [])
+        self.assertEqual(customers._listeners, [])
+        self.assertEqual(suppliers._listeners, [])
+        self.assertEqual(len(warehouse.inventory._listeners), 2)  # Its own two
+
+    def test_restore_replays_only_the_journal_tail(self):
+        """Test that changes made after the snapshot are replayed from the journal."""
+        first = self._receive(5)
+        write_snapshot(
+            self.snapshot_path,
+            self.warehouse,
+            self.customers,
+            self.suppliers,
+            self.journal,
+        )
+        second = self._receive(7)
+        bob = self.customers.create_customer("Bob", "bob@example.com")
+        self.journal.commit()
+
+        with patch("builtins.print"):
+            warehouse, customers, _ = restore(self.snapshot_path, self.journal_path)
+
+        self.assertEqual(
+            self._state(warehouse, customers),
+            self._state(self.warehouse, self.customers),
+        )
+        self.assertEqual(
+            [o.order_id for o in warehouse.orders], [first.order_id, second.order_id]
+        )
+        self.assertIn(bob.customer_id, customers.customers)
+        self.assertGreater(Order._id_counter, second.order_id)
+        self.assertGreater(Customer._customer_counter, int(bob.customer_id[3:]))
+
+    def test_snapshotter_writes_in_the_background_when_due(self):
+        """Test that periodic snapshots wait for enough journal records."""
+        snapshotter = Snapshotter(
+            self.snapshot_path,
+            self.warehouse,
+            self.customers,
+            self.suppliers,
+            self.journal,
+            every=5,
+        )
+        self.assertFalse(snapshotter.maybe_snapshot())
+        for quantity in range(1, 4):
+            self._receive(quantity)
+        self.assertTrue(snapshotter.maybe_snapshot())
+        snapshotter.wait()
+
+        warehouse, _, _, _ = load_snapshot(self.snapshot_path)
+        self.assertEqual(len(warehouse.orders), 3)
+        self.assertFalse(os.path.exists(self.snapshot_path + ".tmp"))
+
+    def test_journal_is_compacted_after_a_snapshot(self):
+        """Test that a durable snapshot drops the journal records it covers."""
+        snapshotter = Snapshotter(
+            self.snapshot_path,
+            self.warehouse,
+            self.customers,
+            self.suppliers,
+            self.journal,
+            every=1,
+        )
+        for quantity in range(1, 4):
+            self._receive(quantity)
+        size_before = os.path.getsize(self.journal_path)
+        snapshotter.snapshot()
+        snapshotter.wait()
+
+        _, _, _, offset = load_snapshot(self.snapshot_path)
+        self.assertEqual(self.journal.base, offset)
+        self.assertLess(os.path.getsize(self.journal_path), size_before)
+
+        # Changes after the compaction still replay on top of the snapshot
+        later = self._receive(9)
+        self.journal.commit()
+        with patch("builtins.print"):
+            warehouse, customers, _ = restore(self.snapshot_path, self.journal_path)
+        self.assertEqual(
+            self._state(warehouse, customers),
+            self._state(self.warehouse, self.customers),
+        )
+        self.assertEqual(warehouse.orders[-1].order_id, later.order_id)
+
+        # A journal reopened after the compaction keeps counting from the same place
+        self.journal.close()
+        self.journal = Journal(self.journal_path)
+        self.assertEqual(self.journal.base, offset)
+
+    def test_restore_with_order_segments_as_history(self):
+        """Test that closed orders come back from the segments rather than the snapshot."""
+        segments = OrderSegments(os.path.join(self.directory.name, "segments"))
+        segments.attach(self.warehouse)
+        self.warehouse.use_history(segments)
+        received = self._receive(20)
+        stocked = next(iter(self.warehouse.get_available_items()))
+        self.warehouse.place_order(self.alice, stocked, 3)
+        pending = self.warehouse.order_from_supplier(self.supplier, self.dirt, 5)
+        expected = FinanceCompiler(segments).summarise()
+
+        snapshotter = Snapshotter(
+            self.snapshot_path,
+            self.warehouse,
+            self.customers,
+            self.suppliers,
+            self.journal,
+        )
+        with patch.object(segments, "flush", wraps=segments.flush) as flush:
+            snapshotter.snapshot(background=False)
+        flush.assert_called_once()  # Before the journal was compacted
+        segments.close()
+
+        with patch("builtins.print"):
+            warehouse, _, _ = restore(self.snapshot_path, self.journal_path)
+        segments = OrderSegments(os.path.join(self.directory.name, "segments"))
+        segments.attach(warehouse)
+        warehouse.use_history(segments)
+
+        self.assertEqual([o.order_id for o in warehouse.orders], [pending.order_id])
+        self.assertEqual(warehouse.get_order(received.order_id).status, "received")
+        finance = FinanceCompiler(warehouse.all_orders, warehouse=warehouse)
+        self.assertTrue(finance.running_summary().matches(expected))
+        segments.close()
+
+    def test_restore_without_a_snapshot(self):
+        """Test that restoring with no snapshot replays the whole journal."""
+        self._receive(4)
+        self.journal.commit()
+        with patch("builtins.print"):
+            warehouse, customers, suppliers = restore(
+                self.snapshot_path, self.journal_path
+            )
+        self.assertEqual(len(warehouse.orders), 1)
+        self.assertEqual(list(suppliers.suppliers), [self.supplier.supplier_id])
+
+
+if __name__ == "__main__":
+    unittest.main()
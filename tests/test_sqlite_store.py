@@ -0,0 +1,201 @@
+# /tests/test_sqlite_store.py
+
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from app.customer import CustomerManager
+from app.finance import FinanceCompiler
+from app.order import Order
+from app.sqlite_store import open_store
+from app.supplier import SupplierManager
+from app.warehouse import Warehouse
+
+
+class TestSqliteStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "warehouse.db")
+        self.warehouse, self.customers, self.suppliers = self._fresh()
+        self.store = open_store(
+            self.path, self.warehouse, self.customers, self.suppliers
+        )
+
+        self.alice = self.customers.create_customer("Alice", "alice@example.com")
+        self.supplier = self.suppliers.create_supplier("Steve", "steve@example.com")
+        self.dirt = self.suppliers.create_supplier_item(
+            self.supplier.supplier_id, "Dirt", "Just dirt", 10.0
+        )
+        self.stone = self.suppliers.create_supplier_item(
+            self.supplier.supplier_id, "Stone", "Solid stone", 30.0
+        )
+        self.received = self.warehouse.order_from_supplier(self.supplier, self.dirt, 20)
+        self.pending = self.warehouse.order_from_supplier(self.supplier, self.stone, 5)
+        self.warehouse.mark_order_as_received(self.received.order_id)
+        self.warehouse.inventory.update_price("Dirt", 12.5)
+        stocked = next(iter(self.warehouse.get_available_items()))
+        self.sale = self.warehouse.place_order(self.alice, stocked, 4)
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def _fresh(self):
+        return Warehouse(name="Main Warehouse"), CustomerManager(), SupplierManager()
+
+    def test_orders_are_stored_with_indexes(self):
+        """Test that orders are written through, and indexed by status, time and item."""
+        self.store.commit()
+        rows = self.store.connection.execute(
+            "SELECT id, status, total FROM orders ORDER BY id"
+        ).fetchall()
+        self.assertEqual(
+            rows,
+            [
+                (o.order_id, o.status, o.total_price)
+                for o in (self.received, self.pending, self.sale)
+            ],
+        )
+        indexes = {
+            row[0]
+            for row in self.store.connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index'"
+            )
+        }
+        self.assertTrue(
+            {"orders_by_status", "orders_by_timestamp", "orders_by_item"} <= indexes
+        )
+        mode = self.store.connection.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def test_transaction_is_closed_between_operations(self):
+        """Test that a held-back transaction is committed once the operation is over."""
+        self.store.commit()
+        self.store.commit_interval = 0.01
+        self.store.group_size = 1
+        with self.warehouse.operation():
+            self.warehouse.inventory.set_stock(self.stone, 5, 0, 30.0)
+            self.warehouse.inventory.set_threshold("Stone", 1)
+            time.sleep(0.05)
+            self.assertTrue(self.store.connection.in_transaction)
+
+        deadline = time.monotonic() + 5
+        while self.store.connection.in_transaction and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(self.store.connection.in_transaction)
+
+    def test_restart_loads_the_same_state(self):
+        """Test that a new session rebuilds the warehouse and managers from the database."""
+        self.customers.update_customer(self.alice.customer_id, name="Alicia")
+        self.suppliers.update_supplier(
+            self.supplier.supplier_id, email="steven@example.com"
+        )
+        self.store.close()
+        warehouse, customers, suppliers = self._fresh()
+        self.store = open_store(self.path, warehouse, customers, suppliers)
+
+        self.assertEqual(list(customers.customers), [self.alice.customer_id])
+        self.assertEqual(customers.customers[self.alice.customer_id].name, "Alicia")
+        self.assertEqual(
+            suppliers.suppliers[self.supplier.supplier_id].email, "steven@example.com"
+        )
+        self.assertEqual(
+            [
+                (o.order_id, o.status, o.total_price, o.timestamp)
+                for o in warehouse.orders
+            ],
+            [
+                (o.order_id, o.status, o.total_price, o.timestamp)
+                for o in self.warehouse.orders
+            ],
+        )
+        self.assertEqual(
+            {i: (i.price, line) for i, line in warehouse.inventory.stock.items()},
+            {i: (i.price, line) for i, line in self.warehouse.inventory.stock.items()},
+        )
+        self.assertEqual(
+            list(warehouse.status_changes), list(self.warehouse.status_changes)
+        )
+        alice = customers.customers[self.alice.customer_id]
+        self.assertEqual(
+            [o.order_id for o in warehouse.customer_orders(alice)], [self.sale.order_id]
+        )
+        self.assertIs(warehouse.get_order(self.sale.order_id).buyer, alice)
+
+        # Later changes keep going to the same database
+        warehouse.mark_order_as_received(self.pending.order_id)
+        self.store.commit()
+        (status,) = self.store.connection.execute(
+            "SELECT status FROM orders WHERE id = ?", (self.pending.order_id,)
+        ).fetchone()
+        self.assertEqual(status, "received")
+
+    def test_sql_aggregates_match_python(self):
+        """Test that summaries and group-bys in SQL agree with the in-memory ones."""
+        in_memory = FinanceCompiler([self.received, self.pending, self.sale])
+        with_store = FinanceCompiler(
+            self.warehouse.all_orders, warehouse=self.warehouse, store=self.store
+        )
+
+        sql_summary = with_store.summarise()
+        self.assertTrue(sql_summary.matches(in_memory.summarise()))
+        self.assertEqual(with_store.group_by("item"), in_memory.group_by("item"))
+        self.assertEqual(
+            with_store.group_by("supplier", status="received"),
+            in_memory.group_by("supplier", status="received"),
+        )
+        self.assertEqual(
+            with_store.group_by("customer"), in_memory.group_by("customer")
+        )
+
+        tomorrow = datetime.now() + timedelta(days=1)
+        self.assertEqual(with_store.summarise(start=tomorrow).order_count, 0)
+        self.assertEqual(with_store.summarise(end=tomorrow).order_count, 3)
+
+    def test_only_open_orders_are_loaded(self):
+        """Test that closed orders stay in the database and are read from it on demand."""
+        self.store.close()
+        warehouse, customers, suppliers = self._fresh()
+        Order._id_counter = 1  # As in a new process
+        with patch("app.sqlite_store.SQLITE_PAGE_SIZE", 2):
+            self.store = open_store(self.path, warehouse, customers, suppliers)
+
+            self.assertEqual(
+                [o.order_id for o in warehouse.orders], [self.pending.order_id]
+            )
+            self.assertIs(warehouse.all_orders, self.store)
+            self.assertEqual(len(self.store), 3)
+            ids = [self.received.order_id, self.pending.order_id, self.sale.order_id]
+            self.assertEqual([o.order_id for o in self.store], ids)
+            self.assertEqual([o.order_id for o in reversed(self.store)], ids[::-1])
+            self.assertEqual([o.order_id for o in self.store[1:]], ids[1:])
+            self.assertEqual(self.store[-1].order_id, self.sale.order_id)
+            self.assertEqual(
+                [o.order_id for o in warehouse.orders_with_status("received")],
+                [self.received.order_id],
+            )
+            # The open order is the object in memory, the others are read back
+            between = warehouse.orders_between(start=self.received.timestamp)
+            self.assertEqual([o.order_id for o in between], ids)
+            self.assertIs(between[1], warehouse.orders[0])
+
+        finance = FinanceCompiler(
+            warehouse.all_orders, warehouse=warehouse, store=self.store
+        )
+        expected = FinanceCompiler([self.received, self.pending, self.sale])
+        self.assertTrue(finance.running_summary().matches(expected.summarise()))
+        self.assertEqual(
+            [(b, t.revenue, t.costs) for b, t in finance.period_report("day")],
+            [(b, t.revenue, t.costs) for b, t in expected.period_report("day")],
+        )
+
+        # New orders get IDs after the closed orders left in the database
+        order = warehouse.order_from_supplier(self.supplier, self.dirt, 1)
+        self.assertGreater(order.order_id, self.sale.order_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -131,6 +131,32 @@ class TestSupplier(unittest.TestCase):
                 supplier.supplier_id, name="Dirt", description="Just dirt", price=10.0
             )
 
+    def test_supplier_item_uniqueness_for_given_items(self):
+        """Test that passing an existing item again is refused too."""
+        supplier = self.supplier_manager.create_supplier("Steve", "steve@example.com")
+        item = self.supplier_manager.create_supplier_item(
+            supplier.supplier_id, name="Dirt", description="Just dirt", price=10.0
+        )
+
+        with self.assertRaises(ValueError):
+            self.supplier_manager.create_supplier_item(
+                supplier.supplier_id, item=item.clone()
+            )
+        self.assertEqual(supplier.items_supplied, [item])
+
+    def test_supplier_item_can_be_recreated_after_removal(self):
+        """Test that an item removed from a supplier can be created again."""
+        supplier = self.supplier_manager.create_supplier("Steve", "steve@example.com")
+        item = self.supplier_manager.create_supplier_item(
+            supplier.supplier_id, name="Dirt", description="Just dirt", price=10.0
+        )
+        self.supplier_manager.remove_item_from_supplier(supplier.supplier_id, item)
+
+        recreated = self.supplier_manager.create_supplier_item(
+            supplier.supplier_id, name="Dirt", description="Just dirt", price=12.0
+        )
+        self.assertEqual(supplier.items_supplied, [recreated])
+
     def test_supplier_item_creation_on_none_existing_supplier(self):
         """Test creating an item for a non-existent supplier raises ValueError."""
         with self.assertRaises(ValueError):
@@ -161,6 +187,22 @@ class TestSupplier(unittest.TestCase):
         self.assertEqual(supplier.name, "Bob")
         self.assertEqual(supplier.email, "bobby@example.com")
 
+    def test_update_supplier_notifies_listeners(self):
+        """Test that update_supplier changes the profile and reports the change."""
+        supplier = self.supplier_manager.create_supplier("Bob", "bob@example.com")
+        events = []
+        self.supplier_manager.add_listener(
+            lambda event, s, item: events.append((event, s.email))
+        )
+
+        self.supplier_manager.update_supplier(
+            supplier.supplier_id, email="bobby@example.com"
+        )
+        self.assertEqual(supplier.name, "Bob")
+        self.assertEqual(events, [("updated", "bobby@example.com")])
+        with self.assertRaises(ValueError):
+            self.supplier_manager.update_supplier("su_9999", name="Nobody")
+
     def test_get_supplier_by_id_no_suppliers(self):
         """Test that get_supplier_by_id returns None when no suppliers exist."""
         manager = SupplierManager()
@@ -1,4 +1,5 @@
 import unittest
+from datetime import datetime, timedelta
 from app.inventory import Inventory
 from app.item import Item
 from app.customer import Customer, CustomerManager
@@ -214,11 +215,21 @@ class TestWarehouse(unittest.TestCase):
 
     def test_list_pending_orders_returns_pending_orders(self):
         """Test that list_pending_orders returns a list of pending orders."""
-        order = self.warehouse.place_order(self.customer, self.cloned_item, 2)
+        order = self.warehouse.order_from_supplier(self.supplier, self.cloned_item, 2)
+        self.warehouse.place_order(self.customer, self.cloned_item, 2)  # Delivered
         pending_orders = self.warehouse.list_pending_orders()
 
-        self.assertEqual(pending_orders, [order], "Expected the pending order to be returned.")
+        self.assertEqual(
+            pending_orders, [order], "Expected the pending order to be returned."
+        )
 
+    def test_list_pending_orders_excludes_received_orders(self):
+        """Test that an order leaves the pending list once it is marked as received."""
+        order = self.warehouse.order_from_supplier(self.supplier, self.cloned_item, 2)
+        self.warehouse.mark_order_as_received(order.order_id)
+
+        self.assertEqual(self.warehouse.list_pending_orders(), [])
+        self.assertEqual(self.warehouse.orders_with_status("received"), [order])
 
     def test_get_available_items(self):
         """Test that available items above threshold are returned correctly."""
@@ -348,6 +359,128 @@ class TestWarehouse(unittest.TestCase):
         self.assertIn(order, self.customer.order_history)
         self.assertEqual(len(self.customer.order_history), initial_history_length + 1)
 
+    def test_get_order_returns_placed_order(self):
+        """Test that get_order finds orders created through the warehouse."""
+        order = self.warehouse.order_from_supplier(self.supplier, self.cloned_item, 3)
+        self.assertIs(self.warehouse.get_order(order.order_id), order)
+
+    def test_get_order_indexes_appended_orders(self):
+        """Test that get_order also finds orders appended to the order list directly."""
+        order = Order(
+            item=self.item, quantity=1, buyer=self.warehouse, seller=self.supplier
+        )
+        self.warehouse.orders.append(order)
+        self.assertIs(self.warehouse.get_order(order.order_id), order)
+
+    def test_get_order_not_found(self):
+        """Test that get_order returns None for an unknown order ID."""
+        self.assertIsNone(self.warehouse.get_order(9999))
+
+    def test_get_available_items_follows_receipts_and_thresholds(self):
+        """Test that availability updates on receipts, sales and threshold changes."""
+        self.assertEqual(self.warehouse.get_available_items(), {})
+
+        order = self.warehouse.order_from_supplier(self.supplier, self.cloned_item, 5)
+        self.warehouse.mark_order_as_received(order.order_id)
+        self.assertEqual(self.warehouse.get_available_items(), {self.cloned_item: 15})
+
+        self.warehouse.inventory.set_threshold(self.cloned_item.name, 20)
+        self.assertEqual(self.warehouse.get_available_items(), {})
+
+        self.warehouse.inventory.set_threshold(self.cloned_item.name, 5)
+        self.warehouse.place_order(self.customer, self.cloned_item, 10)
+        self.assertEqual(self.warehouse.get_available_items(), {})
+
+    def test_orders_between(self):
+        """Test that orders_between returns only orders inside the time range."""
+        orders = [
+            self.warehouse.order_from_supplier(self.supplier, self.cloned_item, 1)
+            for _ in range(4)
+        ]
+        start = datetime(2025, 1, 1)
+        for day, order in enumerate(orders):
+            order.timestamp = start + timedelta(days=day)
+        self.warehouse.mark_order_as_received(orders[2].order_id)
+
+        self.assertEqual(
+            self.warehouse.orders_between(
+                start + timedelta(days=1), start + timedelta(days=3)
+            ),
+            orders[1:3],
+        )
+        self.assertEqual(self.warehouse.orders_between(end=start), [])
+        self.assertEqual(
+            self.warehouse.orders_between(start, status="received"), [orders[2]]
+        )
+        self.assertEqual(self.warehouse.orders_between(kind=Order.SALE), [])
+
+    def test_orders_between_out_of_order_history(self):
+        """Test that orders_between still works after out-of-order history is loaded."""
+        recent = self.warehouse.order_from_supplier(self.supplier, self.cloned_item, 1)
+        old = Order.from_record(
+            order_id=recent.order_id + 1,
+            item=self.item,
+            quantity=1,
+            buyer=self.warehouse,
+            seller=self.supplier,
+            status="received",
+            timestamp=datetime(2020, 1, 1),
+        )
+        self.warehouse.load_orders([old])
+
+        self.assertEqual(self.warehouse.orders_between(end=datetime(2021, 1, 1)), [old])
+        self.assertEqual(
+            self.warehouse.orders_between(start=datetime(2021, 1, 1)), [recent]
+        )
+
+    def test_version_increases_on_every_change(self):
+        """Test that the mutation version moves on for orders, status changes and stock."""
+        versions = [self.warehouse.version]
+
+        order = self.warehouse.order_from_supplier(self.supplier, self.cloned_item, 2)
+        versions.append(self.warehouse.version)
+        self.warehouse.mark_order_as_received(order.order_id)
+        versions.append(self.warehouse.version)
+        self.warehouse.inventory.update_price("Widget", 21.99)
+        versions.append(self.warehouse.version)
+        self.warehouse.place_order(self.customer, self.cloned_item, 1)
+        versions.append(self.warehouse.version)
+
+        self.assertEqual(versions, sorted(set(versions)))
+        self.assertEqual(self.warehouse.version, versions[-1])  # Reads don't bump it
+
+    def test_remove_closed_orders(self):
+        """Test that old closed orders leave the list, the indexes and the order history."""
+        received = self.warehouse.order_from_supplier(
+            self.supplier, self.cloned_item, 10
+        )
+        self.warehouse.mark_order_as_received(received.order_id)
+        sale = self.warehouse.place_order(self.customer, self.cloned_item, 1)
+        pending = self.warehouse.order_from_supplier(self.supplier, self.cloned_item, 5)
+        recent = self.warehouse.place_order(self.customer, self.cloned_item, 2)
+        for order in (received, sale, pending):
+            order.timestamp -= timedelta(days=100)
+        archived = []
+        self.warehouse.add_archive_listener(
+            lambda orders, before: archived.extend(orders)
+        )
+
+        version = self.warehouse.version
+        removed = self.warehouse.remove_closed_orders(
+            datetime.now() - timedelta(days=90)
+        )
+
+        self.assertEqual(removed, [received, sale])
+        self.assertEqual(archived, removed)
+        self.assertEqual(self.warehouse.orders, [pending, recent])
+        self.assertIsNone(self.warehouse.get_order(sale.order_id))
+        self.assertEqual(self.warehouse.orders_with_status("received"), [])
+        self.assertEqual(self.warehouse.orders_with_status("delivered"), [recent])
+        self.assertEqual(self.warehouse.list_pending_orders(), [pending])
+        self.assertEqual(self.customer.order_history, [recent])
+        self.assertGreater(self.warehouse.version, version)
+        self.assertIn(self.cloned_item, self.warehouse.get_available_items())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,5 +1,10 @@
 # tui/admin_menu.py
 
+import sys
+from datetime import timedelta
+from app.archive import ARCHIVE_AFTER, archive_closed_orders
+from app.finance import ORDER_PAGE_SIZE, ORDER_SORT_KEYS
+
 
 def admin_login(warehouse, supplier_manager, finance_compiler):
     while True:
@@ -129,7 +134,7 @@ def edit_inventory_prices(warehouse):
         if 1 <= choice <= len(items):
             item = items[choice - 1]
             new_price = float(input(f"Enter new price for {item.name}: "))
-            warehouse.inventory.update_price(item.name, new_price)
+            warehouse.inventory.update_price(item.name, new_price, item.description)
             print(f"Price for {item.name} updated to £{new_price:.2f}.")
         else:
             print("Invalid selection.")
@@ -158,7 +163,9 @@ def edit_inventory_thresholds(warehouse):
             new_threshold = int(input(f"Enter new threshold for {item.name}: "))
 
             try:
-                warehouse.inventory.set_threshold(item.name, new_threshold)
+                warehouse.inventory.set_threshold(
+                    item.name, new_threshold, item.description
+                )
                 print(f"Threshold for {item.name} updated to {new_threshold}.")
             except ValueError as e:
                 print(f"Error: {e}")
@@ -198,6 +205,8 @@ def manage_finances(finance_compiler):
         print("2. Quick Financial Overview")
         print("3. Deep Dive into Financials")
         print("4. Export Financial Report")
+        print("5. Period Report")
+        print("6. Archive Old Orders")
         print("0. Back to Admin Menu")
         choice = input("Enter your choice: ")
         if choice == "1":
@@ -208,16 +217,18 @@ def manage_finances(finance_compiler):
             deep_dive_financials(finance_compiler)
         elif choice == "4":
             export_financial_report(finance_compiler)
+        elif choice == "5":
+            period_report(finance_compiler)
+        elif choice == "6":
+            archive_old_orders(finance_compiler)
         elif choice == "0":
             break
         else:
             print("Invalid choice. Please try again.")
 
 
-def view_all_orders(finance_compiler):
-    print("\n--- View All Orders ---")
-    summaries = finance_compiler.summarise_orders()
-
+def view_all_orders(finance_compiler, page_size=ORDER_PAGE_SIZE):
+    """Show orders one page at a time, optionally sorted."""
     headers = [
         "Order ID",
         "Item",
@@ -228,52 +239,195 @@ def view_all_orders(finance_compiler):
         "Seller",
         "Timestamp",
     ]
-    print(
-        f"{headers[0]:<10} {headers[1]:<15} {headers[2]:<5} {headers[3]:<7} {headers[4]:<8} {headers[5]:<15} {headers[6]:<15} {headers[7]}"
-    )
-    print("-" * 95)
+    header = f"{headers[0]:<10} {headers[1]:<15} {headers[2]:<5} {headers[3]:<7} {headers[4]:<8} {headers[5]:<15} {headers[6]:<15} {headers[7]}"
+    page, sort_by, reverse = 1, None, False
 
-    for s in summaries:
-        print(
-            f"{s['order_id']:<10} {s['item_name']:<15} {s['quantity']:<5} £{s['item_price']:<6.2f} £{s['total_price']:<7.2f} {s['buyer_name']:<15} {s['seller_name']:<15} {s['timestamp']}"
+    while True:
+        page_count = finance_compiler.page_count(page_size)
+        page = min(page, page_count)
+        summaries = finance_compiler.summarise_orders_page(
+            page, page_size, sort_by, reverse
         )
 
+        # Build the whole page first and write it in one go
+        lines = [
+            "\n--- View All Orders ---",
+            f"Page {page} of {page_count} | Sorted by: {sort_by or 'order_id'}{' (descending)' if reverse else ''}",
+            header,
+            "-" * 95,
+        ]
+        for s in summaries:
+            lines.append(
+                f"{s['order_id']:<10} {s['item_name']:<15} {s['quantity']:<5} £{s['item_price']:<6.2f} £{s['total_price']:<7.2f} {s['buyer_name']:<15} {s['seller_name']:<15} {s['timestamp']}"
+            )
+        if not summaries:
+            lines.append("No orders found.")
+        sys.stdout.write("\n".join(lines) + "\n")
+
+        choice = (
+            input("[n]ext, [p]revious, [s]ort, [r]everse, [q]uit: ").strip().lower()
+        )
+        if choice == "n":
+            if page < page_count:
+                page += 1
+        elif choice == "p":
+            if page > 1:
+                page -= 1
+        elif choice == "s":
+            key = input(f"Sort by ({', '.join(ORDER_SORT_KEYS)}): ").strip()
+            if key in ORDER_SORT_KEYS:
+                sort_by = None if key == "order_id" else key
+                page = 1
+            else:
+                print("Invalid sort key.")
+        elif choice == "r":
+            reverse = not reverse
+            page = 1
+        elif choice == "q":
+            break
+        else:
+            print("Invalid choice. Please try again.")
+
 
 def quick_financial_overview(finance_compiler):
     """Display a quick financial overview of revenue, costs, and profit."""
     print("\n--- Quick Financial Overview ---")
-    total_revenue = finance_compiler.total_customer_revenue()
-    total_costs = finance_compiler.total_supplier_costs()
-    profit = finance_compiler.calculate_profit()
+    summary = finance_compiler.running_summary(
+        include_archived=ask_include_archived(finance_compiler)
+    )
 
-    print(f"Total Revenue from Customers: £{total_revenue:.2f}")
-    print(f"Total Costs from Suppliers: £{total_costs:.2f}")
-    print(f"Total Profit: £{profit:.2f}")
+    print(f"Total Revenue from Customers: £{summary.revenue:.2f}")
+    print(f"Total Costs from Suppliers: £{summary.costs:.2f}")
+    print(f"Total Profit: £{summary.profit:.2f}")
+    print(
+        f"Orders: {summary.order_count} ({summary.customer_order_count} customer, "
+        f"{summary.supplier_order_count} supplier)"
+    )
+    for status, count in summary.status_counts.items():
+        print(f"- {status}: {count} (£{summary.status_totals[status]:.2f})")
 
 
 def deep_dive_financials(finance_compiler):
     """Provide a detailed analysis of orders and financials."""
     print("\n--- Deep Dive into Financials ---")
-    customer_orders = finance_compiler.get_customer_orders()
-    supplier_orders = finance_compiler.get_supplier_orders()
+    summary = finance_compiler.summarise()
+    print(
+        f"Revenue: £{summary.revenue:.2f} | Costs: £{summary.costs:.2f} | Profit: £{summary.profit:.2f}"
+    )
+    report = finance_compiler.margin_report()
+
+    print("\nMargin by Item:")
+    if not report.items:
+        print("No delivered or received orders.")
+    for (name, description), margin in sorted(
+        report.items.items(), key=lambda entry: entry[1].margin, reverse=True
+    ):
+        print(
+            f"{name} ({description}): Sold {margin.units_sold} for £{margin.revenue:.2f} | Bought {margin.units_bought} for £{margin.cost:.2f} | Margin: £{margin.margin:.2f} ({margin.margin_percent:.1f}%)"
+        )
+
+    print("\nSpend by Supplier:")
+    if not report.suppliers:
+        print("No received supplier orders.")
+    for name, spend in sorted(
+        report.suppliers.items(), key=lambda entry: entry[1].total, reverse=True
+    ):
+        print(
+            f"{name}: {spend.count} orders, {spend.quantity} units, £{spend.total:.2f}"
+        )
+
+
+def period_report(finance_compiler):
+    """Display revenue, costs and profit per day, week or month."""
+    print("\n--- Period Report ---")
+    period = input("Group by 'day', 'week' or 'month' (default month): ").strip()
+    item_name = input("Item name (leave blank for all items): ").strip()
+    item_description = ""
+    if item_name:
+        item_description = input(
+            "Item description (leave blank for every item of that name): "
+        ).strip()
+    include_archived = ask_include_archived(finance_compiler)
 
-    print("\nCustomer Orders:")
-    for order in customer_orders:
+    try:
+        report = finance_compiler.period_report(
+            period=period.lower() or "month",
+            item_name=item_name or None,
+            item_description=item_description or None,
+            include_archived=include_archived,
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    if not report:
+        print("No delivered or received orders found.")
+        return
+
+    print(
+        f"{'Period':<12} {'Revenue':<12} {'Costs':<12} {'Profit':<12} {'Sold':<8} {'Bought'}"
+    )
+    print("-" * 70)
+    for bucket, totals in report:
         print(
-            f"Order ID: {order.order_id}, Item: {order.item.name}, Quantity: {order.quantity}, Total: £{order.total_price:.2f}"
+            f"{bucket.isoformat():<12} £{totals.revenue:<11.2f} £{totals.costs:<11.2f} "
+            f"£{totals.profit:<11.2f} {totals.units_sold:<8} {totals.units_bought}"
         )
 
-    print("\nSupplier Orders:")
-    for order in supplier_orders:
+
+def ask_include_archived(finance_compiler) -> bool:
+    """Ask whether a report should cover archived orders too, if any have been archived."""
+    if finance_compiler.archive is None or not len(finance_compiler.archive):
+        return False
+    answer = input("Include archived orders? (y/N): ").strip().lower()
+    return answer == "y"
+
+
+def archive_old_orders(finance_compiler):
+    """Move closed orders older than a number of days out of memory and into the archive."""
+    print("\n--- Archive Old Orders ---")
+    if finance_compiler.archive is None:
         print(
-            f"Order ID: {order.order_id}, Item: {order.item.name}, Quantity: {order.quantity}, Total: £{order.total_price:.2f}"
+            "Archiving needs --persist or --sqlite, archived orders are kept on disk."
         )
+        return
+
+    days = input(
+        f"Archive received and delivered orders older than how many days? (default {ARCHIVE_AFTER.days}): "
+    ).strip()
+    try:
+        older_than = timedelta(days=int(days)) if days else ARCHIVE_AFTER
+    except ValueError:
+        print("Error: Please enter a whole number of days.")
+        return
+
+    archive_closed_orders(
+        finance_compiler.archive, finance_compiler.warehouse, older_than
+    )
 
 
 def export_financial_report(finance_compiler):
-    """Export a detailed financial report of all orders to CSV."""
+    """Export a detailed financial report of all orders to CSV or the binary format."""
+    export_format = input("Export format, 'csv' or 'binary' (default csv): ")
+    if export_format.strip().lower() == "binary":
+        directory = input("Enter the directory to export the binary report to: ")
+        finance_compiler.export_orders_to_binary(
+            finance_compiler.get_all_orders(), directory
+        )
+        print(f"Financial report exported to {directory}")
+        return
+
     file_path = input(
         "Enter the file path to export the financial report (append .csv to the end): "
     )
-    finance_compiler.export_orders_to_csv(finance_compiler.get_all_orders(), file_path)
+    incremental = input(
+        "Only append orders and status changes since the last export? (y/n): "
+    )
+    if incremental.strip().lower() == "y":
+        new_rows, patches = finance_compiler.export_orders_incremental(file_path)
+        print(f"Appended {new_rows} new orders and {patches} status changes.")
+    else:
+        finance_compiler.export_orders_to_csv(
+            finance_compiler.get_all_orders(), file_path
+        )
     print(f"Financial report exported to {file_path}")
@@ -37,10 +37,10 @@ def sign_in(customer_manager, warehouse):
 
     if customer:
         print(f"\nWelcome back, {customer.name}!")
-        customer_menu(customer, warehouse)
+        customer_menu(customer_manager, customer, warehouse)
 
 
-def customer_menu(customer, warehouse):
+def customer_menu(customer_manager, customer, warehouse):
     """Main menu for the customer to navigate through the available actions."""
     while True:
         print("\n--- Customer Menu ---")
@@ -57,9 +57,9 @@ def customer_menu(customer, warehouse):
         elif choice == "2":
             place_order(customer, warehouse)
         elif choice == "3":
-            view_order_history(customer)
+            view_order_history(customer, warehouse)
         elif choice == "4":
-            update_profile(customer)
+            update_profile(customer_manager, customer)
         elif choice == "5":
             view_profile(customer)
         elif choice == "0":
@@ -112,18 +112,18 @@ def view_profile(customer):
     print(f"Email: {customer.email}")
 
 
-def update_profile(customer):
+def update_profile(customer_manager, customer):
     """Update the customer's profile information."""
     print("\n--- Update Profile ---")
     name = input("Enter new name (leave blank to keep current): ")
     email = input("Enter new email (leave blank to keep current): ")
 
-    customer.update_profile(name=name, email=email)
+    customer_manager.update_customer(customer.customer_id, name=name, email=email)
 
     print("Profile updated successfully!")
 
 
-def view_order_history(customer):
+def view_order_history(customer, warehouse):
     """Display the customer's order history."""
     print("\n--- Order History ---")
 
@@ -143,7 +143,7 @@ def view_order_history(customer):
     )
     print("-" * 105)
 
-    for order in customer.order_history:
+    for order in warehouse.customer_orders(customer):
         print(
             f"{order.order_id:<10} {order.item.name:<15} {order.quantity:<8} "
             f"£{order.item.price:<7.2f} £{order.total_price:<7.2f} "
@@ -12,8 +12,47 @@ from app.finance import FinanceCompiler
 
 # Import the mock data loader, but only call it if needed
 USE_MOCK_DATA = "--mock" in sys.argv
+# Keep everything in a journal on disk and restore it on the next start
+USE_JOURNAL = "--persist" in sys.argv
+# Keep everything in an SQLite database instead, and run finance queries in SQL
+USE_SQLITE = "--sqlite" in sys.argv
+store = None
+archive = None
 
-if USE_MOCK_DATA:
+if USE_SQLITE:
+    import atexit
+    from app.sqlite_store import DATABASE_FILE, open_store
+
+    if USE_MOCK_DATA or USE_JOURNAL:
+        print("Ignoring --mock and --persist, the warehouse is loaded from SQLite.")
+    USE_JOURNAL = False
+    customer_manager = CustomerManager()
+    supplier_manager = SupplierManager()
+    warehouse = Warehouse(name="Main Warehouse")
+    store = open_store(DATABASE_FILE, warehouse, customer_manager, supplier_manager)
+    atexit.register(store.close)
+elif USE_JOURNAL:
+    import atexit
+    from app.journal import JOURNAL_FILE, Journal
+    from app.order_segments import OrderSegments
+    from app.snapshot import SNAPSHOT_FILE, Snapshotter, restore
+
+    if USE_MOCK_DATA:
+        print("Ignoring --mock, the warehouse is restored from the journal.")
+    warehouse, customer_manager, supplier_manager = restore(SNAPSHOT_FILE, JOURNAL_FILE)
+    journal = Journal(JOURNAL_FILE)
+    journal.attach(warehouse, customer_manager, supplier_manager)
+    # Closed orders are read back from the segment files instead of kept in memory
+    segments = OrderSegments()
+    segments.attach(warehouse, customer_manager, supplier_manager)
+    warehouse.use_history(segments)
+    atexit.register(segments.close)
+    snapshotter = Snapshotter(
+        SNAPSHOT_FILE, warehouse, customer_manager, supplier_manager, journal
+    )
+    atexit.register(journal.close)
+    atexit.register(snapshotter.wait)
+elif USE_MOCK_DATA:
     from tests.mock_data import import_mock_data
 
     customer_manager, supplier_manager, warehouse = import_mock_data()
@@ -22,11 +61,24 @@ else:
     supplier_manager = SupplierManager()
     warehouse = Warehouse(name="Main Warehouse")
 
-finance_compiler = FinanceCompiler(orders=warehouse.orders)
+if USE_SQLITE or USE_JOURNAL:
+    # Closed orders can be moved out of memory once they are kept on disk
+    from app.archive import ARCHIVE_DIRECTORY, OrderArchive
+
+    archive = OrderArchive(ARCHIVE_DIRECTORY)
+    archive.recover(warehouse)  # Finish an archival a crash cut short
+
+# Renaming a customer or supplier must not leave stale names in cached reports
+warehouse.watch_parties(customer_manager, supplier_manager)
+finance_compiler = FinanceCompiler(
+    orders=warehouse.all_orders, warehouse=warehouse, store=store, archive=archive
+)
 
 
 def main_menu(supplier_manager, customer_manager, warehouse):
     while True:
+        if USE_JOURNAL:
+            snapshotter.maybe_snapshot()
         print("\n--- Main Menu ---")
         print("1. Admin Login")
         print("2. Customer Login")
@@ -55,7 +55,7 @@ def supplier_menu(supplier_manager, supplier):
         if choice == "1":
             view_supplier_profile(supplier)
         elif choice == "2":
-            update_supplier_profile(supplier)
+            update_supplier_profile(supplier_manager, supplier)
         elif choice == "3":
             create_item_for_supplier(supplier_manager, supplier)
         elif choice == "4":
@@ -74,11 +74,15 @@ def view_supplier_profile(supplier):
     print(f"Supplier ID: {supplier.supplier_id}")
 
 
-def update_supplier_profile(supplier):
+def update_supplier_profile(supplier_manager, supplier):
     name = input("Enter new name (leave blank to keep current): ")
     email = input("Enter new email (leave blank to keep current): ")
 
-    supplier.update_profile(name=name if name else None, email=email if email else None)
+    supplier_manager.update_supplier(
+        supplier.supplier_id,
+        name=name if name else None,
+        email=email if email else None,
+    )
 
     print("Profile updated successfully.")
 